@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Parser Benchmark
+#
+# Measures Requests.parse and Responses.parse on a corpus of the messages
+# sent by the tests (see httpwookiee/http/parser/benchmark.py), and prints
+# the results as JSON. Store the output of a commit and compare the next
+# ones with it:
+#
+#     ./benchmark.py -o before.json
+#     (...)
+#     ./benchmark.py -c before.json
+#
+from __future__ import print_function
+from httpwookiee.http.parser import benchmark
+import argparse
+import json
+import sys
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-r',
+        "--repeat",
+        help="number of parsing of each stream (default 10)",
+        type=int,
+        default=10,
+        metavar='NUM')
+    parser.add_argument(
+        '-R',
+        "--rounds",
+        help="number of measures, the best one is kept (default 5)",
+        type=int,
+        default=5,
+        metavar='NUM')
+    parser.add_argument(
+        '-o',
+        "--output",
+        help="write the JSON results in this file instead of stdout",
+        metavar='FILE')
+    parser.add_argument(
+        '-c',
+        "--compare",
+        help="compare with the JSON results of a previous run",
+        metavar='FILE')
+    args = parser.parse_args()
+
+    results = benchmark.run(repeat=args.repeat, rounds=args.rounds)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    elif not args.compare:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            reference = json.load(handle)
+        for line in benchmark.compare(reference, results):
+            print(line)
+    sys.exit(0)
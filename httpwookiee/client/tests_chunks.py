@@ -3,7 +3,7 @@
 #
 # from httpwookiee.config import ConfigFactory
 from httpwookiee.config import Register
-from httpwookiee.core.base import BaseTest
+from httpwookiee.core.base import BaseTest, connection_safe
 from httpwookiee.core.tools import Tools
 from httpwookiee.http.request import Request
 from httpwookiee.core.result import TextStatusResult
@@ -26,6 +26,7 @@ class AbstractTestChunks(BaseTest):
         self.transmission_zone = Tools.ZONE_HEADERS
         self.send_mode = self.SEND_MODE_UNIQUE
 
+    @connection_safe
     def test_2000_preflight_regular_chunked_get(self):
         """Let's start by a regular GET with chunked body
 
@@ -45,6 +46,7 @@ class AbstractTestChunks(BaseTest):
                       [self.STATUS_ACCEPTED, self.STATUS_ERR405],
                       'Bad response status {0}'.format(self.status))
 
+    @connection_safe
     def test_2001_preflight_regular_chunked_post(self):
         """If get is not good, try POST for chunked queries.
 
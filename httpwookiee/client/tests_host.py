@@ -3,7 +3,7 @@
 #
 # from httpwookiee.config import ConfigFactory
 from httpwookiee.config import Register
-from httpwookiee.core.base import BaseTest
+from httpwookiee.core.base import BaseTest, connection_safe
 from httpwookiee.core.tools import Tools
 from httpwookiee.core.result import TextStatusResult
 from httpwookiee.core.testloader import WookieeTestLoader
@@ -115,6 +115,7 @@ class AbstractTestNonDefaultHost(BaseTest):
         return self.config.get(
                 'SERVER_NON_DEFAULT_LOCATION_CONTENT').encode('utf8')
 
+    @connection_safe
     def test_5002_preflight_non_default_vhost(self):
         """Check that the non default vhost works and can be identified
 
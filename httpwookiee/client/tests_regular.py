@@ -3,7 +3,7 @@
 #
 from httpwookiee.http.client import Client  # , ClosedSocketError
 from httpwookiee.config import Register
-from httpwookiee.core.base import BaseTest
+from httpwookiee.core.base import BaseTest, connection_safe
 from httpwookiee.core.result import TextStatusResult
 from httpwookiee.http.request import Request
 from httpwookiee.core.tools import outmsg, Tools
@@ -14,6 +14,7 @@ import unittest
 
 class AbstractTestRegular(BaseTest):
 
+    @connection_safe
     def test_0001_regular(self):
         "regular simple HTTP query."
         self.real_test = "{0}".format(inspect.stack()[0][3])
@@ -56,7 +57,7 @@ class AbstractTestRegular(BaseTest):
         responses2 = False
         with Client() as csock:
             csock.send(self.req)
-            responses1 = csock.read_all()
+            responses1 = csock.read_all(expected=1)
             outmsg(str(responses1))
             self.analysis(responses1,
                           http09_allowed=False,
@@ -79,7 +80,7 @@ class AbstractTestRegular(BaseTest):
                 #     Register.flag('keepalive', False)
                 #     self.setGravity(self.GRAVITY_UNKNOWN)
                 #     raise AssertionError('Connection closed before reading')
-                responses2 = csock.read_all()
+                responses2 = csock.read_all(expected=1)
                 outmsg(str(responses2))
 
         self.analysis(responses2,
@@ -120,7 +121,7 @@ class AbstractTestRegularPipe(BaseTest):
             csock.send(self.req1)
             csock.send(self.req2)
             csock.send(self.req3)
-            responses = csock.read_all()
+            responses = csock.read_all(expected=3)
             outmsg(str(responses))
 
         self.analysis(responses,
@@ -118,6 +118,20 @@ class Config:
         'OUTPUT_MAX_MSG_SIZE': u'3800',
         'CLIENT_SOCKET_READ_TIMEOUT_MS': u'1000',
         'CLIENT_SOCKET_READ_SIZE': u'1024',
+        # wait after the expected responses are complete, for extra ones
+        'CLIENT_SOCKET_GRACE_MS': u'100',
+        # read timeouts learned from the latency of the target, bounded
+        'CLIENT_ADAPTIVE_TIMEOUT': u'true',
+        'CLIENT_ADAPTIVE_TIMEOUT_MIN_MS': u'100',
+        'CLIENT_ADAPTIVE_TIMEOUT_MAX_MS': u'5000',
+        # idle keep-alive connections kept for well-formed tests (0: none)
+        'CLIENT_POOL_SIZE': u'2',
+        # SERVER_SSL connections resume the TLS session of the previous one
+        'CLIENT_SSL_RESUMPTION': u'true',
+        # bigger response bodies are only summarized (0: no limit)
+        'CLIENT_BODY_RETENTION_CAP': u'0',
+        # parsed response streams kept for identical streams (0: no cache)
+        'CLIENT_RESPONSES_CACHE_SIZE': u'128',
         # String present in regular default location response body
         'BACKEND_PORT': u'8282',
         'BACKEND_LOCATION_PREFIX': u'/proxy',
@@ -3,12 +3,20 @@
 from httpwookiee.config import ConfigFactory, Register
 from httpwookiee.http.client import Client
 from httpwookiee.http.parser.response import Response
+from httpwookiee.http.pool import ConnectionPool
 from httpwookiee.core.tools import Tools, outmsg
 from httpwookiee.http.request import Request
 from unittest.util import strclass
 import unittest
 
 
+def connection_safe(test):
+    """Decorator of the tests sending only well-formed requests, their
+    connection can be reused by the next ones (see ConnectionPool)."""
+    test.connection_safe = True
+    return test
+
+
 class BaseTest(unittest.TestCase):
 
     GRAVITY_UNKNOWN = 0
@@ -80,6 +88,11 @@ class BaseTest(unittest.TestCase):
     SEND_MODE_UNIQUE = 0
     SEND_MODE_PIPE = 1
 
+    # Present in the body of the wookiee response (see send_wookiee)
+    WOOKIEE_SIGNATURES = (b"      -mMMNNdhdmhyhNs/mmy+mmyyy+shdo/-....",
+                          b"``.-:/mdMNmh++dNddddh+hmod+/ohdy",
+                          b"Wookiee !")
+
     use_backend_location = False
     req = None
     req1 = None
@@ -219,25 +232,50 @@ class BaseTest(unittest.TestCase):
     def _hook_while_sending(self):
         pass
 
+    def is_connection_safe(self):
+        "The running test is decorated with connection_safe."
+        test = getattr(self, self._testMethodName, None)
+        return getattr(test, 'connection_safe', False)
+
     def send_queries(self):
         responses = None
         if self.send_mode == self.SEND_MODE_UNIQUE:
-            with Client() as csock:
-                csock.send(self.req)
-                responses = csock.read_all()
-                self._hook_while_sending()
+            requests = [self.req]
         elif self.send_mode == self.SEND_MODE_PIPE:
-            with Client() as csock:
-                # csock.send(u'{0}{1}'.format(self.req1, self.req2))
-                csock.send(self.req1)
-                csock.send(self.req2)
-                responses = csock.read_all()
-                self._hook_while_sending()
+            requests = [self.req1, self.req2]
         else:
             raise ValueError('Unknown send mode for test HTTP queries.')
+        if self.is_connection_safe():
+            responses = self._send_pooled_queries(requests)
+        else:
+            # anomalies, always on a new connection
+            with Client() as csock:
+                for request in requests:
+                    csock.send(request)
+                responses = csock.read_all(
+                    signatures=self._get_body_signatures(),
+                    expected=len(requests))
+                self._hook_while_sending()
         outmsg(str(responses))
         return responses
 
+    def _send_pooled_queries(self, requests):
+        "send_queries() on a kept-alive connection, if any."
+        pool = ConnectionPool.shared()
+        csock = pool.acquire()
+        reusable = False
+        try:
+            for request in requests:
+                csock.send(request)
+            responses = csock.read_all(
+                signatures=self._get_body_signatures(),
+                expected=len(requests))
+            self._hook_while_sending()
+            reusable = pool.reusable(responses, len(requests))
+        finally:
+            pool.release(csock, reusable)
+        return responses
+
     def _end_regular_query(self,
                            responses=None,
                            http09_allowed=False,
@@ -431,9 +469,8 @@ class BaseTest(unittest.TestCase):
 
     def check_for_errors(self, response):
 
-        if ((b"      -mMMNNdhdmhyhNs/mmy+mmyyy+shdo/-...." in response.body)
-                and (b"``.-:/mdMNmh++dNddddh+hmod+/ohdy" in response.body)
-                and (b"Wookiee !" in response.body)):
+        if all([signature in response.body
+                for signature in self.WOOKIEE_SIGNATURES]):
             self.setStatus(self.STATUS_WOOKIEE)
 
         elif Response.ERROR_HTTP09_RESPONSE in response.errors:
@@ -511,6 +548,10 @@ class BaseTest(unittest.TestCase):
             elif 302 == response.code:
                 self.setStatus(self.STATUS_RED_302)
 
+    def _get_body_signatures(self):
+        "Strings we search in the responses bodies."
+        return self.WOOKIEE_SIGNATURES + (self._get_expected_content(), )
+
     def _get_expected_content(self):
         expected = self.config.get(
             'SERVER_DEFAULT_LOCATION_CONTENT').encode('utf8')
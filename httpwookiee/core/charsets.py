@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Byte classes, as 256 entries tables indexed by the byte value.
+
+Membership is a simple lookup: ``charsets.TCHAR[ord(char)]``.
+Tables are shared by the parser and by tests generators, use members() to
+get the characters of a class.
+"""
+import six
+import string
+
+
+def build_table(chars=u'', ranges=()):
+    "Build a 256 entries table from a list of characters and byte ranges."
+    table = [False] * 256
+    for char in chars:
+        table[ord(char)] = True
+    for start, end in ranges:
+        for byte in range(start, end + 1):
+            table[byte] = True
+    return tuple(table)
+
+
+def union(*tables):
+    "Table of bytes found in at least one of the given tables."
+    return tuple([any(values) for values in zip(*tables)])
+
+
+def members(table):
+    "Characters of the given byte class, as a unicode string."
+    return u''.join([six.unichr(byte)
+                     for byte in range(256) if table[byte]])
+
+
+ALPHA = build_table(ranges=((0x41, 0x5A), (0x61, 0x7A)))
+DIGIT = build_table(ranges=((0x30, 0x39), ))
+HEXDIG = build_table(string.hexdigits)
+ALPHANUM = union(ALPHA, DIGIT)
+
+# RFC 7230 token characters
+# tchar = "!" / "#" / "$" / "%" / "&" / "'" / "*" / "+" / "-" / "." /
+#         "^" / "_" / "`" / "|" / "~" / DIGIT / ALPHA
+TCHAR = union(ALPHANUM, build_table(u"!#$%&'*+-.^_`|~"))
+
+# Characters accepted in header names by the parser: all visible ascii
+# chars and SP, without the delimiters which are not tokens.
+# (this is larger than TCHAR, ':' and ';' are not rejected for example)
+HEADER_NAME = union(ALPHANUM,
+                    build_table(u''.join([
+                        char for char in string.punctuation + u' '
+                        if char not in u'()/,<=>?@[\\]{}"'])))
+
+# RFC 3986
+# unreserved  = ALPHA / DIGIT / "-" / "." / "_" / "~"
+# sub-delims  = "!" / "$" / "&" / "'" / "(" / ")"
+#             / "*" / "+" / "," / ";" / "="
+# pchar       = unreserved / pct-encoded / sub-delims / ":" / "@"
+UNRESERVED = union(ALPHANUM, build_table(u'-._~'))
+SUB_DELIMS = build_table(u"!$&'()*+,;=")
+PCHAR = union(UNRESERVED, SUB_DELIMS, build_table(u'%:@'))
+
+# Separators, SP and LF/CR/HTAB/VTAB/FF are not forbidden characters in the
+# first line, they are handled by the space and end of line detection.
+LINE_SEPARATORS = build_table(u'\t\n\x0b\x0c\r /:@')
+
+# Not forbidden characters in the request line, outside of the uri
+SAFE_CHARS = union(ALPHANUM, LINE_SEPARATORS)
+
+# Not forbidden characters in the uri (location and query string)
+URI_CHARS = union(SAFE_CHARS, PCHAR, build_table(u'?'))
+
+# Not forbidden characters in domain names (absolute uris)
+DOMAIN_CHARS = union(ALPHANUM, build_table(u'-.'))
+
+# Bad spaces, TAB is the only one in headers, VTAB, FF and CR are the
+# extended bad spaces of the request line (RFC 7230 3.5).
+BAD_SPACE = build_table(u'\t')
+EXTENDED_BAD_SPACE = build_table(u'\t\x0b\x0c\r')
+
+# Bytes used in the overlong utf-8 tests (\xc0\x8d and \xc0\x8a)
+BAD_UTF8 = build_table(ranges=((0xC0, 0xC0), (0x8D, 0x8D), (0x8A, 0x8A)))
+
+# Byte values of some separators, the tokenizers work on byte values
+HTAB = 0x09
+LF = 0x0A
+VTAB = 0x0B
+FF = 0x0C
+CR = 0x0D
+SP = 0x20
+DQUOTE = 0x22
+DASH = 0x2D
+DOT = 0x2E
+SLASH = 0x2F
+ZERO = 0x30
+COLON = 0x3A
+SEMICOLON = 0x3B
+QUESTION_MARK = 0x3F
+BACKSLASH = 0x5C
+
+# Text of each byte (latin-1), and its upper case version, for the human
+# readable fields built by the tokenizers.
+TEXT = tuple([six.unichr(byte) for byte in range(256)])
+UPPER_TEXT = tuple([text.upper() for text in TEXT])
+
+# Value of hexadecimal digits (None for other bytes)
+HEX_VALUE = tuple([int(TEXT[byte], 16) if HEXDIG[byte] else None
+                   for byte in range(256)])
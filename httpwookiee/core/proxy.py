@@ -170,26 +170,11 @@ class AbstractEchoProxy(ProxyTest):
             if stream_mode:
                 zone = self.backend_queries
             else:
-                if self.transmission_zone is Tools.ZONE_FIRST_LINE:
-                    query = self.backend_queries[0]
-                    zone = query.first_line.raw
-                    inmsg('# zone to analyze:.')
-                    inmsg(str(zone))
-                if self.transmission_zone is Tools.ZONE_HEADERS:
-                    query = self.backend_queries[0]
-                    zone = b''
-                    for header in query.headers:
-                        zone += header.raw
-                    inmsg('# zone to analyze:.')
-                    inmsg(str(zone))
-                if self.transmission_zone is Tools.ZONE_CHUNK_SIZE:
-                    query = self.backend_queries[0]
-                    zone = b''
-                    if query.chunked:
-                        for chunk in query.chunks:
-                            zone += chunk.raw
-                    inmsg('# zone to analyze:.')
-                    inmsg(str(zone))
+                # first line, headers or chunk sizes of the first query,
+                # searched directly in the parsed buffer
+                zone = self.backend_queries.zone(0, self.transmission_zone)
+                inmsg('# zone to analyze:.')
+                inmsg(str(zone))
 
         if self.transmission_map:
             for proof, status in Tools.iteritems(self.transmission_map):
@@ -3,6 +3,8 @@
 import unittest
 from httpwookiee.config import Register
 from httpwookiee.core.base import BaseTest
+from httpwookiee.http.client import BaseClient
+from httpwookiee.http.tls import ClientSSLContext
 try:
     import queue as Queue
 except ImportError:
@@ -221,6 +223,28 @@ class TextStatusResult(unittest.TestResult):
                             self.critical,
                             BaseTest.gravity_format[BaseTest.GRAVITY_CRITICAL])
         self.printErrorList('ERROR', self.errors)
+        self.printTimeouts()
+        self.printHandshakes()
+
+    def printTimeouts(self):
+        "Read timeouts computed from the latency of the targets."
+        tracker = BaseClient.latency_tracker
+        if tracker is None or not tracker.targets():
+            return
+        self.stream.writeln(self.separator2)
+        self.stream.writeln("Read timeouts:")
+        for line in tracker.report():
+            self.stream.writeln(" {0}".format(line))
+
+    def printHandshakes(self):
+        "Full and resumed TLS handshakes times."
+        context = ClientSSLContext.instance
+        if context is None or not context.handshakes:
+            return
+        self.stream.writeln(self.separator2)
+        self.stream.writeln("TLS handshakes:")
+        for line in context.report():
+            self.stream.writeln(" {0}".format(line))
 
     def printErrorList(self, flavour, errors, gravity=None):
         for test, err in errors:
@@ -3,6 +3,7 @@
 from httpwookiee.config import ConfigFactory, Register
 from httpwookiee.http.server import HttpServerThread
 from httpwookiee.core.order import Order
+from httpwookiee.http.pool import ConnectionPool
 import unittest
 try:
     import queue as Queue
@@ -66,6 +67,8 @@ class WookieeTestRunner(unittest.TextTestRunner):
         # time.sleep(30)
         print('starting tests')
         result = super(WookieeTestRunner, self).run(test)
+        if ConnectionPool.instance is not None:
+            ConnectionPool.instance.close()
         print('Now asking server thread to die')
         try:
             in_queue.put_nowait(Order(Order.ACTION_STOP))
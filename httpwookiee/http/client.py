@@ -3,28 +3,46 @@
 #
 from httpwookiee.config import ConfigFactory
 from httpwookiee.core.tools import Tools, outmsg, inmsg
+from httpwookiee.http.latency import LatencyTracker
+from httpwookiee.http.parser.cache import ResponsesCache
 from httpwookiee.http.parser.responses import Responses
+from httpwookiee.http.tls import ClientSSLContext
 
+import select
 import socket
 import ipaddress
 
 import ssl
 import six
+import sys
+import time
+try:
+    import asyncio
+except ImportError:
+    # python 2, blocking sockets only
+    asyncio = None
+
+timer = getattr(time, 'perf_counter', time.time)
 
 
 class ClosedSocketError(Exception):
     """Raise this when the tcp/ip connection is unexpectedly closed."""
 
 
-class Client(object):
-    """Main HTTP Client, HTTP request launcher."""
+class BaseClient(object):
+    """Settings and responses management shared by the HTTP clients."""
 
     hostip = None
     port = None
     host = b''
     https = False
-    _sock = None
     _hostip = False
+    # parsed response streams, shared by all clients (see read_all())
+    responses_cache = None
+    # latency observations of the targets, shared by all clients
+    latency_tracker = None
+    # getaddrinfo() results, (host, port) -> IP
+    resolved = {}
 
     def __init__(self, host=None, port=None, hostip=None):
         """Ensure settings are ready."""
@@ -44,7 +62,6 @@ class Client(object):
             self.hostip = self.config.get('SERVER_IP')
 
         self.https = self.config.getboolean('SERVER_SSL')
-        self._sock = None
 
     def __enter__(self):
         """Launch the socket opening."""
@@ -55,16 +72,153 @@ class Client(object):
         """Send a socket close."""
         return self.close()
 
-    def open(self):
-        """Open client socket connection."""
+    def _ci(self, ip=None):
+        if ip is None:
+            ip = self.hostip
+        self._hostip = ipaddress.ip_address(six.text_type(ip)).is_private
+
+    def _check_target(self):
+        "Resolve the host IP if needed, and check it."
         if self.hostip is None:
-            outmsg('# searching host IP (DNS) for {0} '.format(self.host))
-            self.hostip = socket.getaddrinfo(self.host, self.port)[0][4][0]
+            key = (self.host, self.port)
+            if key not in BaseClient.resolved:
+                outmsg('# searching host IP (DNS) for {0} '.format(self.host))
+                BaseClient.resolved[key] = socket.getaddrinfo(
+                    self.host, self.port)[0][4][0]
+            self.hostip = BaseClient.resolved[key]
         self._ci()
+        if not self._hostip:
+            raise Exception(u'\u0262\u0046\u0059')
+
+    def _check_peer(self, sock):
+        """Same check on the peer of a given connected socket, the hostip
+        setting is not the real target. Unix sockets (socketpair) are
+        local."""
+        if sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        self._ci(sock.getpeername()[0])
+        if not self._hostip:
+            raise Exception(u'\u0262\u0046\u0059')
+
+    def _log_request(self, request, msg):
+        outmsg('# SENDING ({0}) =====>'.format(len(msg)))
+        # here we use the not-so real format (special bytes are not
+        # replaced in str(), only in getBytesStream())
+        Tools.print_message(six.text_type(request), cleanup=True)
+
+    def _log_delayed(self, msg):
+        outmsg('# SENDING Delayed ({0}) =====>'.format(len(msg)))
+        # hopefully we do not use strange bytes in delayed chunks for now
+        Tools.print_message(six.text_type(msg), cleanup=True)
+
+    @property
+    def target(self):
+        "Key of the target in the latency observations."
+        return u'{0}:{1}'.format(self.host, self.port)
+
+    @classmethod
+    def get_latency_tracker(cls):
+        if BaseClient.latency_tracker is None:
+            config = ConfigFactory.getConfig()
+            default = config.getint('CLIENT_SOCKET_READ_TIMEOUT_MS')
+            minimum = config.getint('CLIENT_ADAPTIVE_TIMEOUT_MIN_MS')
+            maximum = config.getint('CLIENT_ADAPTIVE_TIMEOUT_MAX_MS')
+            BaseClient.latency_tracker = LatencyTracker(
+                default=default / 1000.0,
+                minimum=minimum / 1000.0,
+                maximum=maximum / 1000.0)
+        return BaseClient.latency_tracker
+
+    def _read_timeouts(self, timeout=None, expected=None):
+        """Timeouts of a read_all(): first read, next reads (None for the
+        same) and grace after the expected responses (None without
+        expected number), in seconds."""
+        idle = None
+        if timeout is None:
+            timeout = float(self.config.getint(
+                'CLIENT_SOCKET_READ_TIMEOUT_MS'))
+            timeout = timeout / 1000
+            if (timeout
+                    and self.config.getboolean('CLIENT_ADAPTIVE_TIMEOUT')):
+                tracker = self.get_latency_tracker()
+                target = self.target
+                timeout = tracker.first_byte_timeout(target)
+                idle = tracker.idle_timeout(target)
+                inmsg('# read timeouts: first byte {0:.3f}s, '
+                      'idle {1:.3f}s'.format(timeout, idle))
+        grace = None
+        if expected is not None:
+            grace = float(self.config.getint('CLIENT_SOCKET_GRACE_MS'))
+            grace = grace / 1000
+        return (timeout, idle, grace)
+
+    def _parse_responses(self, output, signatures=(), cache=True):
+        "Parse the whole response stream, see read_all()."
+        inmsg('# <====FINAL RESPONSE===============')
+        inmsg(output)
+        body_cap = self.config.getint('CLIENT_BODY_RETENTION_CAP')
+        cache_size = self.config.getint('CLIENT_RESPONSES_CACHE_SIZE')
+        if cache and cache_size > 0:
+            if BaseClient.responses_cache is None:
+                BaseClient.responses_cache = ResponsesCache(size=cache_size)
+            return BaseClient.responses_cache.parse(
+                output,
+                lazy_headers=True,
+                body_cap=body_cap or None,
+                body_signatures=signatures)
+        responses = Responses(lazy_headers=True,
+                              body_cap=body_cap or None,
+                              body_signatures=signatures).parse(output)
+        return responses
+
+    def _ssl_context(self):
+        "TLS context shared by all clients, see ClientSSLContext."
+        return ClientSSLContext.shared()
+
+    def _tls_handshake_done(self, ssl_object, seconds):
+        if self._ssl_context().record_handshake(seconds, ssl_object):
+            outmsg('# TLS session resumed ({0:.1f}ms)'.format(
+                seconds * 1000))
+        else:
+            outmsg('# TLS full handshake ({0:.1f}ms)'.format(
+                seconds * 1000))
+
+    @property
+    def tls_target(self):
+        "Key of the target in the TLS sessions."
+        return (self.host, self.hostip, self.port)
+
+    def _save_tls_session(self, ssl_object):
+        "Session of this connection, for the next ones (resumption)."
+        if self.https and ssl_object is not None:
+            self._ssl_context().save_session(self.tls_target, ssl_object)
+
+
+class SocketClient(BaseClient):
+    """HTTP Client on a blocking socket, HTTP request launcher.
+
+    This is the Client on python 2, without asyncio."""
+
+    _sock = None
+
+    def __init__(self, host=None, port=None, hostip=None):
+        super(SocketClient, self).__init__(host, port, hostip)
+        self._sock = None
+
+    def open(self, sock=None):
+        """Open client socket connection (or use the given connected
+        socket)."""
+        self._check_target()
+
+        if sock is not None:
+            self._check_peer(sock)
+            self._sock = sock
+            if self.https:
+                self._start_tls()
+            outmsg('# client connection established (given socket).')
+            return
 
         try:
-            if not self._hostip:
-                raise Exception(u'\u0262\u0046\u0059')
             outmsg(
                 '# Connecting to Host: {0} IP: {1} PORT: {2}'.format(
                     self.host, self.hostip, self.port))
@@ -76,23 +230,32 @@ class Client(object):
 
         outmsg('# socket ok')
 
-        if self.https:
-            try:
-
-                outmsg('# Establishing SSL layer')
-                self._sock = ssl.wrap_socket(self._sock,
-                                             cert_reqs=ssl.CERT_NONE)
-            except:
-                outmsg("[SSL ERROR]")
-                raise Exception('error establishing SSL connection')
-
         try:
             self._sock.connect((self.hostip, self.port))
         except socket.error as msg:
             outmsg("[ERROR] {0}".format(str(msg)))
             raise Exception('error establishing socket connect')
+
+        if self.https:
+            self._start_tls()
         outmsg('# client connection established.')
 
+    def _start_tls(self):
+        "TLS handshake on the connected socket."
+        try:
+            outmsg('# Establishing SSL layer')
+            start = timer()
+            context = self._ssl_context()
+            kwargs = {'server_hostname': self.host}
+            if context.resumption:
+                # no session argument before python 3.6
+                kwargs['session'] = context.get_session(self.tls_target)
+            self._sock = context.wrap_socket(self._sock, **kwargs)
+            self._tls_handshake_done(self._sock, timer() - start)
+        except (ssl.SSLError, socket.error) as msg:
+            outmsg("[SSL ERROR] {0}".format(str(msg)))
+            raise Exception('error establishing SSL connection')
+
     def close_sending(self):
         """First closing step, cut the sending part of the socket."""
         try:
@@ -106,6 +269,7 @@ class Client(object):
         """Ensure the tcp/ip socket is really closed."""
         if self._sock is not None:
             outmsg('# closing client connection.')
+            self._save_tls_session(self._ssl_object())
             try:
                 self._sock.shutdown(socket.SHUT_RDWR)
             except Exception:
@@ -114,17 +278,27 @@ class Client(object):
             self._sock.close()
             self._sock = None
 
-    def _ci(self):
-        self._hostip = ipaddress.ip_address(self.hostip).is_private
+    def _ssl_object(self):
+        if isinstance(self._sock, ssl.SSLSocket):
+            return self._sock
+        return None
+
+    def is_alive(self):
+        """The connection can be reused: not closed by the server, and no
+        bytes waiting (a late response)."""
+        if self._sock is None:
+            return False
+        try:
+            readable = select.select([self._sock], [], [], 0)[0]
+        except (socket.error, ValueError):
+            return False
+        # readable: closed, or unexpected bytes
+        return not readable
 
     def send(self, request):
         """Send given request on the socket, support delayed emission."""
         msg = request.getBytesStream()
-        msglen = len(msg)
-        outmsg('# SENDING ({0}) =====>'.format(msglen))
-        # here we use the not-so real format (special bytes are not
-        # replaced in str(), only in getBytesStream())
-        Tools.print_message(six.text_type(request), cleanup=True)
+        self._log_request(request, msg)
         try:
             self._socket_send(msg)
         except socket.error as errmsg:
@@ -133,10 +307,7 @@ class Client(object):
             return
         while request.is_delayed:
             msg = request.getDelayedOutput()
-            msglen = len(msg)
-            outmsg('# SENDING Delayed ({0}) =====>'.format(msglen))
-            # hopefully we do not use strange bytes in delayed chunks for now
-            Tools.print_message(six.text_type(msg), cleanup=True)
+            self._log_delayed(msg)
             try:
                 self._socket_send(msg)
             except socket.error as errmsg:
@@ -146,25 +317,37 @@ class Client(object):
                                             errmsg))
                 return
 
-    def read_all(self, timeout=None, buffsize=None):
-        """Read all the stream, waiting for EOS, return all responses."""
+    def read_all(self, timeout=None, buffsize=None, signatures=(),
+                 cache=True, expected=None):
+        """Read all the stream, waiting for EOS, return all responses.
+
+        With an expected number of responses, reading stops when they are
+        all complete (sized by Content-Length or chunked) and nothing more
+        comes during CLIENT_SOCKET_GRACE_MS, to catch extra or split
+        responses. Responses without size still wait for EOS or timeout.
+        Without a timeout argument and with CLIENT_ADAPTIVE_TIMEOUT the
+        timeouts are learned from the latency of the target (see
+        LatencyTracker), CLIENT_SOCKET_READ_TIMEOUT_MS is only used for the
+        first reads.
+        signatures are the strings searched in bodies bigger than
+        CLIENT_BODY_RETENTION_CAP, which are not fully retained.
+        Identical streams are parsed once if CLIENT_RESPONSES_CACHE_SIZE is
+        not 0, the returned Responses is then frozen and shared, use
+        cache=False to get a private one (if you modify it)."""
         output = ''
-        if timeout is None:
-            timeout = float(self.config.getint(
-                'CLIENT_SOCKET_READ_TIMEOUT_MS'))
-            timeout = timeout / 1000
+        timeout, idle, grace = self._read_timeouts(timeout, expected)
         if buffsize is None:
             buffsize = self.config.getint('CLIENT_SOCKET_READ_SIZE')
         try:
-            output = self._socket_read(timeout, buffsize)
+            output = self._socket_read(timeout, buffsize, expected, grace,
+                                       idle)
 
         except socket.error as msg:
             inmsg('#<====ABORTED RESPONSE WHILE READING: {0}'.format(str(msg)))
 
-        inmsg('# <====FINAL RESPONSE===============')
-        inmsg(output)
-        responses = Responses().parse(output)
-        return responses
+        # TLS 1.3 sessions come with the first reads
+        self._save_tls_session(self._ssl_object())
+        return self._parse_responses(output, signatures, cache)
 
     def _socket_send(self, message):
         msglen = len(message)
@@ -179,7 +362,11 @@ class Client(object):
                 raise RuntimeError("socket connection broken")
             totalsent = totalsent + sent
 
-    def _socket_read(self, timeout, buffsize):
+    def _socket_read(self, timeout, buffsize, expected=None, grace=None,
+                     idle=None):
+        """Read up to EOS or timeout. timeout is the timeout of the first
+        read, idle the one of the next reads (timeout if None), grace the
+        one after the expected responses."""
 
         inmsg('# <==== READING <===========')
         read = b''
@@ -187,19 +374,507 @@ class Client(object):
         # we use blocking socket, set short timeouts if you want
         # to detect end of response streams
         if 0 == timeout:
-            self._sock.settimeout(None)
-        else:
-            self._sock.settimeout(timeout)
+            timeout = None
+        if idle is None:
+            idle = timeout
+        self._sock.settimeout(timeout)
+        current = timeout
+        completed = False
+
+        # framing only (no messages kept), to detect complete responses
+        framing = None
+        if expected is not None:
+            framing = Responses(lazy_headers=True, tree=False)
+        tracker = self.get_latency_tracker()
+        target = self.target
 
         try:
 
             # blocking read
+            start = timer()
             data = self._sock.recv(buffsize)
+            if len(data):
+                tracker.record_first_byte(target, timer() - start)
             while (len(data)):
                 inmsg('# ...')
                 read += data
+                wait = idle
+                if framing is not None:
+                    framing.feed(data)
+                    completed = (framing.count >= expected
+                                 and framing.complete)
+                    if completed:
+                        wait = grace
+                if wait != current:
+                    self._sock.settimeout(wait)
+                    current = wait
+                start = timer()
                 data = self._sock.recv(buffsize)
+                if len(data):
+                    tracker.record_gap(target, timer() - start)
         except socket.timeout:
-            inmsg('# read timeout({0}), nothing more is coming'.format(
-                timeout))
+            if completed:
+                inmsg('# {0} complete response(s), nothing more is coming '
+                      'after {1}s'.format(framing.count, grace))
+            else:
+                inmsg('# read timeout({0}), nothing more is coming'.format(
+                    current))
         return read
+
+
+if asyncio is not None:
+
+    # asyncio.async() before python 3.4.4
+    ensure_future = getattr(asyncio, 'ensure_future', None)
+    if ensure_future is None:
+        ensure_future = getattr(asyncio, 'async')
+
+    def loop_argument(loop):
+        """loop= argument of the asyncio helpers (wait_for, sleep). Before
+        python 3.5.3 they use the default loop and not the running one,
+        the argument is deprecated in 3.8 and removed in 3.10."""
+        if sys.version_info < (3, 8):
+            return {'loop': loop}
+        return {}
+
+    class ClientProtocol(asyncio.Protocol):
+        "Forward the connection events to the AsyncClient."
+
+        def __init__(self, client):
+            self.client = client
+
+        def data_received(self, data):
+            self.client._data_received(data)
+
+        def eof_received(self):
+            self.client._eof_received()
+            # keep the sending part open (half-closed connection)
+            return True
+
+        def connection_lost(self, exc):
+            self.client._connection_lost(exc)
+
+    class ResponsesReader(object):
+        """One read_all() of an AsyncClient, see SocketClient._socket_read,
+        with timers instead of socket timeouts."""
+
+        def __init__(self, client, future, timeout, expected=None,
+                     grace=None, idle=None, signatures=(), cache=True):
+            self.client = client
+            self.future = future
+            self.signatures = signatures
+            self.cache = cache
+            if 0 == timeout:
+                timeout = None
+            if idle is None:
+                idle = timeout
+            self.timeout = timeout
+            self.idle = idle
+            self.grace = grace
+            self.expected = expected
+            self.current = timeout
+            self.completed = False
+            self.output = []
+            self.timer = None
+            # framing only (no messages kept), to detect complete responses
+            self.framing = None
+            if expected is not None:
+                self.framing = Responses(lazy_headers=True, tree=False)
+            self.tracker = client.get_latency_tracker()
+            self.target = client.target
+            self.start = timer()
+
+        def arm(self, wait):
+            "(Re)start the timer of the end of the read."
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.current = wait
+            if wait is not None:
+                self.timer = self.client.loop.call_later(wait,
+                                                         self.on_timeout)
+
+        def on_data(self, data):
+            now = timer()
+            if not self.output:
+                self.tracker.record_first_byte(self.target, now - self.start)
+            else:
+                self.tracker.record_gap(self.target, now - self.start)
+            self.start = now
+            inmsg('# ...')
+            self.output.append(data)
+            wait = self.idle
+            if self.framing is not None:
+                self.framing.feed(data)
+                self.completed = (self.framing.count >= self.expected
+                                  and self.framing.complete)
+                if self.completed:
+                    wait = self.grace
+            self.arm(wait)
+
+        def on_timeout(self):
+            self.timer = None
+            if self.completed:
+                inmsg('# {0} complete response(s), nothing more is coming '
+                      'after {1}s'.format(self.framing.count, self.grace))
+            else:
+                inmsg('# read timeout({0}), nothing more is coming'.format(
+                    self.current))
+            self.finish()
+
+        def finish(self):
+            "End of the read (timeout or EOS), parse the responses."
+            self.arm(None)
+            self.client._reader = None
+            # TLS 1.3 sessions come with the first reads
+            self.client._save_tls_session(self.client._ssl_object())
+            if self.future.cancelled():
+                return
+            try:
+                responses = self.client._parse_responses(
+                    b''.join(self.output), self.signatures, self.cache)
+            except Exception as error:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(responses)
+
+    class AsyncClient(BaseClient):
+        """HTTP Client on asyncio, HTTP request launcher.
+
+        Same features as the blocking Client (raw bytes, delayed sends,
+        half-close, read until idle or until the expected responses are
+        complete, TLS), but open(), send() and read_all() return futures, to
+        run many connections on one event loop:
+
+            client = AsyncClient(loop=loop)
+            yield from client.open()  # or await
+            yield from client.send(request)
+            responses = yield from client.read_all(expected=1)
+            client.close()
+
+        Bytes received between two read_all() are kept for the next one,
+        like in the socket receive buffer.
+        """
+
+        def __init__(self, host=None, port=None, hostip=None, loop=None):
+            super(AsyncClient, self).__init__(host, port, hostip)
+            self.loop = loop
+            self._transport = None
+            self._buffer = []
+            self._eof = False
+            self._reader = None
+            # done when the connection is lost
+            self._lost = None
+
+        def _future(self):
+            if self.loop is None:
+                self.loop = asyncio.get_event_loop()
+            create_future = getattr(self.loop, 'create_future', None)
+            if create_future is None:
+                return asyncio.Future(loop=self.loop)
+            return create_future()
+
+        def open(self, sock=None):
+            """Open client connection (or use the given connected socket),
+            the future gets this client."""
+            future = self._future()
+            self._lost = self._future()
+            self._check_target()
+            if sock is not None:
+                self._check_peer(sock)
+            context = None
+            server_hostname = None
+            # TLS after the TCP connection (timed handshake), python >= 3.7
+            start_tls = self.https and hasattr(self.loop, 'start_tls')
+            if self.https and not start_tls:
+                outmsg('# Establishing SSL layer')
+                context = self._ssl_context()
+                server_hostname = self.host
+                context.expect(self.tls_target)
+            start = timer()
+            if sock is None:
+                outmsg(
+                    '# Connecting to Host: {0} IP: {1} PORT: {2}'.format(
+                        self.host, self.hostip, self.port))
+                connection = self.loop.create_connection(
+                    lambda: ClientProtocol(self), self.hostip, self.port,
+                    ssl=context, server_hostname=server_hostname)
+            else:
+                connection = self.loop.create_connection(
+                    lambda: ClientProtocol(self), sock=sock,
+                    ssl=context, server_hostname=server_hostname)
+            connecting = ensure_future(
+                asyncio.wait_for(connection, 10,
+                                 **loop_argument(self.loop)),
+                loop=self.loop)
+
+            def connected(connecting):
+                if future.cancelled():
+                    if context is not None:
+                        context.cancel(self.tls_target)
+                    return
+                try:
+                    transport, protocol = connecting.result()
+                except Exception as msg:
+                    if context is not None:
+                        context.cancel(self.tls_target)
+                    outmsg("[ERROR] {0}".format(str(msg)))
+                    future.set_exception(
+                        Exception('error establishing socket connect'))
+                    return
+                if start_tls:
+                    self._start_tls(future, transport, protocol)
+                    return
+                self._transport = transport
+                if self.https:
+                    # TCP connection and handshake
+                    self._tls_handshake_done(self._ssl_object(),
+                                             timer() - start)
+                outmsg('# client connection established.')
+                future.set_result(self)
+
+            connecting.add_done_callback(connected)
+            return future
+
+        def _start_tls(self, future, transport, protocol):
+            "TLS handshake on the connected transport, then open() is done."
+            outmsg('# Establishing SSL layer')
+            start = timer()
+            context = self._ssl_context()
+            context.expect(self.tls_target)
+            starting = self.loop.start_tls(transport, protocol, context,
+                                           server_hostname=self.host)
+            upgrade = ensure_future(
+                asyncio.wait_for(starting, 10, **loop_argument(self.loop)),
+                loop=self.loop)
+
+            def upgraded(upgrade):
+                if future.cancelled():
+                    context.cancel(self.tls_target)
+                    transport.abort()
+                    return
+                try:
+                    self._transport = upgrade.result()
+                except Exception as msg:
+                    context.cancel(self.tls_target)
+                    transport.abort()
+                    outmsg("[SSL ERROR] {0}".format(str(msg)))
+                    future.set_exception(
+                        Exception('error establishing SSL connection'))
+                    return
+                self._tls_handshake_done(self._ssl_object(), timer() - start)
+                outmsg('# client connection established.')
+                future.set_result(self)
+
+            upgrade.add_done_callback(upgraded)
+
+        def _ssl_object(self):
+            if self._transport is None:
+                return None
+            return self._transport.get_extra_info('ssl_object')
+
+        def send(self, request):
+            """Send given request, support delayed emission. The future is
+            done when the last delayed chunk is written."""
+            future = self._future()
+            msg = request.getBytesStream()
+            self._log_request(request, msg)
+            if not self._write(msg):
+                future.set_result(None)
+                return future
+
+            def send_delayed():
+                if not request.is_delayed:
+                    future.set_result(None)
+                    return
+                (delay, msg) = request.getDelayedChunk()
+
+                def write_delayed():
+                    if future.cancelled():
+                        return
+                    self._log_delayed(msg)
+                    if not self._write(msg, delayed=True):
+                        future.set_result(None)
+                        return
+                    send_delayed()
+
+                self.loop.call_later(delay, write_delayed)
+
+            send_delayed()
+            return future
+
+        def _write(self, msg, delayed=False):
+            outmsg('# ====================>')
+            if self._closing():
+                outmsg('#<====ABORTED COMMUNICATION WHILE'
+                       ' SENDING{0} {1}\n#{2}'.format(
+                           ' (delayed)' if delayed else '',
+                           six.text_type(msg), 'closed connection'))
+                return False
+            self._transport.write(msg)
+            return True
+
+        def close_sending(self):
+            """First closing step, cut the sending part of the connection."""
+            outmsg('# closing client connection send canal '
+                   '(can still receive).')
+            if self._closing() or not self._transport.can_write_eof():
+                raise ClosedSocketError('closed socket detected on send close')
+            self._transport.write_eof()
+
+        def close(self):
+            """Ensure the connection is really closed, the future is done
+            when the connection is lost."""
+            if self._transport is not None:
+                outmsg('# closing client connection.')
+                self._save_tls_session(self._ssl_object())
+                self._transport.abort()
+                self._transport = None
+                return self._lost
+            future = self._future()
+            future.set_result(None)
+            return future
+
+        def read_all(self, timeout=None, buffsize=None, signatures=(),
+                     cache=True, expected=None):
+            """Read all the stream, waiting for EOS, the future gets all the
+            responses. See SocketClient.read_all(), buffsize is not used."""
+            future = self._future()
+            if self._reader is not None:
+                raise RuntimeError('read_all() already running')
+            timeout, idle, grace = self._read_timeouts(timeout, expected)
+            inmsg('# <==== READING <===========')
+            self._reader = ResponsesReader(self, future, timeout,
+                                           expected=expected, grace=grace,
+                                           idle=idle, signatures=signatures,
+                                           cache=cache)
+            buffered = b''.join(self._buffer)
+            self._buffer = []
+            if buffered:
+                self._reader.on_data(buffered)
+            else:
+                self._reader.arm(self._reader.timeout)
+            if self._eof or self._transport is None:
+                self._reader.finish()
+            return future
+
+        def is_alive(self):
+            """The connection can be reused: not closed by the server, and
+            no bytes waiting (a late response). Events already received by
+            the loop only, see BlockingClient.is_alive()."""
+            return (not self._closing()
+                    and not self._eof
+                    and not self._buffer
+                    and self._reader is None)
+
+        def _closing(self):
+            """The connection is closed, or lost. transport.is_closing() is
+            python >= 3.5.1, the lost connection is tracked here too."""
+            if self._transport is None:
+                return True
+            if self._lost is not None and self._lost.done():
+                return True
+            is_closing = getattr(self._transport, 'is_closing', None)
+            return is_closing is not None and is_closing()
+
+        def _data_received(self, data):
+            if self._reader is None:
+                self._buffer.append(data)
+            else:
+                self._reader.on_data(data)
+
+        def _eof_received(self):
+            self._eof = True
+            if self._reader is not None:
+                self._reader.finish()
+
+        def _connection_lost(self, exc):
+            self._eof = True
+            if self._lost is not None and not self._lost.done():
+                self._lost.set_result(exc)
+            if exc is not None:
+                inmsg('#<====ABORTED RESPONSE WHILE READING: {0}'.format(
+                    str(exc)))
+            if self._reader is not None:
+                self._reader.finish()
+
+    class BlockingClient(object):
+        """Main HTTP Client, HTTP request launcher.
+
+        Blocking API over an AsyncClient running on its own event loop."""
+
+        def __init__(self, host=None, port=None, hostip=None):
+            self._loop = asyncio.new_event_loop()
+            self._client = AsyncClient(host, port, hostip, loop=self._loop)
+
+        def __getattr__(self, name):
+            # settings (host, port, config...) are the ones of the client
+            if '_client' == name:
+                raise AttributeError(name)
+            return getattr(self._client, name)
+
+        def __setattr__(self, name, value):
+            if name in ('_loop', '_client'):
+                object.__setattr__(self, name, value)
+            else:
+                setattr(self._client, name, value)
+
+        def __enter__(self):
+            """Launch the socket opening."""
+            self.open()
+            return self
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            """Send a socket close."""
+            return self.close()
+
+        def _run(self, future):
+            return self._loop.run_until_complete(future)
+
+        def open(self, sock=None):
+            """Open client socket connection (or use the given connected
+            socket). On failure the event loop is closed, there is no
+            __exit__ when __enter__ fails."""
+            try:
+                self._run(self._client.open(sock))
+            except BaseException:
+                self.close()
+                raise
+
+        def send(self, request):
+            """Send given request on the socket, support delayed emission."""
+            self._run(self._client.send(request))
+
+        def close_sending(self):
+            """First closing step, cut the sending part of the socket."""
+            self._client.close_sending()
+
+        def is_alive(self):
+            """The connection can be reused, see AsyncClient.is_alive()."""
+            if self._loop.is_closed():
+                return False
+            # the loop only runs in our calls, get the waiting events
+            self._run(asyncio.sleep(0, **loop_argument(self._loop)))
+            return self._client.is_alive()
+
+        def read_all(self, timeout=None, buffsize=None, signatures=(),
+                     cache=True, expected=None):
+            """Read all the stream, see SocketClient.read_all()."""
+            return self._run(self._client.read_all(timeout=timeout,
+                                                   buffsize=buffsize,
+                                                   signatures=signatures,
+                                                   cache=cache,
+                                                   expected=expected))
+
+        def close(self):
+            """Ensure the connection is really closed, and the loop."""
+            if self._loop.is_closed():
+                return
+            self._run(self._client.close())
+            self._loop.close()
+
+    Client = BlockingClient
+
+else:
+    AsyncClient = None
+    Client = SocketClient
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Per-target latency observations and the read timeouts derived from them.
+
+The client records the time to the first byte of each response stream and
+the gaps between the received blocks. Once a target has enough samples, the
+read timeouts are a high percentile of its observations multiplied by a
+safety factor, bounded by the configured minimum and maximum. Before that
+the configured CLIENT_SOCKET_READ_TIMEOUT_MS is used.
+"""
+from collections import deque
+import math
+
+
+class LatencyTracker(object):
+    """Time to first byte and inter-block gaps, by target (host:port)."""
+
+    # observations kept by target (the most recent ones)
+    WINDOW = 200
+    MIN_SAMPLES = 5
+    PERCENTILE = 95
+    FACTOR = 3.0
+
+    def __init__(self, default, minimum, maximum):
+        "Timeouts are in seconds."
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.first_bytes = {}
+        self.gaps = {}
+
+    def _record(self, samples, target, seconds):
+        if target not in samples:
+            samples[target] = deque(maxlen=self.WINDOW)
+        samples[target].append(seconds)
+
+    def record_first_byte(self, target, seconds):
+        "Delay between the start of the read and the first received block."
+        self._record(self.first_bytes, target, seconds)
+
+    def record_gap(self, target, seconds):
+        "Delay between two received blocks of the same stream."
+        self._record(self.gaps, target, seconds)
+
+    @classmethod
+    def percentile(cls, values, percent=None):
+        "Nearest-rank percentile of the values."
+        if percent is None:
+            percent = cls.PERCENTILE
+        ordered = sorted(values)
+        rank = int(math.ceil(percent / 100.0 * len(ordered)))
+        return ordered[max(rank, 1) - 1]
+
+    def _timeout(self, samples, target):
+        values = samples.get(target, ())
+        if len(values) < self.MIN_SAMPLES:
+            return self.default
+        timeout = self.percentile(values) * self.FACTOR
+        return min(max(timeout, self.minimum), self.maximum)
+
+    def first_byte_timeout(self, target):
+        "Timeout of the first read of a stream."
+        return self._timeout(self.first_bytes, target)
+
+    def idle_timeout(self, target):
+        """Timeout of the next reads, detecting the end of the stream.
+
+        Streams received in one block have no gaps, the first byte timeout
+        is used until there are enough gap samples."""
+        if len(self.gaps.get(target, ())) < self.MIN_SAMPLES:
+            return self.first_byte_timeout(target)
+        return self._timeout(self.gaps, target)
+
+    def targets(self):
+        return sorted(set(self.first_bytes) | set(self.gaps))
+
+    def report(self):
+        "Lines of text with the timeouts of each target."
+        lines = []
+        for target in self.targets():
+            lines.append(
+                u'{0}: first byte timeout {1:.0f}ms ({2} samples), idle '
+                u'timeout {3:.0f}ms ({4} samples)'.format(
+                    target,
+                    self.first_byte_timeout(target) * 1000,
+                    len(self.first_bytes.get(target, ())),
+                    self.idle_timeout(target) * 1000,
+                    len(self.gaps.get(target, ()))))
+        return lines
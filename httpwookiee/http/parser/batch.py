@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Batch parsing of many streams, with columnar results.
+
+Each stream is parsed by a Requests or Responses object, then only some
+numbers are kept, in one array per column. Arrays are numpy arrays if numpy
+is installed, array.array otherwise, so a whole corpus can be classified
+with vectorized operations instead of walking the parsed objects.
+"""
+from httpwookiee.http.parser.errors import (error_bit, error_messages,
+                                            error_table)
+from httpwookiee.http.parser.message import Message
+from httpwookiee.http.parser.response import Response
+from httpwookiee.http.parser.responses import Responses
+import array
+import six
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# signed and unsigned 64 bits array types
+if six.PY2:
+    INT64, UINT64 = 'l', 'L'
+else:
+    INT64, UINT64 = 'q', 'Q'
+
+MAX_INT64 = (1 << 63) - 1
+
+
+class BatchResult(object):
+    """Columns of a batch parsing.
+
+    Stream columns (one row per stream):
+
+    - count: number of parsed messages
+    - stream_errors: errors bitmask of the Requests/Responses object
+    - first_message: row of the first message of the stream in the message
+      columns
+
+    Message columns (one row per message, streams after streams):
+
+    - stream: row of the stream
+    - code: status code (0 for requests)
+    - version: major * 10 + minor (11 for HTTP/1.1, -1 if not a number)
+    - framing: one of the FRAMING_* values
+    - content_length: Content-Length value, -1 without Content-Length
+      (values over 2**63 - 1 are clamped)
+    - chunks: number of chunk lines, last chunk included
+    - body_length: size of the body
+    - errors: errors bitmask of the message
+
+    Error bitmasks are the ones of the errors registry, error_table is a
+    copy of it (bit -> message) taken by the parsing, decode them with
+    error_messages(). They are stored as unsigned 64 bits integers while the
+    registry has less than 65 messages, as python integers after.
+    """
+
+    __slots__ = ('count', 'stream_errors', 'first_message', 'stream', 'code',
+                 'version', 'framing', 'content_length', 'chunks',
+                 'body_length', 'errors', 'error_table')
+
+    STREAM_COLUMNS = ('count', 'stream_errors', 'first_message')
+    MESSAGE_COLUMNS = ('stream', 'code', 'version', 'framing',
+                       'content_length', 'chunks', 'body_length', 'errors')
+
+    FRAMING_NONE = 0
+    FRAMING_LENGTH = 1
+    FRAMING_CHUNKED = 2
+    # responses without size, read up to the end of the stream
+    FRAMING_UNTIL_CLOSE = 3
+    FRAMING_HTTP09 = 4
+    FRAMING_NAMES = ('none', 'length', 'chunked', 'until_close', 'http09')
+
+    def __init__(self, columns, error_table=None):
+        for name in self.STREAM_COLUMNS + self.MESSAGE_COLUMNS:
+            setattr(self, name, columns[name])
+        self.error_table = error_table
+
+    def error_messages(self, flags):
+        "Messages of an errors bitmask of this result."
+        return error_messages(int(flags), self.error_table)
+
+    def __len__(self):
+        "Number of messages."
+        return len(self.stream)
+
+    @property
+    def streams(self):
+        "Number of streams."
+        return len(self.count)
+
+    def row(self, index):
+        "Message columns of one message, as a dict (for debug)."
+        return dict([(name, getattr(self, name)[index])
+                     for name in self.MESSAGE_COLUMNS])
+
+
+class BatchParser(object):
+    """Parse a sequence of buffers, or one buffer cut by an offsets array
+    (offsets[i] to offsets[i + 1] is the stream i, like numpy/arrow
+    offsets, with len(buffer) as last offset).
+
+        result = BatchParser(Responses).parse(buffers)
+        bad = result.code[result.framing == BatchResult.FRAMING_CHUNKED]
+
+    Headers are parsed in lazy mode (only framing headers are tokenized),
+    errors are the same.
+    """
+
+    def __init__(self, parser=Responses, lazy_headers=True, use_numpy=True):
+        self.parser = parser
+        self.lazy_headers = lazy_headers
+        self.use_numpy = use_numpy and numpy is not None
+
+    def parse(self, buffers, offsets=None):
+        "Parse the streams, return a BatchResult."
+        columns = dict([(name, []) for name in
+                        BatchResult.STREAM_COLUMNS
+                        + BatchResult.MESSAGE_COLUMNS])
+        for index, stream in enumerate(self._streams(buffers, offsets)):
+            messages = self.parser(lazy_headers=self.lazy_headers)
+            messages.parse(stream)
+            flags = 0
+            for error in messages.errors:
+                flags |= error_bit(error)
+            columns['count'].append(messages.count)
+            columns['stream_errors'].append(flags)
+            columns['first_message'].append(len(columns['stream']))
+            for message in messages.messages:
+                columns['stream'].append(index)
+                self._add_message(columns, message)
+        return BatchResult(dict([
+            (name, self._column(values, unsigned='errors' in name))
+            for name, values in columns.items()]), error_table())
+
+    def _streams(self, buffers, offsets):
+        if offsets is None:
+            for stream in buffers:
+                yield stream
+            return
+        if six.PY2:
+            view = buffers
+        else:
+            # no copy of the streams
+            view = memoryview(buffers)
+        for index in range(len(offsets) - 1):
+            yield view[offsets[index]:offsets[index + 1]]
+
+    def _add_message(self, columns, message):
+        if isinstance(message, Response):
+            columns['code'].append(self._number(message.code))
+        else:
+            columns['code'].append(0)
+        major = self._number(message.version_major)
+        minor = self._number(message.version_minor)
+        if major < 0 or minor < 0:
+            columns['version'].append(-1)
+        else:
+            columns['version'].append(major * 10 + minor)
+        if major == 0 and minor == 9:
+            framing = BatchResult.FRAMING_HTTP09
+        elif message.chunked:
+            framing = BatchResult.FRAMING_CHUNKED
+        elif message.has_cl:
+            framing = BatchResult.FRAMING_LENGTH
+        elif (message.get_expected_body_size()
+                == Message.READ_UNTIL_THE_END):
+            framing = BatchResult.FRAMING_UNTIL_CLOSE
+        else:
+            framing = BatchResult.FRAMING_NONE
+        columns['framing'].append(framing)
+        if message.has_cl:
+            columns['content_length'].append(min(message.body_size,
+                                                 MAX_INT64))
+        else:
+            columns['content_length'].append(-1)
+        columns['chunks'].append(len(message.chunks))
+        columns['body_length'].append(message.body_length)
+        columns['errors'].append(message.error_flags)
+
+    @staticmethod
+    def _number(value):
+        "Version numbers and codes, the automat may keep characters."
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return -1
+
+    def _column(self, values, unsigned=False):
+        try:
+            if self.use_numpy:
+                return numpy.array(values, dtype=(numpy.uint64 if unsigned
+                                                  else numpy.int64))
+            return array.array(UINT64 if unsigned else INT64, values)
+        except OverflowError:
+            # error bitmasks bigger than 64 bits
+            if self.use_numpy:
+                return numpy.array(values, dtype=object)
+            return list(values)
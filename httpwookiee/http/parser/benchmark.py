@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parser throughput benchmark.
+
+The corpus is built like the messages of the client and server tests:
+regular requests, first line separators, Content-Length and
+Transfer-Encoding combinations, chunk size truncations and overflows, and
+pipelined responses. Requests.parse and Responses.parse are measured on
+each family, in messages/s, bytes/s and peak allocations.
+
+Results are plain dicts, stored as JSON by the benchmark.py runner to
+compare commits.
+"""
+from httpwookiee.core.tools import Tools
+from httpwookiee.http.parser.requests import Requests
+from httpwookiee.http.parser.responses import Responses
+import platform
+import time
+try:
+    import tracemalloc
+except ImportError:
+    # python 2, no allocation measures
+    tracemalloc = None
+
+# separators of the first line tests (client/tests_first_line.py)
+FIRST_LINE_SEPARATORS = (Tools.SP, Tools.TAB, Tools.VTAB, Tools.FF,
+                         Tools.CR, Tools.BS, Tools.BEL, Tools.NULL,
+                         Tools.CR + Tools.SP, Tools.CR * 5,
+                         Tools.CR * 5 + Tools.LF, Tools.CRLF)
+
+# chunk sizes of the overflow tests (client/tests_chunks.py)
+CHUNK_OVERFLOWS = (65535, 65536, 4294967296, 18446744073709551616)
+
+LOCATION = u'/test/internal'
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def request(method=u'GET', location=LOCATION, method_sep=Tools.SP,
+            location_sep=Tools.SP, headers=(), body=u''):
+    "A request like the ones of http/request.py, as bytes."
+    out = u'{0}{1}{2}{3}HTTP/1.1{4}'.format(method, method_sep, location,
+                                            location_sep, Tools.CRLF)
+    for name, value in ((u'Host', u'internal'),
+                        (u'User-Agent', u'script-httpwookiee'),
+                        (u'X-Wookiee', u'1')) + tuple(headers):
+        out += u'{0}: {1}{2}'.format(name, value, Tools.CRLF)
+    out += Tools.CRLF + body
+    return out.encode('latin-1')
+
+
+def chunked_body(*chunks, **kwargs):
+    "Chunks with their sizes (or the given size), and the last chunk."
+    size = kwargs.get('size')
+    out = u''
+    for chunk in chunks:
+        if size is None:
+            chunk_size = hex(len(chunk))[2:]
+        else:
+            chunk_size = size
+        out += u'{0}{1}{2}{1}'.format(chunk_size, Tools.CRLF, chunk)
+    return out + u'0' + Tools.CRLF + Tools.CRLF
+
+
+def response(code=u'200 OK', headers=(), body=u''):
+    "A response of the internal server, as bytes."
+    out = u'HTTP/1.1 {0}{1}'.format(code, Tools.CRLF)
+    for name, value in ((u'Server', u'HTTPWookiee'), ) + tuple(headers):
+        out += u'{0}: {1}{2}'.format(name, value, Tools.CRLF)
+    out += Tools.CRLF + body
+    return out.encode('latin-1')
+
+
+def request_corpus():
+    "Family name -> list of request streams."
+    form = (u'Content-Type', u'application/x-www-form-urlencoded')
+    chunked = (u'Transfer-Encoding', u'chunked')
+    hidden = request(location=LOCATION + u'?a=b',
+                     headers=[(u'Content-Length', u'5')]).decode('latin-1')
+    corpus = {}
+
+    corpus['regular'] = [
+        request(),
+        request(u'HEAD'),
+        request(u'POST', headers=[form, (u'Content-Length', u'11')],
+                body=u'Hello=World'),
+        request(u'POST', headers=[chunked, form],
+                body=chunked_body(u'Hello', u'World')),
+        request(location=LOCATION + u'?foo=bar&wookiee=1'),
+    ]
+
+    corpus['first_line_separators'] = []
+    for separator in FIRST_LINE_SEPARATORS:
+        corpus['first_line_separators'] += [
+            request(method_sep=separator),
+            request(location_sep=separator),
+            request(u'POST', location_sep=separator,
+                    headers=[(u'Content-Length', u'0')])]
+
+    corpus['cl_te'] = [
+        # chunked and Content-Length covering the hidden query
+        request(u'POST', headers=[chunked, form,
+                                  (u'Content-Length',
+                                   u'{0}'.format(len(hidden) + 9))],
+                body=chunked_body(hidden)),
+        # wrong Content-Length before and after Transfer-Encoding
+        request(u'POST', headers=[(u'Content-Length', u'4'), chunked, form],
+                body=chunked_body(hidden)),
+        request(u'POST', headers=[chunked, (u'Content-Length', u'4'), form],
+                body=chunked_body(hidden)),
+        request(u'POST', headers=[(u'Transfer-Encoding', u'chunked, zorg'),
+                                  form],
+                body=chunked_body(u'Hello', u'World')),
+        request(u'POST', headers=[(u'Content-Length', u'5'),
+                                  (u'Content-Length', u'11')],
+                body=u'Hello=World'),
+        # chunked header hidden by a bad end of line
+        request(u'POST', headers=[(u'Dummy', u'Header\rTransfer-Encoding: '
+                                   u'chunked'),
+                                  (u'Content-Length',
+                                   u'{0}'.format(len(hidden)))],
+                body=hidden),
+    ]
+
+    corpus['chunk_overflows'] = [
+        # chunk size truncation (zeros prefix)
+        request(u'POST', headers=[chunked, form],
+                body=chunked_body(Tools.CRLF + hidden,
+                                  size=u'0' * 33 + hex(len(hidden) + 2)[2:]))]
+    for size in CHUNK_OVERFLOWS:
+        corpus['chunk_overflows'].append(
+            request(u'POST', headers=[chunked, form],
+                    body=chunked_body(Tools.CRLF + hidden,
+                                      size=hex(size)[2:].rstrip(u'L'))))
+    return corpus
+
+
+def response_corpus():
+    "Family name -> list of response streams."
+    content = u'Hello, World'
+    length = (u'Content-Length', u'{0}'.format(len(content)))
+    chunked = (u'Transfer-Encoding', u'chunked')
+    # sized responses, which can be pipelined
+    sized = [
+        response(headers=[length], body=content),
+        response(headers=[chunked], body=chunked_body(u'Hello', u', World')),
+        response(u'404 Not Found', headers=[(u'Content-Length', u'0')]),
+        response(u'301 Moved Permanently',
+                 headers=[(u'Location', LOCATION + u'/'), length],
+                 body=content),
+    ]
+    corpus = {}
+    corpus['regular'] = sized + [response(u'204 No Content'),
+                                 response(u'304 Not Modified')]
+    corpus['pipelined_responses'] = [
+        b''.join(sized) * 2,
+        b''.join(sized) * 20,
+        # no size, up to the end of the stream
+        b''.join(sized) + response(body=content * 100),
+    ]
+    return corpus
+
+
+def measure(parser, streams, repeat=10, rounds=5):
+    """Parse each stream repeat times with the parser class (Requests or
+    Responses), the best of some rounds is kept (like timeit).
+
+    A first pass is not measured (automats are compiled on first use), it
+    counts the parsed messages. Peak allocations are measured on one more
+    pass, when tracemalloc is available (python 3), they are None
+    otherwise."""
+    messages = 0
+    for stream in streams:
+        messages += parser().parse(stream).count
+    messages *= repeat
+    size = sum([len(stream) for stream in streams]) * repeat
+    seconds = None
+    for idx in range(rounds):
+        start = timer()
+        for loop in range(repeat):
+            for stream in streams:
+                parser().parse(stream)
+        elapsed = timer() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        for stream in streams:
+            parser().parse(stream)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'streams': len(streams) * repeat,
+            'messages': messages,
+            'bytes': size,
+            'seconds': seconds,
+            'messages_per_sec': messages / seconds if seconds else None,
+            'bytes_per_sec': size / seconds if seconds else None,
+            'peak_alloc_bytes': peak}
+
+
+def run(repeat=10, rounds=5):
+    "Measures of each corpus family, as a dict ready for JSON."
+    results = {}
+    for name, parser, corpus in (('requests', Requests, request_corpus()),
+                                 ('responses', Responses,
+                                  response_corpus())):
+        results[name] = {}
+        for family, streams in sorted(corpus.items()):
+            results[name][family] = measure(parser, streams,
+                                            repeat=repeat, rounds=rounds)
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'repeat': repeat,
+            'rounds': rounds,
+            'results': results}
+
+
+def compare(reference, current):
+    """Lines of text with the bytes/s of each family in both runs, and the
+    speedup (current / reference). Bytes are the same for both runs, not
+    the messages (incomplete or rejected streams)."""
+    lines = []
+    for name, families in sorted(current['results'].items()):
+        for family, stats in sorted(families.items()):
+            try:
+                old = reference['results'][name][family]['bytes_per_sec']
+            except KeyError:
+                old = None
+            new = stats['bytes_per_sec']
+            if old and new:
+                ratio = u'x{0:.2f}'.format(new / old)
+            else:
+                ratio = u'-'
+            lines.append(u'{0}/{1}: {2} -> {3} KB/s {4}'.format(
+                name, family,
+                u'-' if old is None else int(old / 1024),
+                u'-' if new is None else int(new / 1024),
+                ratio))
+    return lines
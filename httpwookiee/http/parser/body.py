@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+import zlib
+
+
+class BodySummary(object):
+    """What remains of a body bigger than the retention cap.
+
+    Only the length, a rolling adler32 checksum, the first and last bytes
+    (head and tail windows) and the offsets of some registered signatures
+    are kept. The ``in`` operator works on the signatures positions and
+    on the windows for other strings.
+    """
+
+    __slots__ = ('length', 'checksum', 'window', 'head', 'tail',
+                 'signatures', 'positions', '_carry', '_carry_size')
+
+    # data is read by blocks, bigger bodies are never copied at once
+    BLOCK_SIZE = 65536
+
+    def __init__(self, window=4096, signatures=()):
+        self.length = 0
+        self.checksum = zlib.adler32(b'') & 0xffffffff
+        self.window = window
+        self.head = b''
+        self.tail = b''
+        self.signatures = tuple(signatures)
+        # signature => list of offsets in the body
+        self.positions = dict((signature, []) for signature in signatures)
+        # end of the previous block, for signatures across blocks
+        self._carry = b''
+        self._carry_size = max([len(signature)
+                                for signature in self.signatures] + [1]) - 1
+
+    def __str__(self):
+        out = "[{0} bytes, adler32 {1:08x}]\n".format(self.length,
+                                                      self.checksum)
+        for signature in self.signatures:
+            out += "[signature {0}] {1}\n".format(signature,
+                                                  self.positions[signature])
+        out += "[head] {0}\n".format(self.head)
+        out += "[tail] {0}".format(self.tail)
+        return out
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, item):
+        if item in self.positions:
+            return len(self.positions[item]) > 0
+        return item in self.head or item in self.tail
+
+    def update(self, data):
+        "Add some bytes (bytes or memoryview) at the end of the body."
+        for start in range(0, len(data), self.BLOCK_SIZE):
+            block = data[start:start + self.BLOCK_SIZE]
+            if isinstance(block, memoryview):
+                block = block.tobytes()
+            self._update_block(block)
+        return self
+
+    def _update_block(self, block):
+        self.checksum = zlib.adler32(block, self.checksum) & 0xffffffff
+        if len(self.head) < self.window:
+            self.head += block[:self.window - len(self.head)]
+        text = self._carry + block
+        offset = self.length - len(self._carry)
+        for signature in self.signatures:
+            idx = text.find(signature)
+            while idx != -1:
+                # matches inside the carry were found with the previous block
+                if idx + len(signature) > len(self._carry):
+                    self.positions[signature].append(offset + idx)
+                idx = text.find(signature, idx + 1)
+        if self._carry_size:
+            self._carry = text[-self._carry_size:]
+        if self.window:
+            self.tail = (self.tail + block)[-self.window:]
+        self.length += len(block)
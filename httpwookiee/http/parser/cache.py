@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Content-addressed cache of parsed response streams.
+
+Targets send the same bytes again and again (error pages, default location
+content), the stream is parsed once and the parsing result is shared. Keys
+are a sha256 of the raw stream and the parsing options, values are frozen
+Responses objects (see Messages.freeze()), the least recently used one is
+dropped when the cache is full.
+"""
+from httpwookiee.http.parser.responses import Responses
+from collections import OrderedDict
+import hashlib
+import six
+
+
+class ResponsesCache(object):
+    """LRU cache of Responses.parse() results.
+
+        cache = ResponsesCache(size=256)
+        responses = cache.parse(stream, lazy_headers=True)
+
+    Returned objects are shared by all the callers asking for the same
+    stream, do not use the cache if the parsing result is modified.
+    """
+
+    def __init__(self, size=256, parser=Responses):
+        self.size = size
+        self.parser = parser
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        "Drop all entries and reset the counters."
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(stream, lazy_headers=False, body_cap=None, body_signatures=()):
+        "Cache key of a stream, parsing options included."
+        return (hashlib.sha256(six.binary_type(stream)).digest(),
+                len(stream), lazy_headers, body_cap, tuple(body_signatures))
+
+    def parse(self, stream, lazy_headers=False, body_cap=None,
+              body_signatures=()):
+        "Parsed stream, frozen, from the cache if possible."
+        key = self.key(stream, lazy_headers, body_cap, body_signatures)
+        try:
+            messages = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            messages = self.parser(lazy_headers=lazy_headers,
+                                   body_cap=body_cap,
+                                   body_signatures=body_signatures)
+            messages.parse(stream).freeze()
+            if self.size <= 0:
+                return messages
+            while len(self._entries) >= self.size:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+        # most recently used entries at the end
+        self._entries[key] = messages
+        return messages
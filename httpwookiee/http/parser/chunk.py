@@ -1,15 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 #
-import string
+from httpwookiee.core import charsets
 from httpwookiee.core.tools import Tools
+from httpwookiee.http.parser.errors import error_bit
 from httpwookiee.http.parser.line import Line
-from httpwookiee.http.parser.exceptions import PrematureEndOfStream
+import re
 import sys
 
 
 class Chunk(Line):
 
+    __slots__ = ('size', 'real_size', 'nb_zero_prefix', 'has_trailer',
+                 'trailer', 'is_last_chunk')
+
     # STATUS_START = 0
     STATUS_SIZE_START = 1
     STATUS_SIZE = 2
@@ -23,6 +27,27 @@ class Chunk(Line):
     ERROR_BAD_CHUNK_SIZE = 'Bad chunk size'
     ERROR_BAD_TRAILER = 'Bad trailer part'
     ERROR_EXTRA_CHARACTERS = 'Has some extra characters'
+    ERROR_SIZE_OVERFLOW_32 = 'Chunk size overflows 32 bits'
+    ERROR_SIZE_OVERFLOW_64 = 'Chunk size overflows 64 bits'
+
+    MAX_SIZE_32 = 0xFFFFFFFF
+    MAX_SIZE_64 = 0xFFFFFFFFFFFFFFFF
+    # real_size stops growing at this value, the size string is still
+    # complete but a bogus size cannot produce an arbitrary big integer.
+    SIZE_CAP = MAX_SIZE_64 + 1
+
+    AUTOMAT = {Line.STATUS_START: 'step_start',
+               STATUS_SIZE_START: 'step_size_start',
+               STATUS_SIZE: 'step_size',
+               STATUS_AFTER_SIZE: 'step_after_size',
+               STATUS_TRAILER: 'step_read_trailer',
+               Line.STATUS_AFTER_CR: 'step_wait_for_lf',
+               Line.STATUS_END: 'step_end'}
+
+    RUN_STATES = {}
+
+    # chunk-size CRLF, without extension
+    STRICT_REGEX = re.compile(b'(0*)([0-9A-Fa-f]*)\\r\\n\\Z')
 
     def __str__(self):
         out = ''
@@ -48,7 +73,7 @@ class Chunk(Line):
             if self.has_trailer:
                 out += "[{0} ({1})] ;[{2}] [{3}]\n".format(
                     self.size,
-                    int(self.size, 16),
+                    self.real_size,
                     self.trailer,
                     self.eof)
             else:
@@ -67,8 +92,28 @@ class Chunk(Line):
         self.trailer = u''
         self.is_last_chunk = False
 
-    def _add_size_char(self, char, start=False):
-        if '0' == char and start:
+    def parse_strict(self):
+        match = self.STRICT_REGEX.match(self.raw)
+        if match is None:
+            return False
+        zeros, size = match.groups()
+        if len(zeros) > 5 or (zeros == b'' and size == b''):
+            return False
+        if len(size) > 8:
+            # may overflow 32 bits, let the automat report it
+            return False
+        self.nb_zero_prefix = len(zeros)
+        if size == b'':
+            self.is_last_chunk = True
+        else:
+            self.size += size.decode('ascii')
+            self.real_size = int(self.size, 16)
+        self.eof = u'[CR][LF]'
+        self.readidx = len(self.raw)
+        return True
+
+    def _add_size_byte(self, byte, start=False):
+        if charsets.ZERO == byte and start:
             self.nb_zero_prefix += 1
             self.is_last_chunk = True
             if self.nb_zero_prefix > 5:
@@ -78,36 +123,46 @@ class Chunk(Line):
             return self.STATUS_SIZE_START
         else:
             self.is_last_chunk = False
-            self.size += char
-            # TODO: check for python overflow
-            self.real_size = int(self.size, 16)
+            self.size += self.TEXT[byte]
+            if self.real_size < self.SIZE_CAP:
+                self._accumulate_size(charsets.HEX_VALUE[byte])
             return self.STATUS_SIZE
 
-    def step_start(self, char):
-        if ' ' == char or '\t' == char:
+    def _accumulate_size(self, digit):
+        "Add one hex digit to real_size, marking 32 and 64 bits overflows."
+        size = (self.real_size << 4) | digit
+        if size > self.MAX_SIZE_32:
+            self.setError(self.ERROR_SIZE_OVERFLOW_32, critical=False)
+            if size > self.MAX_SIZE_64:
+                self.setError(self.ERROR_SIZE_OVERFLOW_64, critical=False)
+                size = self.SIZE_CAP
+        self.real_size = size
+
+    def step_start(self, byte):
+        if charsets.SP == byte or charsets.HTAB == byte:
             # spaces before name
             self.setError(self.ERROR_BAD_CHUNK_START, critical=False)
             return self.STATUS_START
-        if char in string.hexdigits:
-            return self._add_size_char(char, start=True)
+        if charsets.HEXDIG[byte]:
+            return self._add_size_byte(byte, start=True)
         self.setError(self.ERROR_BAD_CHUNK_HEADER)
         self.setError(self.ERROR_BAD_CHUNK_SIZE)
         return self.STATUS_END
 
-    def step_size_start(self, char):
-        if char in string.hexdigits:
-            return self._add_size_char(char, start=True)
-        if ' ' == char:
+    def step_size_start(self, byte):
+        if charsets.HEXDIG[byte]:
+            return self._add_size_byte(byte, start=True)
+        if charsets.SP == byte:
             return self.STATUS_AFTER_SIZE
-        if '\t' == char:
+        if charsets.HTAB == byte:
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             return self.STATUS_AFTER_SIZE
-        if ';' == char:
+        if charsets.SEMICOLON == byte:
             return self.STATUS_TRAILER
-        if '\r' == char:
+        if charsets.CR == byte:
             self.eof += u'[CR]'
             return self.STATUS_AFTER_CR
-        if '\n' == char:
+        if charsets.LF == byte:
             self.setError(self.ERROR_LF_WITHOUT_CR, critical=False)
             self.eof += u'[LF]'
             return self.STATUS_END
@@ -115,20 +170,20 @@ class Chunk(Line):
         self.setError(self.ERROR_BAD_CHUNK_HEADER)
         return self.STATUS_END
 
-    def step_size(self, char):
-        if char in string.hexdigits:
-            return self._add_size_char(char)
-        if ' ' == char:
+    def step_size(self, byte):
+        if charsets.HEXDIG[byte]:
+            return self._add_size_byte(byte)
+        if charsets.SP == byte:
             return self.STATUS_AFTER_SIZE
-        if '\t' == char:
+        if charsets.HTAB == byte:
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             return self.STATUS_AFTER_SIZE
-        if ';' == char:
+        if charsets.SEMICOLON == byte:
             return self.STATUS_TRAILER
-        if '\r' == char:
+        if charsets.CR == byte:
             self.eof += u'[CR]'
             return self.STATUS_AFTER_CR
-        if '\n' == char:
+        if charsets.LF == byte:
             self.setError(self.ERROR_LF_WITHOUT_CR, critical=False)
             self.eof += u'[LF]'
             return self.STATUS_END
@@ -136,18 +191,18 @@ class Chunk(Line):
         self.setError(self.ERROR_BAD_CHUNK_HEADER)
         return self.STATUS_END
 
-    def step_after_size(self, char):
-        if ';' == char:
+    def step_after_size(self, byte):
+        if charsets.SEMICOLON == byte:
             return self.STATUS_TRAILER
-        if ' ' == char or '\t' == char:
-            if '\t' == char:
+        if charsets.SP == byte or charsets.HTAB == byte:
+            if charsets.HTAB == byte:
                 self.setError(self.ERROR_BAD_SPACE, critical=False)
             self.setError(self.ERROR_EXTRA_CHARACTERS, critical=False)
             return self.STATUS_AFTER_SIZE
-        if '\r' == char:
+        if charsets.CR == byte:
             self.eof += u'[CR]'
             return self.STATUS_AFTER_CR
-        if '\n' == char:
+        if charsets.LF == byte:
             self.setError(self.ERROR_LF_WITHOUT_CR, critical=False)
             self.eof += u'[LF]'
             return self.STATUS_END
@@ -155,40 +210,23 @@ class Chunk(Line):
         self.setError(self.ERROR_BAD_CHUNK_HEADER)
         return self.STATUS_END
 
-    def step_read_trailer(self, char):
-        if '\r' == char:
+    def step_read_trailer(self, byte):
+        if charsets.CR == byte:
             self.eof += u'[CR]'
             return self.STATUS_AFTER_CR
-        if '\n' == char:
+        if charsets.LF == byte:
             self.setError(self.ERROR_LF_WITHOUT_CR, critical=False)
             self.eof += u'[LF]'
             return self.STATUS_END
         self.has_trailer = True
-        self.trailer += char
+        self.trailer += self.TEXT[byte]
         return self.STATUS_TRAILER
 
-    def tokenize(self):
-        status = self.STATUS_START
-        automat = {self.STATUS_START: 'step_start',
-                   self.STATUS_SIZE_START: 'step_size_start',
-                   self.STATUS_SIZE: 'step_size',
-                   self.STATUS_AFTER_SIZE: 'step_after_size',
-                   self.STATUS_TRAILER: 'step_read_trailer',
-                   self.STATUS_AFTER_CR: 'step_wait_for_lf',
-                   self.STATUS_END: 'step_end'}
-        while self.STATUS_END != status:
-            try:
-                char = self.read_char()
-            except IndexError:
-                raise PrematureEndOfStream
-            if status not in automat:
-                raise ValueError('Status {0} is not managed in {1}'.format(
-                    status, self.__class__.__name__))
-            # print('char:<<<<{0}>>>, step: {1}'.format(char, automat[status]))
-            status = getattr(self, automat[status])(char)
-
     def setError(self, msgidx, critical=True):
-        self.errors[msgidx] = True
+        self.error_flags |= error_bit(msgidx)
         if critical:
             self.valid = False
         self.error = True
+
+
+Chunk.compile_automat()
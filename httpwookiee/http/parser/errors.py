@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Registry of parser error messages.
+
+Parsed objects store their errors as an integer bitmask. Bits of the
+ERROR_* messages of the parse objects are given in sorted order before the
+first one is used, so bitmasks mean the same thing on each run; other
+messages get the next bits on first use. ErrorSet gives back a read-only
+set-like view on the messages (``Header.ERROR_EMPTY_NAME in header.errors``).
+"""
+import importlib
+import six
+import threading
+
+_BITS = {}
+_MESSAGES = {}
+_LOCK = threading.RLock()
+_REGISTERED = []
+
+# modules of the parse objects storing their errors in bitmasks
+_MODULES = ('chunk', 'firstheader', 'header', 'line', 'message', 'messages',
+            'request', 'requests', 'response', 'responses')
+
+
+def _add(message):
+    if message not in _BITS:
+        bit = 1 << len(_BITS)
+        _MESSAGES[bit] = message
+        _BITS[message] = bit
+
+
+def _register_all():
+    "Bits of the ERROR_* messages of the parse objects, in sorted order."
+    with _LOCK:
+        if _REGISTERED:
+            return
+        messages = set()
+        for name in _MODULES:
+            module = importlib.import_module('httpwookiee.http.parser.'
+                                             + name)
+            for obj in list(vars(module).values()):
+                if (not isinstance(obj, type)
+                        or obj.__module__ != module.__name__):
+                    continue
+                for attr in dir(obj):
+                    value = getattr(obj, attr)
+                    if (attr.startswith('ERROR_')
+                            and isinstance(value, six.string_types)):
+                        messages.add(value)
+        for message in sorted(messages):
+            _add(message)
+        _REGISTERED.append(True)
+
+
+def error_bit(message):
+    "Bit flag of an error message."
+    try:
+        return _BITS[message]
+    except KeyError:
+        _register_all()
+        with _LOCK:
+            _add(message)
+            return _BITS[message]
+
+
+def error_table():
+    "Copy of the registry, bit -> message."
+    _register_all()
+    with _LOCK:
+        return dict(_MESSAGES)
+
+
+def error_messages(flags, table=None):
+    """Sorted list of the error messages set in the bitmask, table is a
+    bit -> message dict (the registry by default)."""
+    if table is None:
+        table = _MESSAGES
+    messages = []
+    bit = 1
+    while bit <= flags:
+        if flags & bit:
+            messages.append(table[bit])
+        bit = bit << 1
+    return sorted(messages)
+
+
+class ErrorSet(object):
+    """Read-only set-like view of an errors bitmask.
+
+    Iteration is sorted on messages. For compatibility with the old errors
+    dictionaries items() returns (message, True) tuples, and an ErrorSet is
+    equal to any container of the same messages ({} for no errors).
+    """
+
+    __slots__ = ('flags', )
+
+    def __init__(self, flags=0):
+        self.flags = flags
+
+    def __contains__(self, message):
+        bit = _BITS.get(message)
+        return bit is not None and bool(self.flags & bit)
+
+    def __iter__(self):
+        return iter(error_messages(self.flags))
+
+    def __len__(self):
+        return bin(self.flags).count('1')
+
+    def __bool__(self):
+        return self.flags != 0
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if isinstance(other, ErrorSet):
+            return self.flags == other.flags
+        try:
+            return set(error_messages(self.flags)) == set(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def keys(self):
+        return error_messages(self.flags)
+
+    def items(self):
+        return [(message, True) for message in error_messages(self.flags)]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
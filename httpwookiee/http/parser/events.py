@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+
+
+class MessageEvents(object):
+    """Callbacks of the streaming parser, see the events argument of
+    Messages. Override the events you need, the others do nothing.
+
+    Lines, names and values are slices of the parsed buffer (bytes or
+    memoryviews), do not keep them if the buffer is released. Flags are the
+    error bitmasks of the parsed objects (see errors.py), 0 when the line is
+    strictly valid.
+
+    With Messages(tree=False) the parser keeps only what is needed for the
+    framing, the events are the only way to get the messages content.
+    """
+
+    def on_message_start(self, start):
+        "A message starts at this stream offset."
+        pass
+
+    def on_first_line(self, line, start):
+        "Request or response line (with line ending), and stream offset."
+        pass
+
+    def on_header(self, name, value, flags):
+        """A header line, name is empty for lines without separator.
+        Obs-fold lines come with the Header.ERROR_MULTILINE_OPTIONAL
+        flag."""
+        pass
+
+    def on_chunk_header(self, line, size, flags):
+        "Chunk size line (with line ending) and the size of the chunk."
+        pass
+
+    def on_body_segment(self, data):
+        "Some bytes of the body, the whole body or one chunk."
+        pass
+
+    def on_message_complete(self, errors):
+        "End of the message, with the ErrorSet of the message."
+        pass
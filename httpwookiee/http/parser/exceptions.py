@@ -7,6 +7,11 @@ class EndOfBufferError(Exception):
     pass
 
 
+class IncompleteBufferError(Exception):
+    """Incremental parsing needs more bytes to go further."""
+    pass
+
+
 class PrematureEndOfStream(Exception):
     """We reach the End before expected."""
     pass
@@ -15,3 +20,13 @@ class PrematureEndOfStream(Exception):
 class OptionalCRLFSeparator(Exception):
     """Exception used to detect extra separator between messages."""
     pass
+
+
+class TokenizerMismatchError(Exception):
+    """Compiled and reference line automats disagree (cross-check mode)."""
+    pass
+
+
+class FrozenMessagesError(Exception):
+    """A frozen (shared) parsing result cannot be updated."""
+    pass
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Framing of a requests stream by several HTTP agents at once.
+
+Smuggling issues are two agents framing the same bytes differently. A
+FramingProfile describes the choices of one agent (Content-Length versus
+Transfer-Encoding priority, bare LF line endings, chunked detection, etc.),
+the FramingEngine computes the message boundaries of all the profiles in one
+pass on the buffer: lines, headers and chunk sizes are tokenized once and
+shared by the profiles, the profiles only differ on the decisions. The
+FramingReport gives the places where the profiles do not agree.
+"""
+from httpwookiee.http.parser.chunk import Chunk
+from httpwookiee.http.parser.errors import error_bit
+from collections import OrderedDict
+import re
+import six
+
+
+class FramingProfile(object):
+    """Framing choices of an HTTP agent.
+
+    - bare_lf: LF alone is accepted as a line ending, else it is rejected
+    - obs_fold: header lines starting with a space, 'reject', 'ignore', or
+      'fold' (value added to the previous header)
+    - space_before_colon: 'Transfer-Encoding : chunked' headers, 'reject',
+      'ignore' (unknown header) or 'accept'
+    - invalid_header: header lines without separator, 'reject' or 'ignore'
+    - te_match: chunked detection, 'exact' (last coding is chunked),
+      'suffix' (value ends with chunked) or 'substring' (chunked anywhere)
+    - unknown_te: Transfer-Encoding without chunked, 'reject' or 'ignore'
+    - cl_and_te: both headers, 'reject', 'te' (chunked wins) or 'cl'
+    - double_cl: different Content-Length values, 'reject', 'first' or
+      'last'
+    - cl_parse: 'strict' (digits only) or 'atoi' (leading digits)
+    - chunk_errors: chunk size lines, 'reject' any error or only 'invalid'
+      ones
+    - chunk_data_end: after chunk data, 'strict' (line ending only) or
+      'line' (skip everything up to the next LF)
+    """
+
+    __slots__ = ('name', 'bare_lf', 'obs_fold', 'space_before_colon',
+                 'invalid_header', 'te_match', 'unknown_te', 'cl_and_te',
+                 'double_cl', 'cl_parse', 'chunk_errors', 'chunk_data_end')
+
+    def __init__(self, name, bare_lf=True, obs_fold='reject',
+                 space_before_colon='reject', invalid_header='reject',
+                 te_match='exact', unknown_te='reject', cl_and_te='te',
+                 double_cl='reject', cl_parse='strict', chunk_errors='reject',
+                 chunk_data_end='strict'):
+        self.name = name
+        self.bare_lf = bare_lf
+        self.obs_fold = obs_fold
+        self.space_before_colon = space_before_colon
+        self.invalid_header = invalid_header
+        self.te_match = te_match
+        self.unknown_te = unknown_te
+        self.cl_and_te = cl_and_te
+        self.double_cl = double_cl
+        self.cl_parse = cl_parse
+        self.chunk_errors = chunk_errors
+        self.chunk_data_end = chunk_data_end
+
+    def __str__(self):
+        return self.name
+
+
+# Approximations of some well known behaviors, not exact models.
+STRICT_RFC = FramingProfile('strict-rfc',
+                            bare_lf=False,
+                            cl_and_te='reject')
+APACHE_LIKE = FramingProfile('apache-like',
+                             obs_fold='fold')
+NGINX_LIKE = FramingProfile('nginx-like',
+                            obs_fold='ignore',
+                            space_before_colon='ignore',
+                            invalid_header='ignore')
+LEGACY_LENIENT = FramingProfile('legacy-lenient',
+                                obs_fold='fold',
+                                space_before_colon='accept',
+                                invalid_header='ignore',
+                                te_match='substring',
+                                unknown_te='ignore',
+                                cl_and_te='cl',
+                                double_cl='last',
+                                cl_parse='atoi',
+                                chunk_errors='invalid',
+                                chunk_data_end='line')
+
+PROFILES = (STRICT_RFC, APACHE_LIKE, NGINX_LIKE, LEGACY_LENIENT)
+
+
+class Frame(object):
+    """One message as framed by a profile.
+
+    Offsets are buffer offsets, end is None for rejected and incomplete
+    messages (the agent stops there)."""
+
+    __slots__ = ('start', 'body_start', 'end', 'framing', 'error')
+
+    NONE = 'none'
+    LENGTH = 'length'
+    CHUNKED = 'chunked'
+    HTTP09 = 'http09'
+    REJECTED = 'rejected'
+    INCOMPLETE = 'incomplete'
+
+    def __init__(self, start, body_start=None, end=None, framing=NONE,
+                 error=None):
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+        self.framing = framing
+        self.error = error
+
+    def __str__(self):
+        out = "[{0}-{1}] {2}".format(self.start, self.end, self.framing)
+        if self.error is not None:
+            out += " <{0}>".format(self.error)
+        return out
+
+    def __eq__(self, other):
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def key(self):
+        return (self.start, self.end, self.framing)
+
+    @property
+    def accepted(self):
+        return self.framing not in (self.REJECTED, self.INCOMPLETE)
+
+
+class FramingReport(object):
+    "Frames of each profile (profile name => list of Frame)."
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __str__(self):
+        out = ''
+        for name, frames in self.frames.items():
+            out += "[{0}]\n".format(name)
+            for frame in frames:
+                out += " {0}\n".format(frame)
+        for index, frames in self.disagreements():
+            out += "**Message {0} framed differently**\n".format(index)
+            for name, frame in frames.items():
+                out += " {0}: {1}\n".format(name, frame)
+        return out
+
+    @property
+    def agree(self):
+        return not self.disagreements()
+
+    def disagreements(self):
+        """Messages framed differently, list of (index, frames) where frames
+        is a profile name => Frame (None if no such message) dictionary."""
+        out = []
+        count = max([len(frames) for frames in self.frames.values()] + [0])
+        for index in range(count):
+            frames = OrderedDict()
+            for name, profile_frames in self.frames.items():
+                if index < len(profile_frames):
+                    frames[name] = profile_frames[index]
+                else:
+                    frames[name] = None
+            keys = set([None if frame is None else frame.key()
+                        for frame in frames.values()])
+            if len(keys) > 1:
+                out.append((index, frames))
+        return out
+
+    def smuggled_starts(self):
+        """Offsets of messages accepted by some profiles only, with the
+        names of these profiles. That's where a hidden request starts."""
+        starts = OrderedDict()
+        for name, frames in self.frames.items():
+            for frame in frames:
+                if frame.accepted:
+                    starts.setdefault(frame.start, []).append(name)
+        return OrderedDict([(start, names)
+                            for start, names in sorted(starts.items())
+                            if len(names) < len(self.frames)])
+
+
+class FramingEngine(object):
+    """Frame a buffer of requests with several profiles.
+
+    Profiles run together, the one with the smallest read offset goes first,
+    so the buffer is read forward once. Tokenized lines are cached by
+    offset and shared by all profiles."""
+
+    ERROR_BARE_LF = 'LF without CR'
+    ERROR_OBS_FOLD = 'Obsolete line folding'
+    ERROR_SPACE_BEFORE_SEP = 'Space before header separator'
+    ERROR_INVALID_HEADER = 'Invalid header line'
+    ERROR_BAD_CONTENT_LENGTH = 'Invalid Content-Length'
+    ERROR_DOUBLE_CONTENT_LENGTH = 'Different Content-Length values'
+    ERROR_BAD_TRANSFER_ENCODING = 'Transfer-Encoding without final chunked'
+    ERROR_CONTENT_LENGTH_AND_CHUNKED = 'Has Content-length and chunks'
+    ERROR_BAD_CHUNK = 'Bad chunk size line'
+    ERROR_BAD_CHUNK_END = 'Bad chunk data termination'
+
+    LEADING_DIGITS = re.compile(b'[0-9]*')
+
+    LINE_EMPTY = 0
+    LINE_HEADER = 1
+    LINE_FOLD = 2
+    LINE_INVALID = 3
+
+    def __init__(self, profiles=PROFILES):
+        self.profiles = tuple(profiles)
+        self.buffer = b''
+        self._lines = {}
+        self._headers = {}
+        self._chunks = {}
+
+    def scan(self, buffer):
+        "Frame the whole buffer with all the profiles, return a report."
+        self.buffer = six.binary_type(buffer)
+        self._lines = {}
+        self._headers = {}
+        self._chunks = {}
+        frames = OrderedDict()
+        # running profiles: [offset, generator, frames list]
+        running = []
+        for profile in self.profiles:
+            frames[profile.name] = []
+            running.append([0, self._frames(profile), frames[profile.name]])
+        while running:
+            current = min(running, key=lambda state: state[0])
+            try:
+                frame = next(current[1])
+            except StopIteration:
+                running.remove(current)
+                continue
+            current[2].append(frame)
+            if frame.end is None:
+                running.remove(current)
+            else:
+                current[0] = frame.end
+        return FramingReport(frames)
+
+    def _line(self, offset):
+        """End of the line starting at offset (None if the line is not
+        terminated) and bare LF flag."""
+        try:
+            return self._lines[offset]
+        except KeyError:
+            pass
+        end = self.buffer.find(b'\n', offset)
+        if end == -1:
+            line = (None, False)
+        else:
+            line = (end + 1, self.buffer[end - 1:end] != b'\r'
+                    or end == offset)
+        self._lines[offset] = line
+        return line
+
+    def _header(self, offset, end):
+        """Tokenized header line: (kind, upper case name, value, space before
+        separator flag)."""
+        try:
+            return self._headers[offset]
+        except KeyError:
+            pass
+        content = self.buffer[offset:end].rstrip(b'\r\n')
+        if content == b'':
+            header = (self.LINE_EMPTY, None, None, False)
+        elif content[:1] in (b' ', b'\t'):
+            header = (self.LINE_FOLD, None, content.strip(b' \t'), False)
+        elif b':' not in content:
+            header = (self.LINE_INVALID, None, None, False)
+        else:
+            name, value = content.split(b':', 1)
+            stripped = name.rstrip(b' \t')
+            header = (self.LINE_HEADER, stripped.upper(),
+                      value.strip(b' \t'), stripped != name)
+        self._headers[offset] = header
+        return header
+
+    def _chunk(self, offset, end):
+        "Chunk size line parsed with the Chunk object."
+        try:
+            return self._chunks[offset]
+        except KeyError:
+            chunk = Chunk().parse(self.buffer[offset:end])
+            self._chunks[offset] = chunk
+            return chunk
+
+    def _read_line(self, profile, offset):
+        """Line end for this profile, or the Frame error (incomplete stream
+        or rejected bare LF)."""
+        end, bare_lf = self._line(offset)
+        if end is None:
+            return None, Frame.INCOMPLETE, None
+        if bare_lf and not profile.bare_lf:
+            return None, Frame.REJECTED, self.ERROR_BARE_LF
+        return end, None, None
+
+    def _frames(self, profile):
+        "Frames of one profile, a rejected or incomplete frame ends it."
+        size = len(self.buffer)
+        offset = 0
+        while True:
+            # empty lines before the request line are ignored
+            while offset < size:
+                end, bare_lf = self._line(offset)
+                if end is None or self.buffer[offset:end] not in (b'\r\n',
+                                                                  b'\n'):
+                    break
+                if bare_lf and not profile.bare_lf:
+                    yield Frame(offset, framing=Frame.REJECTED,
+                                error=self.ERROR_BARE_LF)
+                    return
+                offset = end
+            if offset >= size:
+                return
+            frame = self._frame(profile, offset)
+            yield frame
+            if frame.end is None:
+                return
+            offset = frame.end
+
+    def _frame(self, profile, start):
+        "Frame of the message starting at this offset."
+        end, framing, error = self._read_line(profile, start)
+        if end is None:
+            return Frame(start, framing=framing, error=error)
+        if b' HTTP/' not in self.buffer[start:end]:
+            return Frame(start, end, end, Frame.HTTP09)
+
+        # headers, only the framing ones are kept
+        lengths = []
+        encodings = []
+        last = None
+        offset = end
+        while True:
+            end, framing, error = self._read_line(profile, offset)
+            if end is None:
+                return Frame(start, framing=framing, error=error)
+            kind, name, value, space = self._header(offset, end)
+            offset = end
+            if self.LINE_EMPTY == kind:
+                break
+            if self.LINE_FOLD == kind:
+                if 'reject' == profile.obs_fold:
+                    return Frame(start, framing=Frame.REJECTED,
+                                 error=self.ERROR_OBS_FOLD)
+                if 'fold' == profile.obs_fold and last is not None:
+                    last[-1] = (last[-1] + b' ' + value).strip(b' ')
+                continue
+            last = None
+            if self.LINE_INVALID == kind:
+                if 'reject' == profile.invalid_header:
+                    return Frame(start, framing=Frame.REJECTED,
+                                 error=self.ERROR_INVALID_HEADER)
+                continue
+            if space:
+                if 'reject' == profile.space_before_colon:
+                    return Frame(start, framing=Frame.REJECTED,
+                                 error=self.ERROR_SPACE_BEFORE_SEP)
+                if 'ignore' == profile.space_before_colon:
+                    continue
+            if b'CONTENT-LENGTH' == name:
+                lengths.append(value)
+                last = lengths
+            elif b'TRANSFER-ENCODING' == name:
+                encodings.append(value)
+                last = encodings
+        body_start = offset
+
+        framing, body_size, error = self._framing(profile, lengths,
+                                                  encodings)
+        if error is not None:
+            return Frame(start, body_start, framing=Frame.REJECTED,
+                         error=error)
+        if Frame.CHUNKED == framing:
+            return self._chunked_frame(profile, start, body_start)
+        end = body_start + body_size
+        if end > len(self.buffer):
+            return Frame(start, body_start, framing=Frame.INCOMPLETE)
+        return Frame(start, body_start, end, framing)
+
+    def _framing(self, profile, lengths, encodings):
+        "Body framing from the framing headers: (framing, size, error)."
+        chunked = False
+        if encodings:
+            value = b', '.join(encodings)
+            if 'exact' == profile.te_match:
+                chunked = (value.split(b',')[-1].strip(b' \t').lower()
+                           == b'chunked')
+            elif 'suffix' == profile.te_match:
+                chunked = value[-7:] == b'chunked'
+            else:
+                chunked = b'chunked' in value.lower()
+            if not chunked and 'reject' == profile.unknown_te:
+                return None, 0, self.ERROR_BAD_TRANSFER_ENCODING
+        if chunked and lengths:
+            if 'reject' == profile.cl_and_te:
+                return None, 0, self.ERROR_CONTENT_LENGTH_AND_CHUNKED
+            if 'te' == profile.cl_and_te:
+                return Frame.CHUNKED, 0, None
+        elif chunked:
+            return Frame.CHUNKED, 0, None
+        if not lengths:
+            return Frame.NONE, 0, None
+
+        sizes = []
+        for value in lengths:
+            if value.isdigit():
+                sizes.append(int(value))
+            elif 'atoi' == profile.cl_parse:
+                digits = self.LEADING_DIGITS.match(value).group()
+                sizes.append(int(digits or b'0'))
+            else:
+                return None, 0, self.ERROR_BAD_CONTENT_LENGTH
+        if len(set(sizes)) > 1:
+            if 'reject' == profile.double_cl:
+                return None, 0, self.ERROR_DOUBLE_CONTENT_LENGTH
+            if 'last' == profile.double_cl:
+                return Frame.LENGTH, sizes[-1], None
+        return Frame.LENGTH, sizes[0], None
+
+    def _chunked_frame(self, profile, start, body_start):
+        "Frame of a chunked body, with the trailer part."
+        size = len(self.buffer)
+        # bare LF endings are checked on lines, not by the chunk
+        ignored = 0
+        if profile.bare_lf:
+            ignored = error_bit(Chunk.ERROR_LF_WITHOUT_CR)
+        offset = body_start
+        while True:
+            end, framing, error = self._read_line(profile, offset)
+            if end is None:
+                return Frame(start, body_start, framing=framing, error=error)
+            chunk = self._chunk(offset, end)
+            if not chunk.valid or (chunk.error_flags & ~ignored
+                                   and 'reject' == profile.chunk_errors):
+                return Frame(start, body_start, framing=Frame.REJECTED,
+                             error=self.ERROR_BAD_CHUNK)
+            offset = end
+            if chunk.real_size == 0:
+                break
+            data_end = offset + chunk.real_size
+            if data_end >= size:
+                return Frame(start, body_start, framing=Frame.INCOMPLETE)
+            if 'line' == profile.chunk_data_end:
+                end, framing, error = self._read_line(profile, data_end)
+                if end is None:
+                    return Frame(start, body_start, framing=framing,
+                                 error=error)
+            else:
+                eol = self.buffer[data_end:data_end + 2]
+                if eol == b'\r\n':
+                    end = data_end + 2
+                elif eol[:1] == b'\n' and profile.bare_lf:
+                    end = data_end + 1
+                elif size - data_end < 2:
+                    return Frame(start, body_start, framing=Frame.INCOMPLETE)
+                else:
+                    return Frame(start, body_start, framing=Frame.REJECTED,
+                                 error=self.ERROR_BAD_CHUNK_END)
+            offset = end
+
+        # trailer part, up to an empty line
+        while True:
+            end, framing, error = self._read_line(profile, offset)
+            if end is None:
+                return Frame(start, body_start, framing=framing, error=error)
+            kind = self._header(offset, end)[0]
+            offset = end
+            if self.LINE_EMPTY == kind:
+                return Frame(start, body_start, offset, Frame.CHUNKED)
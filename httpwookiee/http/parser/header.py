@@ -1,14 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 #
-import string
+from httpwookiee.core import charsets
 from httpwookiee.core.tools import Tools
 from httpwookiee.http.parser.line import Line
-from httpwookiee.http.parser.exceptions import PrematureEndOfStream
+import re
 
 
 class Header(Line):
 
+    __slots__ = ('header_prefix', 'header', 'separator_prefix', 'separator',
+                 'value_suffix', 'stacked_repr_str', 'suffix')
+
     # STATUS_START = 0
     STATUS_NAME = 1
     STATUS_AFTER_SP = 2
@@ -29,6 +32,29 @@ class Header(Line):
     ERROR_EOL_INSIDE_QUOTES = 'End of line before end of quotes'
     ERROR_QUOTED_PAIR_WITHOUT_QUOTES = 'Quoted pair syntax without quotes'
 
+    AUTOMAT = {Line.STATUS_START: 'step_start',
+               STATUS_NAME: 'step_name',
+               STATUS_AFTER_SP: 'step_after_space',
+               Line.STATUS_READING_START: 'step_reading_start',
+               Line.STATUS_READING: 'step_read_value',
+               STATUS_READING_QUOTED_PAIR: 'step_read_qpair',
+               STATUS_READING_LOST_QUOTED_PAIR: 'step_read_lost_qpair',
+               STATUS_READING_QUOTED_STRING: 'step_read_qstring',
+               Line.STATUS_END: 'step_end'}
+
+    # spaces are stacked in stacked_repr_str while reading the value, a run
+    # can only start when there is nothing stacked.
+    RUN_STATES = {STATUS_NAME: ('header', None),
+                  Line.STATUS_READING: ('value', 'stacked_repr_str'),
+                  STATUS_READING_QUOTED_STRING: ('value', None)}
+
+    # field-name ":" OWS field-value CRLF, no obs-fold, no quotes, no bad
+    # spaces, no trailing spaces.
+    STRICT_REGEX = re.compile(b"([!#$%&'*+\\-.^_`|~0-9A-Za-z]+):( *)"
+                              b"((?:[\\x21\\x23-\\x5b\\x5d-\\x7e]+"
+                              b"(?:[ \\t]+[\\x21\\x23-\\x5b\\x5d-\\x7e]+)*)?)"
+                              b"\\r\\n\\Z")
+
     def __str__(self):
         out = ''
         if self.error:
@@ -60,6 +86,35 @@ class Header(Line):
         # internal temp storage
         self.stacked_repr_str = u''
 
+    @staticmethod
+    def raw_slices(line):
+        """Name and value of a header line, as memoryview slices of the line
+        (without separator, spaces around the value and line ending). The
+        name is empty if there is no separator."""
+        view = memoryview(line)
+        end = len(line.rstrip(b'\r\n'))
+        sep = line.find(b':', 0, end)
+        start = sep + 1
+        while start < end and line[start:start + 1] in (b' ', b'\t'):
+            start += 1
+        while end > start and line[end - 1:end] in (b' ', b'\t'):
+            end -= 1
+        return view[:max(sep, 0)], view[start:end]
+
+    def parse_strict(self):
+        match = self.STRICT_REGEX.match(self.raw)
+        if match is None:
+            return False
+        name, spaces, value = match.groups()
+        self.header = name.decode('ascii').upper()
+        self.separator = u':'
+        self.value_prefix = u'<SP>' * len(spaces)
+        self.value = value.decode('ascii').replace(
+            u' ', u'<SP>').replace(u'\t', u'<SP>')
+        self.eof = u'[CR][LF]'
+        self.readidx = len(self.raw)
+        return True
+
     def merge_value(self, other_h):
         """merge this header value with another header (multiline headers)
 
@@ -90,9 +145,9 @@ class Header(Line):
         if not other_h.valid:
             self.valid = False
 
-    def step_start(self, char):
+    def step_start(self, byte):
 
-        if self._is_space(char,
+        if self._is_space(byte,
                           'header_prefix',
                           extended=False,
                           critical=True):
@@ -103,65 +158,62 @@ class Header(Line):
             self.value_prefix += '<SP>'
             return self.STATUS_READING_START
 
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # Not the right place for a line termination
             self.setError(self.ERROR_PREMATURE_EOL)
             return self.STATUS_END
 
-        if ':' == char:
+        if charsets.COLON == byte:
             self.setError(self.ERROR_EMPTY_NAME)
-            self.separator += char
+            self.separator += u':'
             return self.STATUS_READING_START
 
-        return self._add_header_char(char)
+        return self._add_header_byte(byte)
 
-    def _add_header_char(self, char):
+    def _add_header_byte(self, byte):
         """subroutine for step_start and step_name"""
-        # All visible ascii chars are allowed
-        # do not use string.printable as this includes FF, BEL and CR, etc
-        chars = string.digits + string.ascii_letters + string.punctuation + ' '
-        if ((char not in chars)
-                or (char in Tools.NO_TOKEN_CHARS_VALUES)):
+        # All visible ascii chars are allowed, except non token delimiters
+        if not charsets.HEADER_NAME[byte]:
             self.setError(self.ERROR_INVALID_CHAR_IN_NAME)
             self.header += '<Err>'
         else:
-            self.header += char.upper()
+            self.header += self.UPPER_TEXT[byte]
         return self.STATUS_NAME
 
-    def step_name(self, char):
+    def step_name(self, byte):
         "This is the header name."
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # Not the right place for a line termination
             self.setError(self.ERROR_PREMATURE_EOL)
             return self.STATUS_END
 
         # Note that SP is also a bad space in header name
-        if Tools.TAB == char or Tools.CR == char:
+        if charsets.HTAB == byte or charsets.CR == byte:
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             self.stacked_repr_str = '<BS>'
             return self.STATUS_AFTER_SP
-        if Tools.SP == char:
+        if charsets.SP == byte:
             self.setError(self.ERROR_INVALID_CHAR_IN_NAME, critical=False)
             self.stacked_repr_str = '<ErrSP>'
             return self.STATUS_AFTER_SP
 
-        if ':' == char:
-            self.separator += char
+        if charsets.COLON == byte:
+            self.separator += u':'
             return self.STATUS_READING_START
 
-        return self._add_header_char(char)
+        return self._add_header_byte(byte)
 
-    def step_after_space(self, char):
+    def step_after_space(self, byte):
         """Either we are working with separator prefix or inside the name.
 
         """
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # Not the right place for a line termination
             self.setError(self.ERROR_PREMATURE_EOL)
             return self.STATUS_END
 
-        if ':' == char:
-            self.separator += char
+        if charsets.COLON == byte:
+            self.separator += u':'
             # bad spaces before the separator.
             # https://tools.ietf.org/html/rfc7230#section-3.2.4
             self.setError(self.ERROR_SPACE_BEFORE_SEP, critical=True)
@@ -169,11 +221,11 @@ class Header(Line):
             self.stacked_repr_str = u''
             return self.STATUS_READING_START
 
-        if Tools.TAB == char or Tools.CR == char:
+        if charsets.HTAB == byte or charsets.CR == byte:
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             self.stacked_repr_str += '<BS>'
             return self.STATUS_AFTER_SP
-        if Tools.SP == char:
+        if charsets.SP == byte:
             self.setError(self.ERROR_INVALID_CHAR_IN_NAME, critical=False)
             self.stacked_repr_str += '<ErrSP>'
             return self.STATUS_AFTER_SP
@@ -181,30 +233,30 @@ class Header(Line):
         # Ok, this was just a (bad) space in the Header name
         self.header += self.stacked_repr_str
         self.stacked_repr_str = u''
-        self.header += char.upper()
+        self.header += self.UPPER_TEXT[byte]
         return self.STATUS_NAME
 
-    def step_reading_start(self, char):
+    def step_reading_start(self, byte):
         "Value pre-reading, where SP and BS are ignored."
 
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # empty header value, let's say it's allowed
             # as it could in fact also be a multiline header
             return self.STATUS_END
 
-        if (Tools.TAB == char or Tools.CR == char):
+        if (charsets.HTAB == byte or charsets.CR == byte):
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             self.value_prefix += '<BS>'
             return self.STATUS_READING_START
-        if Tools.SP == char:
+        if charsets.SP == byte:
             self.value_prefix += '<SP>'
             return self.STATUS_READING_START
 
-        return self._add_value_char(char)
+        return self._add_value_byte(byte)
 
-    def step_read_value(self, char):
+    def step_read_value(self, byte):
         "Default value reading, everything is allowed, waiting for LF or CRLF."
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # all things done, but let's check if we had some space suffix
             # on previous run of this function
             if self.stacked_repr_str != u'':
@@ -213,25 +265,25 @@ class Header(Line):
                 self.setError(self.ERROR_SPACE_AT_EOL, critical=False)
             return self.STATUS_END
 
-        if (Tools.VTAB == char or Tools.CR == char or Tools.FF == char):
+        if (charsets.VTAB == byte or charsets.CR == byte
+                or charsets.FF == byte):
             self.setError(self.ERROR_BAD_SPACE, critical=False)
             self.stacked_repr_str += '<BS>'
             return self.STATUS_READING
-        if (Tools.SP == char or Tools.TAB == char):
+        if (charsets.SP == byte or charsets.HTAB == byte):
             self.stacked_repr_str += '<SP>'
             return self.STATUS_READING
 
-        for achar in self.stacked_repr_str:
-            self.value += achar
+        self.value += self.stacked_repr_str
         self.stacked_repr_str = u''
-        return self._add_value_char(char)
+        return self._add_value_byte(byte)
 
-    def step_read_qstring(self, char):
+    def step_read_qstring(self, byte):
         "TODO: FIXME: work in progress..."
 
         # TODO: apply difference of char list allowed in quoted
         # and unquoted strings
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             self.setError(self.ERROR_EOL_INSIDE_QUOTES, critical=False)
             # all things done, but let's check if we had some space suffix
             # on previous run of this function
@@ -249,59 +301,35 @@ class Header(Line):
         #
         # qdtext         = any TEXT except " and \
 
-        return self._add_value_char(char, qstring=True)
+        return self._add_value_byte(byte, qstring=True)
 
-    def _add_value_char(self, char, qstring=False):
-        if u'\\' == char:
+    def _add_value_byte(self, byte, qstring=False):
+        if charsets.BACKSLASH == byte:
             if qstring:
                 return self.STATUS_READING_QUOTED_PAIR
             else:
                 self.setError(self.ERROR_QUOTED_PAIR_WITHOUT_QUOTES,
                               critical=False)
                 return self.STATUS_READING_LOST_QUOTED_PAIR
-        if u'"' == char:
-            self.value += char
+        if charsets.DQUOTE == byte:
+            self.value += u'"'
             if qstring:
                 return self.STATUS_READING
             else:
                 return self.STATUS_READING_QUOTED_STRING
-        self.value += char
+        self.value += self.TEXT[byte]
         if qstring:
             return self.STATUS_READING_QUOTED_STRING
         else:
             return self.STATUS_READING
 
-    def step_read_lost_qpair(self, char):
+    def step_read_lost_qpair(self, byte):
         "TODO: FIXME: work in progress..."
-        octet = ord(char)
-        char = chr(octet)
-        return self.step_read_value(char)
+        return self.step_read_value(byte)
 
-    def step_read_qpair(self, char):
+    def step_read_qpair(self, byte):
         "TODO: FIXME: work in progress..."
-        octet = ord(char)
-        char = chr(octet)
-        return self.step_read_qstring(char)
-
-    def tokenize(self):
-        status = self.STATUS_START
-        automat = {self.STATUS_START: 'step_start',
-                   self.STATUS_NAME: 'step_name',
-                   self.STATUS_AFTER_SP: 'step_after_space',
-                   self.STATUS_READING_START: 'step_reading_start',
-                   self.STATUS_READING: 'step_read_value',
-                   self.STATUS_READING_QUOTED_PAIR: 'step_read_qpair',
-                   self.STATUS_READING_LOST_QUOTED_PAIR: 'step_read_lost_'
-                                                         'qpair',
-                   self.STATUS_READING_QUOTED_STRING: 'step_read_qstring',
-                   self.STATUS_END: 'step_end'}
-        while self.STATUS_END != status:
-            try:
-                char = self.read_char()
-            except IndexError:
-                raise PrematureEndOfStream
-            if status not in automat:
-                raise ValueError('Status {0} is not managed in {1}'.format(
-                    status, self.__class__.__name__))
-            # print('char:<<<<{0}>>>, step: {1}'.format(char, automat[status]))
-            status = getattr(self, automat[status])(char)
+        return self.step_read_qstring(byte)
+
+
+Header.compile_automat()
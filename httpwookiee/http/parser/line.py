@@ -1,12 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 #
+from httpwookiee.core import charsets
 from httpwookiee.core.tools import Tools
-from httpwookiee.http.parser.exceptions import PrematureEndOfStream
+from httpwookiee.http.parser.errors import ErrorSet, error_bit
+from httpwookiee.http.parser.exceptions import (PrematureEndOfStream,
+                                                TokenizerMismatchError)
+import re
+import six
 
 
 class Line(object):
-    """Line based parser (CR/LF or LF terminated line state parser)"""
+    """Line based parser (CR/LF or LF terminated line state parser)
+
+    The step methods of the automat work on byte values (integers), bytes
+    are decoded only when added to the parsed fields (see TEXT). The raw
+    line can be bytes, or a memoryview on python 3.
+    """
+
+    __slots__ = ('valid', 'error', 'error_flags', 'value_prefix', 'value',
+                 'eof', 'readidx', 'raw', 'start', 'end', 'cr_run_end')
 
     STATUS_START = 0
     STATUS_READING_START = 13
@@ -22,39 +35,92 @@ class Line(object):
     ERROR_MULTIPLE_CR = 'Multiple CR detected'
     ERROR_BAD_UTF8 = 'Bad Utf-8 characters detected'
 
+    # Reference automat, status => step method name
+    AUTOMAT = {STATUS_START: 'step_start',
+               STATUS_READING_START: 'step_reading_start',
+               STATUS_READING: 'step_read_value',
+               STATUS_AFTER_CR: 'step_wait_for_lf',
+               STATUS_END: 'step_end'}
+
+    # States where the compiled automat reads runs of characters in one step
+    # status => (accumulator attribute, guard attribute which must be empty)
+    RUN_STATES = {STATUS_READING: ('value', None)}
+
+    # Try parse_strict() first, the automat is used only when it fails
+    STRICT = True
+
+    # Run both the compiled and the reference automats, and compare results
+    CROSS_CHECK = False
+
+    # runs of CR, see _cr_run_end
+    CR_RUN_REGEX = re.compile(b'\r*')
+    # remaining CR needed to try to repeat the steps on a run
+    CR_RUN_REPEAT = 16
+
+    # Text of the bytes added to the parsed fields
+    TEXT = charsets.TEXT
+    UPPER_TEXT = charsets.UPPER_TEXT
+    if six.PY2:
+        # our bad utf-8 tests may crash python 2
+        TEXT = tuple([Tools.BYTES_SPECIAL_REPLACE if charsets.BAD_UTF8[byte]
+                      else text for byte, text in enumerate(TEXT)])
+
     def __init__(self):
         self.valid = True
         self.error = False
-        self.errors = {}
+        self.error_flags = 0
         self.value_prefix = u''
         self.value = u''
         self.eof = u''
         self.readidx = 0
+        # offsets of raw in the parsed stream, if any
+        self.start = None
+        self.end = None
+        # end of the last run of CR scanned
+        self.cr_run_end = -1
 
     def parse(self, line):
         self.raw = line
-        self.tokenize()
+        if self.CROSS_CHECK:
+            self._cross_check()
+        else:
+            self._tokenize()
         return self
 
-    def read_char(self):
-        elt = self.raw[self.readidx]
-        # detect python3
-        if isinstance(elt, int):
-            if elt in [192, 141, 138]:
-                self.setError(self.ERROR_BAD_UTF8, critical=False)
-            # py 3
-            char = chr(elt)
-        else:
-            # py 2
-            char = elt
-            if char in ['\xC0', '\x8D', '\x8A']:
-                # our bad utf-8 tests may crash python 2
-                char = Tools.BYTES_SPECIAL_REPLACE
-                self.setError(self.ERROR_BAD_UTF8, critical=False)
+    def _tokenize(self):
+        "Strict fast path for valid lines, else the full automat."
+        if not (self.STRICT and self.parse_strict()):
+            self.tokenize()
+
+    def parse_strict(self):
+        """Fast parsing of strictly valid lines (RFC 7230), without errors.
+
+        Returns False, without altering the object, if the line is not
+        strictly valid. Else the object must be the same as the one
+        produced by tokenize(). No strict mode by default."""
+        return False
+
+    def read_byte(self):
+        "Value of the next byte, raise IndexError at the end of the line."
+        byte = six.indexbytes(self.raw, self.readidx)
+        if charsets.BAD_UTF8[byte]:
+            self.setError(self.ERROR_BAD_UTF8, critical=False)
         self.readidx = self.readidx + 1
-        return char
+        return byte
+
+    def _read_more(self, count):
+        "Read some more bytes, for tokens of several bytes."
+        try:
+            for idx in range(count):
+                self.read_byte()
+        except IndexError:
+            raise PrematureEndOfStream
 
-    def _is_space(self, char, str_attr, extended=True, critical=False):
+    def _last_bytes(self, count):
+        "The last bytes read, as a slice of the raw line."
+        return self.raw[self.readidx - count:self.readidx]
+
+    def _is_space(self, byte, str_attr, extended=True, critical=False):
         """check various bad and good spaces.
 
         -----------------------
@@ -87,56 +153,69 @@ class Line(object):
         (BS means Bad Space).
         given str_attr local attribute is feed with '<BS>' or '<SP>' value
         """
-        charlist = [Tools.TAB]
         if extended:
-            charlist.append(Tools.VTAB)
-            charlist.append(Tools.FF)
-            charlist.append(Tools.CR)
-        if char in charlist:
+            bad_spaces = charsets.EXTENDED_BAD_SPACE
+        else:
+            bad_spaces = charsets.BAD_SPACE
+        if bad_spaces[byte]:
             self.setError(self.ERROR_BAD_SPACE, critical=critical)
             setattr(self, str_attr, getattr(self, str_attr) + u'<BS>')
             return True
-        if char == Tools.SP:
+        if byte == charsets.SP:
             setattr(self, str_attr, getattr(self, str_attr) + u'<SP>')
             return True
         return False
 
-    def _is_lf_or_crlf(self, char):
+    def _is_lf_or_crlf(self, byte):
         """Check for End of line, which may be LF or CRLF or CRCRLF, etc.
         The right one is CRLF; LF or (CR)*LF are 'minor' wrong endings.
         CR alone is not a valid EOL and will return False (see _is_space).
+        A run of CR is scanned at once, whatever its length (see cr_count).
         """
-        if char == Tools.CR:
+        if byte == charsets.CR:
             if not self.eof == u'':
                 self.setError(self.ERROR_MULTIPLE_CR, critical=False)
-            self.eof += u'[CR]'
-            # memorize the real read index, in case we do not find any LF
-            next_index = self.readidx
+            end = self._cr_run_end()
+            if end > self.readidx:
+                self.setError(self.ERROR_MULTIPLE_CR, critical=False)
             try:
-                next_char = self.read_char()
+                next_byte = six.indexbytes(self.raw, end)
             except IndexError:
                 raise PrematureEndOfStream
-            if self._is_lf_or_crlf(next_char):
+            if charsets.BAD_UTF8[next_byte]:
+                self.setError(self.ERROR_BAD_UTF8, critical=False)
+            if next_byte == charsets.LF:
                 # Ok, this was a CRLF or (CR)*LF
+                self.eof += u'[CR]' * (end - self.readidx + 1) + u'[LF]'
+                self.readidx = end + 1
                 return True
-            else:
-                # hack back the read index
-                self.readidx = next_index
-                # and our eof memory
-                self.eof = u''
-                return False
+            # the read index stays after the first CR
+            self.eof = u''
+            return False
 
-        if char == Tools.LF:
+        if byte == charsets.LF:
             # Victory, LF found, end of line!
             if self.eof == u'':
                 self.setError(self.ERROR_LF_WITHOUT_CR, critical=False)
             self.eof += u'[LF]'
-            # this is the only way to end recursion with True
             return True
 
         return False
 
-    def _is_forbidden(self, char, in_uri=False, in_domain=False):
+    def _cr_run_end(self):
+        """End of the run of CR starting at the read index, runs are
+        scanned once."""
+        if self.readidx > self.cr_run_end:
+            self.cr_run_end = self.CR_RUN_REGEX.match(self.raw,
+                                                      self.readidx).end()
+        return self.cr_run_end
+
+    @property
+    def cr_count(self):
+        "Number of CR in the line ending (1 for CRLF, 0 for LF)."
+        return self.eof.count(u'[CR]')
+
+    def _is_forbidden(self, byte, in_uri=False, in_domain=False):
         """Some characters are always bad, on most places, easy detection.
 
         Some chars are forbidden in uri, and that's more complex:
@@ -159,97 +238,270 @@ class Line(object):
         Warnings are not handled here. We just filter characters which are
         nowhere on this list
         """
-        ordval = ord(char)
-        # ALPHA
-        if 0x61 <= ordval <= 0x7A or 0x41 <= ordval <= 0x5A:
-            return False
-        # DIGIT
-        if 0x30 <= ordval <= 0x39:
-            return False
-        # @see also _is_space(char)
-        # "/"(47) / ":"(58) /  "SP"(32) / "HTAB"(9) / "VTAB"(11) /
-        # "FF"(12) / "CR"(13) / "LF"(10)
-        if ordval in [9, 10, 11, 12, 13, 32, 47, 58, 64]:
-            if in_domain:
-                return True
-            return False
-
         if in_domain:
-                #  "-"(45) / "."(46)
-                if ordval in [45, 46]:
-                    return False
-        else:
-            if in_uri:
-                # '%'(37) / "@"(64) / "-"(45) / "."(46) / "_"(95) / "~"(126) /
-                # "!"(33) / "$"(36) / "&"(38) / "'"(39) / "("(40) / ")"(41) /
-                # "*"(42) / "+"(43) / ","(44) / ";"(59) / "="(61) / "?"(63)
-                if ordval in [33, 36, 37, 38, 39, 40, 41, 42, 43,
-                              44, 45, 46, 59, 61, 63, 64, 95, 126]:
-                    return False
-
-        # well, wtf are you, something like NULL?
-        return True
-
-    def step_start(self, char):
+            return not charsets.DOMAIN_CHARS[byte]
+        if in_uri:
+            return not charsets.URI_CHARS[byte]
+        return not charsets.SAFE_CHARS[byte]
+
+    def step_start(self, byte):
         # fake parser, we got directly on value reading, by default
-        return self.step_reading_start(char)
+        return self.step_reading_start(byte)
 
-    def step_reading_start(self, char):
+    def step_reading_start(self, byte):
         "Default Value pre-reading, where SP and BS are ignored."
-        if self._is_space(char, 'value_prefix', extended=False):
+        if self._is_space(byte, 'value_prefix', extended=False):
             # ignore starting spaces
             return self.STATUS_READING_START
 
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             # Not the right place for a line termination
             self.setError(self.ERROR_PREMATURE_EOL)
             return self.STATUS_END
 
-        self.value += char
+        self.value += self.TEXT[byte]
         return self.STATUS_READING
 
-    def step_read_value(self, char):
+    def step_read_value(self, byte):
         "Default value reading, everything is allowed, waiting for LF or CRLF."
-        if self._is_lf_or_crlf(char):
+        if self._is_lf_or_crlf(byte):
             return self.STATUS_END
 
-        self.value += char
+        self.value += self.TEXT[byte]
         return self.STATUS_READING
 
     # @deprecated
-    def step_wait_for_lf(self, char):
-        if '\n' == char:
+    def step_wait_for_lf(self, byte):
+        if charsets.LF == byte:
             self.eof += u'[LF]'
             return self.STATUS_END
         else:
             # well in fact it was not the end
             # this is allowed for multi lines headers
-            self.value += u'[CR]' + char
+            self.value += u'[CR]' + self.TEXT[byte]
             self.eof = u''
             return self.STATUS_READING_START
 
+    @classmethod
+    def compile_automat(cls):
+        """Build the transitions table of the compiled automat for this class.
+
+        Each status gets its step method, and for RUN_STATES a byte class,
+        as a regexp, of the bytes that are only accumulated in the attribute.
+        """
+        transitions = {}
+        for status, step_name in cls.AUTOMAT.items():
+            step = getattr(cls, step_name, None)
+            run = None
+            if step is not None and status in cls.RUN_STATES:
+                attr, guard = cls.RUN_STATES[status]
+                run = cls._compile_run(step, status, attr, guard)
+            transitions[status] = (step, run)
+        cls._transitions = transitions
+        return transitions
+
+    @classmethod
+    def _compile_run(cls, step, status, attr, guard):
+        """Try the 256 bytes on the reference step, from a fresh object.
+
+        A byte is in the class if the only effect of the step is to add
+        something to the accumulator attribute, staying in the same status.
+        """
+        table = {}
+        for byte in range(256):
+            if charsets.BAD_UTF8[byte]:
+                continue
+            probe = cls()
+            probe.raw = b''
+            before = probe._state()
+            try:
+                new_status = step(probe, byte)
+            except Exception:
+                # lookahead (CR) or anything else, not a simple char
+                continue
+            after = probe._state()
+            if (new_status != status
+                    or [key for key in before
+                        if key != attr and after[key] != before[key]]):
+                continue
+            text = after[attr][len(before[attr]):]
+            if text == u'' or after[attr] != before[attr] + text:
+                continue
+            table[byte] = text
+        if not table:
+            return None
+        regex = re.compile(b'[' + b''.join([re.escape(six.int2byte(byte))
+                                            for byte in sorted(table)])
+                           + b']+')
+        if all([table[byte] == cls.TEXT[byte] for byte in table]):
+            upper = False
+        elif all([table[byte] == cls.UPPER_TEXT[byte] for byte in table]):
+            upper = True
+        else:
+            # mixed transformations, use the table for each byte
+            upper = None
+        return (regex, attr, guard, upper, table)
+
     def tokenize(self):
-        """This is a fake one, use it as a model"""
+        """Compiled automat, same results as tokenize_reference().
+
+        Runs of bytes from the status byte class are added to the accumulator
+        in one step, everything else goes through the step methods."""
+        transitions = self.__class__.__dict__.get('_transitions')
+        if transitions is None:
+            transitions = self.compile_automat()
+        raw = self.raw
+        size = len(raw)
+        use_runs = (isinstance(raw, six.binary_type)
+                    or (six.PY3 and isinstance(raw, memoryview)))
+        status = self.STATUS_START
+        while self.STATUS_END != status:
+            if self.readidx >= size:
+                raise PrematureEndOfStream
+            try:
+                step, run = transitions[status]
+            except KeyError:
+                raise ValueError('Status {0} is not managed in {1}'.format(
+                    status, self.__class__.__name__))
+            if use_runs and run is not None:
+                regex, attr, guard, upper, table = run
+                match = None
+                if guard is None or getattr(self, guard) == u'':
+                    match = regex.match(raw, self.readidx)
+                if match is not None:
+                    chunk = match.group()
+                    if upper is None:
+                        text = u''.join([table[byte]
+                                         for byte in bytearray(chunk)])
+                    else:
+                        text = chunk.decode('latin-1')
+                        if upper:
+                            text = text.upper()
+                    setattr(self, attr, getattr(self, attr) + text)
+                    self.readidx = match.end()
+                    continue
+            byte = self.read_byte()
+            status = step(self, byte)
+            if (charsets.CR == byte and self.STATUS_END != status
+                    and (self._cr_run_end() - self.readidx
+                         > self.CR_RUN_REPEAT)):
+                status = self._repeat_cr_steps(status,
+                                               transitions[status][0])
+
+    def _repeat_cr_steps(self, status, step):
+        """Inside a long run of CR (see _cr_run_end).
+
+        Two CR are read with the step method, if both steps have the same
+        effect (same status, same text added, nothing else changed) this
+        effect is applied once for the rest of the run."""
+        before = self._state()
+        new_status = step(self, self.read_byte())
+        if new_status != status:
+            return new_status
+        middle = self._state()
+        new_status = step(self, self.read_byte())
+        if new_status != status:
+            return new_status
+        delta = self._state_delta(before, middle)
+        if delta is None or delta != self._state_delta(middle,
+                                                       self._state()):
+            return new_status
+        count = self.cr_run_end - self.readidx
+        for name, text in delta:
+            setattr(self, name, getattr(self, name) + text * count)
+        self.readidx = self.cr_run_end
+        return status
+
+    @staticmethod
+    def _state_delta(before, after):
+        """Text added to the slots between two states of one byte step,
+        None if anything else changed."""
+        delta = []
+        for name, value in before.items():
+            new_value = after[name]
+            if name == 'readidx':
+                if new_value != value + 1:
+                    return None
+            elif new_value is value or new_value == value:
+                continue
+            elif (isinstance(value, six.string_types)
+                    and isinstance(new_value, six.string_types)
+                    and new_value.startswith(value)):
+                delta.append((name, new_value[len(value):]))
+            else:
+                return None
+        return sorted(delta)
+
+    def tokenize_reference(self):
+        """Reference automat, one step method call per byte."""
         status = self.STATUS_START
-        automat = {self.STATUS_START: 'step_start',
-                   self.STATUS_READING_START: 'step_reading_start',
-                   self.STATUS_READING: 'step_read_value',
-                   self.STATUS_AFTER_CR: 'step_wait_for_lf',
-                   self.STATUS_END: 'step_end'}
+        automat = self.AUTOMAT
         while self.STATUS_END != status:
             try:
-                char = self.read_char()
+                byte = self.read_byte()
             except IndexError:
                 raise PrematureEndOfStream
                 break
             if status not in automat:
                 raise ValueError('Status {0} is not managed in {1}'.format(
                     status, self.__class__.__name__))
-            # print('char:<<<<{0}>>>, step: {1}'.format(char, automat[status]))
-            status = getattr(self, automat[status])(char)
+            # print('byte:<<<<{0}>>>, step: {1}'.format(byte, automat[status]))
+            status = getattr(self, automat[status])(byte)
+
+    def _cross_check(self):
+        """Tokenize with the fast paths and with the reference automat, raise
+        TokenizerMismatchError if the results (attributes or raised exception)
+        are not the same."""
+        reference = self.__class__()
+        reference.raw = self.raw
+        expected = None
+        try:
+            reference.tokenize_reference()
+        except Exception as exc:
+            expected = exc.__class__
+        error = None
+        try:
+            self._tokenize()
+        except Exception as exc:
+            error = exc
+        raised = None if error is None else error.__class__
+        if raised is not expected:
+            raise TokenizerMismatchError(
+                '{0} {1!r}: {2} raised, {3} expected'.format(
+                    self.__class__.__name__, self.raw, error, expected))
+        if reference._state() != self._state():
+            raise TokenizerMismatchError(
+                '{0} {1!r}: parsed values differ'.format(
+                    self.__class__.__name__, self.raw))
+        if error is not None:
+            raise error
+
+    def locate(self, start):
+        "Record the position of the raw line in the parsed stream."
+        self.start = start
+        self.end = start + len(self.raw)
+        return self
+
+    def _state(self):
+        "Values of all the slots, to compare parsing results."
+        state = {}
+        for klass in self.__class__.__mro__:
+            for name in getattr(klass, '__slots__', ()):
+                state[name] = getattr(self, name, None)
+        # scan cache, not a parsing result
+        del state['cr_run_end']
+        return state
+
+    @property
+    def errors(self):
+        "Set-like view of the error messages."
+        return ErrorSet(self.error_flags)
 
     def setError(self, msgidx, critical=True):
-        self.errors[msgidx] = True
+        self.error_flags |= error_bit(msgidx)
         if critical:
             self.valid = False
         self.error = True
+
+
+Line.compile_automat()
@@ -1,13 +1,28 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 #
+from httpwookiee.http.parser.body import BodySummary
 from httpwookiee.http.parser.header import Header
 from httpwookiee.http.parser.chunk import Chunk
+from httpwookiee.http.parser.line import Line
+from httpwookiee.http.parser.errors import ErrorSet, error_bit
 from httpwookiee.core.tools import Tools
+from collections import OrderedDict
+import six
 
 
 class Message(object):
 
+    __slots__ = ('valid', 'error', 'error_flags', 'code', 'first_line',
+                 '_headers', 'header_map', 'lazy_headers', 'has_raw_headers',
+                 '_body', 'body_segments', 'segments_size', 'body_size',
+                 'body_cap', 'body_signatures', 'body_summary', 'chunked',
+                 'chunks', 'chunk_size', 'name', 'short_name',
+                 'has_previous_header', 'has_cl', 'version_major',
+                 'version_minor', 'start', 'end', 'headers_start',
+                 'headers_end', 'raw_header_offsets', 'events', 'tree',
+                 'dropped_header')
+
     STATUS_OPTIONAL_SEPARATOR = 0
     STATUS_HEADERS = 1
     STATUS_BODY = 2
@@ -30,6 +45,9 @@ class Message(object):
 
     READ_UNTIL_THE_END = -99
 
+    # Headers needed for the framing, never lazy.
+    FRAMING_HEADERS = (b'CONTENT-LENGTH', b'TRANSFER-ENCODING')
+
     def __str__(self):
         out = ""
         if self.error:
@@ -50,6 +68,14 @@ class Message(object):
             for chunk in self.chunks:
                 out += "{0}".format(chunk)
         bodylen = len(self.body)
+        if self.body_summary is not None:
+            body = self.body_summary
+            out += " [{0} Body] (size {1}, not retained)\n{2}".format(
+                self.short_name,
+                bodylen,
+                body)
+            out += "\n ++++++++++++++++++++++++++++++++++++++\n"
+            return out
         if (bodylen > 1000):
             body = self.body[0:1000] + b'( to be continued...)'
         else:
@@ -62,13 +88,41 @@ class Message(object):
 
     def __init__(self):
         self.valid = True
-        self.errors = {}
+        self.error_flags = 0
         self.error = False
         self.code = 999
         self.first_line = b''
-        self.headers = []
-        self.body = b''
+        self._headers = []
+        # upper case header name => list of positions in headers
+        self.header_map = OrderedDict()
+        # lazy mode, strictly valid non-framing headers are kept raw and
+        # tokenized on first access to headers
+        self.lazy_headers = False
+        self.has_raw_headers = False
+        # position in headers => stream offset of raw lazy headers
+        self.raw_header_offsets = {}
+        # offsets in the parsed stream (see Messages.zone), the first line,
+        # headers and chunks have their own offsets
+        self.start = None
+        self.end = None
+        self.headers_start = None
+        self.headers_end = None
+        self._body = b''
+        # chunked bodies, memoryviews on the parsed buffer (copies on
+        # incremental parsing) joined on first access to body
+        self.body_segments = []
+        self.segments_size = 0
+        # bounded memory mode, bodies bigger than body_cap are replaced by a
+        # BodySummary, with the positions of the body signatures
+        self.body_cap = None
+        self.body_signatures = ()
+        self.body_summary = None
         self.body_size = 0
+        # streaming parser, MessageEvents callbacks, and without tree only
+        # the headers needed for the framing are kept (no chunks, no body)
+        self.events = None
+        self.tree = True
+        self.dropped_header = False
         self.chunked = False
         self.chunks = []
         self.chunk_size = 0
@@ -77,37 +131,207 @@ class Message(object):
         # for multiline headers
         self.has_previous_header = False
 
+    @property
+    def headers(self):
+        "List of Header objects, raw lazy headers are tokenized here."
+        if self.has_raw_headers:
+            for position in range(len(self._headers)):
+                self._tokenize_header(position)
+            self.has_raw_headers = False
+        return self._headers
+
+    @headers.setter
+    def headers(self, headers):
+        self._headers = headers
+        self.has_raw_headers = False
+        self.raw_header_offsets = {}
+        self.header_map = OrderedDict()
+        for position, header in enumerate(headers):
+            self.header_map.setdefault(header.header, []).append(position)
+
+    @property
+    def body(self):
+        """Body as bytes, chunked body segments are joined here.
+        This is a BodySummary if the body was bigger than body_cap."""
+        if self.body_summary is not None:
+            return self.body_summary
+        self.detach_body()
+        return self._body
+
+    @body.setter
+    def body(self, body):
+        self.body_segments = []
+        self.segments_size = 0
+        if self.body_cap is not None and len(body) > self.body_cap:
+            self._body = b''
+            self.body_summary = self._get_body_summary().update(body)
+        else:
+            self._body = body
+            self.body_summary = None
+
+    @property
+    def body_length(self):
+        "Size of the body, without joining the chunked body segments."
+        if self.body_summary is not None:
+            return len(self.body_summary)
+        return len(self._body) + self.segments_size
+
+    def _get_body_summary(self):
+        return BodySummary(signatures=self.body_signatures)
+
+    def _add_body_segment(self, data):
+        "Add a chunk of body, a summary is used after body_cap bytes."
+        if self.body_summary is not None:
+            self.body_summary.update(data)
+            return
+        self.body_segments.append(data)
+        self.segments_size += len(data)
+        if (self.body_cap is not None
+                and len(self._body) + self.segments_size > self.body_cap):
+            summary = self._get_body_summary().update(self._body)
+            for segment in self.body_segments:
+                summary.update(segment)
+            self.body = b''
+            self.body_summary = summary
+
+    def detach_body(self):
+        "Join the body segments, so they do not refer to the parsed buffer."
+        if self.body_segments:
+            if six.PY2:
+                segments = [segment.tobytes()
+                            if isinstance(segment, memoryview) else segment
+                            for segment in self.body_segments]
+            else:
+                segments = self.body_segments
+            self._body = self._body + b''.join(segments)
+            self.body_segments = []
+            self.segments_size = 0
+
+    def iter_body(self):
+        """Iterate on the body parts (bytes or memoryviews), without
+        building the whole body. Bodies replaced by a BodySummary are not
+        retained, there is nothing to iterate."""
+        if self._body:
+            yield self._body
+        for segment in self.body_segments:
+            yield segment
+
+    def _tokenize_header(self, position):
+        "Header at this position, tokenized if it was a raw lazy header."
+        header = self._headers[position]
+        if isinstance(header, six.binary_type):
+            header = Header().parse(header)
+            start = self.raw_header_offsets.pop(position, None)
+            if start is not None:
+                header.locate(start)
+            self._headers[position] = header
+        return header
+
+    def _add_header(self, header, name):
+        "Append a Header (or raw lazy header) and index it by name."
+        self.header_map.setdefault(name, []).append(len(self._headers))
+        self._headers.append(header)
+
+    def get_headers(self, name):
+        """All headers with this name (case insensitive), in message order.
+        Duplicates are kept (like double Content-Length)."""
+        headers = []
+        for position in self.header_map.get(name.upper(), []):
+            headers.append(self._tokenize_header(position))
+        return headers
+
+    def get_header(self, name, default=None):
+        "First header with this name (case insensitive), or default."
+        headers = self.get_headers(name)
+        if headers:
+            return headers[0]
+        return default
+
+    def has_header(self, name):
+        return name.upper() in self.header_map
+
     def _parse_first_line(self, first_line):
         'Incomplete implementation, please override.'
         return self.STATUS_BODY
 
-    def parse_first_line(self, first_line):
+    def parse_first_line(self, first_line, start=None):
+        """start is the offset of the line in the parsed stream, if known.
+        Same thing for headers and chunks."""
         if b'\n' == first_line or b'\r\n' == first_line:
             # this is not really a response or request, more an allowed
             # extra CRLF separator between messages, for old servers
             return self.STATUS_OPTIONAL_SEPARATOR
         else:
             # quite certainly something to rewrite in child implementations
-            return self._parse_first_line(first_line)
+            status = self._parse_first_line(first_line)
+            if start is not None and isinstance(self.first_line, Line):
+                self.first_line.locate(start)
+            return status
 
-    def parse_header_line(self, line):
+    def parse_header_line(self, line, start=None):
         if b'\n' == line or b'\r\n' == line:
             return self.STATUS_BODY
         else:
+            if start is not None:
+                if self.headers_start is None:
+                    self.headers_start = start
+                self.headers_end = start + len(line)
+            if self.lazy_headers or not self.tree:
+                match = Header.STRICT_REGEX.match(line)
+                if (match is not None
+                        and match.group(1).upper()
+                        not in self.FRAMING_HEADERS):
+                    # strictly valid, no errors to report, tokenize later
+                    if self.events is not None:
+                        view = memoryview(line)
+                        self.events.on_header(
+                            view[match.start(1):match.end(1)],
+                            view[match.start(3):match.end(3)],
+                            0)
+                    if self.tree:
+                        self._add_header(
+                            line, match.group(1).upper().decode('ascii'))
+                        if start is not None:
+                            self.raw_header_offsets[
+                                len(self._headers) - 1] = start
+                        self.has_raw_headers = True
+                    else:
+                        self.dropped_header = True
+                    self.has_previous_header = True
+                    return self.STATUS_HEADERS
             header = Header().parse(line)
+            if self.events is not None:
+                name, value = Header.raw_slices(line)
+                self.events.on_header(name, value, header.error_flags)
+            if start is not None:
+                header.locate(start)
+            merged = False
+            keep = True
             if (header.error
                     and Header.ERROR_MULTILINE_OPTIONAL in header.errors):
                 # oups, this is in fact the previous header continuation
                 if not self.has_previous_header:
                     self.setError(self.ERROR_FIRST_HEADER_OPS_FOLD)
+                elif self.dropped_header:
+                    # continuation of a header which was not kept
+                    keep = False
                 else:
-                    previous_header = self.headers.pop()
+                    previous_header = self._tokenize_header(
+                        len(self._headers) - 1)
                     previous_header.merge_value(header)
+                    if start is not None:
+                        previous_header.end = header.end
                     header = previous_header
+                    merged = True
             else:
                 self.has_previous_header = True
+                self.dropped_header = False
 
-            self.headers.append(header)
+            if merged:
+                # the merged header keeps its name and position
+                self._headers[-1] = header
+            elif keep:
+                self._add_header(header, header.header)
             if not header.valid:
                 self.setError(self.ERROR_HAS_INVALID_HEADER)
             else:
@@ -121,7 +345,11 @@ class Message(object):
         "We have all headers, not extract some informations from it."
 
         self.has_cl = False
-        for header in self.headers:
+        # framing headers, in message order (errors depend on the order)
+        positions = sorted(self.header_map.get(u'CONTENT-LENGTH', [])
+                           + self.header_map.get(u'TRANSFER-ENCODING', []))
+        for position in positions:
+            header = self._headers[position]
 
             if 'CONTENT-LENGTH' == header.header:
                 if self.has_cl:
@@ -151,9 +379,15 @@ class Message(object):
                     if 'chunked' in hval:
                         self.setError(self.ERROR_BAD_CHUNKED_HEADER)
 
-    def parse_chunk_header(self, line):
+    def parse_chunk_header(self, line, start=None):
         chunk = Chunk().parse(line)
-        self.chunks.append(chunk)
+        if start is not None:
+            chunk.locate(start)
+        if self.events is not None:
+            self.events.on_chunk_header(line, chunk.real_size,
+                                        chunk.error_flags)
+        if self.tree:
+            self.chunks.append(chunk)
         if not chunk.valid:
             self.setError(self.ERROR_HAS_INVALID_CHUNK)
             # TODO: in case of invalid chunk we should maybe stop analysis
@@ -174,7 +408,10 @@ class Message(object):
         return self.body_size
 
     def parse_body(self, data):
-        self.body = data
+        if self.events is not None and data:
+            self.events.on_body_segment(data)
+        if self.tree:
+            self.body = data
         return self.STATUS_COMPLETED
 
     def parse_chunk(self, data):
@@ -195,15 +432,24 @@ class Message(object):
             self.setError(self.ERROR_HAS_EXTRA_CHUNK_DATA, critical=False)
             data = data[:self.chunk_size]
 
-        self.body += data
+        if data:
+            if self.events is not None:
+                self.events.on_body_segment(data)
+            if self.tree:
+                self._add_body_segment(data)
         if self.chunk_size == 0:
             # this was the last chunk
             return self.STATUS_COMPLETED
         else:
             return self.STATUS_CHUNK_HEADER
 
+    @property
+    def errors(self):
+        "Set-like view of the error messages."
+        return ErrorSet(self.error_flags)
+
     def setError(self, msgidx, critical=True):
-        self.errors[msgidx] = True
+        self.error_flags |= error_bit(msgidx)
         if critical:
             self.valid = False
         self.error = True
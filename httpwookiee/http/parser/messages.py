@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 #
 from httpwookiee.core.tools import Tools
+from httpwookiee.http.parser.line import Line
 from httpwookiee.http.parser.message import Message
+from httpwookiee.http.parser.zone import Zone
 from httpwookiee.http.parser.exceptions import (EndOfBufferError,
+                                                IncompleteBufferError,
                                                 PrematureEndOfStream,
-                                                OptionalCRLFSeparator)
+                                                OptionalCRLFSeparator,
+                                                FrozenMessagesError)
+import copy
 import six
 
 
@@ -16,12 +21,43 @@ class Messages(object):
     ERROR_BAD_MESSAGES_SEPARATOR = 'Invalid Messages Separators'
     ERROR_INCOMPLETE_STREAM = 'Incomplete stream'
 
-    def __init__(self, rfc=False):
+    # On incremental parsing, a body without size (HTTP/0.9, or no
+    # Content-Length) ends with the stream. Requests parsers cannot wait for
+    # that, they take what is already in the buffer.
+    UNSIZED_BODY_WAITS_FOR_EOS = True
+
+    def __init__(self, rfc=False, lazy_headers=False, body_cap=None,
+                 body_signatures=(), events=None, tree=True):
         self.count = 0
         self.messages = []
         self.index = 0
+        # bytes, or a bytearray growing in place on incremental parsing
+        self.bytesbuff = b''
         self.byteidx = 0
         self.parsed_idx = 0
+        # stream offset of bytesbuff[0], bytes before were released
+        self.stream_offset = 0
+        # incremental parsing state (feed() mode)
+        self.incremental = False
+        self.eos = True
+        self.pending_message = None
+        self.pending_status = None
+        # parsing stopped on a fatal stream error, ignore further bytes
+        self.aborted = False
+        # only framing headers are tokenized while parsing
+        self.lazy_headers = lazy_headers
+        # bounded memory mode, bodies bigger than body_cap bytes are only
+        # summarized (see BodySummary) and the buffer is released after
+        # parse()
+        self.body_cap = body_cap
+        self.body_signatures = tuple(body_signatures)
+        # streaming mode, a MessageEvents object gets the parsing events.
+        # Without tree messages are not kept (count is still computed) and
+        # only the framing headers are tokenized.
+        self.events = events
+        self.tree = tree
+        # shared parsing result (see freeze()), no more parsing allowed
+        self.frozen = False
         self.valid = True
         self.errors = {}
         self.error = False
@@ -47,6 +83,7 @@ class Messages(object):
         return self.messages[index]
 
     def __setitem__(self, key, item):
+        self._check_frozen()
         self.messages[key] = item
 
     def __len__(self):
@@ -54,21 +91,143 @@ class Messages(object):
 
     def parse(self, bufferstr, compute_content_length=True):
         "Parse an HTTP message."
+        self._check_frozen()
         self.extract_messages(bufferstr, compute_content_length)
+        if self.body_cap is not None:
+            self.release_buffer()
         return self
 
+    def release_buffer(self):
+        """Drop the bytes of the messages already extracted.
+
+        Message bodies are detached from the buffer first. Bytes not yet
+        attached to a complete message are kept."""
+        self._check_frozen()
+        for msg in self.messages:
+            msg.detach_body()
+        self.stream_offset += self.parsed_idx
+        if isinstance(self.bytesbuff, bytearray):
+            del self.bytesbuff[:self.parsed_idx]
+        else:
+            self.bytesbuff = self.bytesbuff[self.parsed_idx:]
+        self.byteidx = max(0, self.byteidx - self.parsed_idx)
+        self.parsed_idx = 0
+
+    def feed(self, data, compute_content_length=True):
+        """Incremental parsing, add some bytes to the stream.
+
+        Parsing restarts from where the previous call stopped (the message
+        in progress and its status are kept), so the whole stream is not
+        parsed again. Returns the list of messages completed by these bytes,
+        they are also added to the messages list.
+        Call end_of_stream() when the stream is closed.
+
+        Bytes are appended to a bytearray, the cost of a feed does not
+        depend on the size of the stream. Bytes of the extracted messages
+        stay in the buffer until release_buffer() or next_batch()."""
+        self._check_frozen()
+        if not self.incremental:
+            self.bytesbuff = bytearray(self.bytesbuff)
+        self.incremental = True
+        self.eos = False
+        if len(data):
+            self.bytesbuff.extend(data)
+        return self._extract_pending(compute_content_length)
+
+    @property
+    def complete(self):
+        """Incremental parsing, all the bytes received belong to complete
+        messages (no message in progress, no bytes waiting for a line end).
+
+        Bodies without size (HTTP/0.9, no Content-Length) are never complete
+        before end_of_stream() on responses."""
+        return (not self.aborted
+                and self.pending_message is None
+                and self.parsed_idx == len(self.bytesbuff))
+
+    def end_of_stream(self, compute_content_length=True):
+        """The stream is closed, finish the incremental parsing.
+
+        The message in progress is completed (bodies without size) or
+        reported as incomplete, like parse() would do on the whole stream.
+        Returns the list of messages completed."""
+        self._check_frozen()
+        self.eos = True
+        return self._extract_pending(compute_content_length)
+
+    def next_batch(self):
+        """Get a parser for the rest of the incremental stream.
+
+        The new parser starts with an empty list of messages and no errors,
+        but continues the parsing of the bytes not yet attached to a
+        complete message, with the message in progress if any. The current
+        object is left untouched, with the messages already extracted."""
+        batch = copy.copy(self)
+        batch.frozen = False
+        batch.count = 0
+        batch.messages = []
+        batch.valid = True
+        batch.errors = {}
+        batch.error = False
+        batch.bytesbuff = self.bytesbuff[self.parsed_idx:]
+        batch.stream_offset = self.stream_offset + self.parsed_idx
+        if self.eos or self.pending_message is None:
+            batch.byteidx = 0
+        else:
+            batch.byteidx = self.byteidx - self.parsed_idx
+        batch.parsed_idx = 0
+        return batch
+
+    def freeze(self):
+        """Forbid any further parsing, for results shared between callers
+        (see ResponsesCache).
+
+        The messages list becomes a tuple, parse(), feed() and the other
+        methods updating the stream raise FrozenMessagesError. Message
+        objects are not copied, they must be considered read-only."""
+        if self.pending_message is not None:
+            raise ValueError('Cannot freeze an incomplete incremental parsing')
+        self.messages = tuple(self.messages)
+        self.frozen = True
+        return self
+
+    def _check_frozen(self):
+        if self.frozen:
+            raise FrozenMessagesError(
+                'Frozen {0} object, parsing results are shared'.format(
+                    self.name))
+
     def extract_messages(self, bufferstr, compute_content_length=True):
         full_len = len(bufferstr)
         self.byteidx = 0
         self.parsed_idx = 0
+        self.stream_offset = 0
+        self.incremental = False
+        self.eos = True
+        self.pending_message = None
+        self.pending_status = None
+        self.aborted = False
         if full_len == 0:
             return
         self.bytesbuff = six.binary_type(bufferstr)
-
-        while self.byteidx < full_len:
+        self._extract_pending(compute_content_length)
+
+    def _extract_pending(self, compute_content_length=True):
+        "Extract messages from the current read index."
+        completed = []
+        if self.aborted:
+            if self.parsed_idx == self.byteidx:
+                # the aborted message owns the end of the stream
+                self.parsed_idx = len(self.bytesbuff)
+            self.byteidx = len(self.bytesbuff)
+        while (self.byteidx < len(self.bytesbuff)
+               or (self.eos and self.pending_message is not None)):
             try:
                 # print('extraction {0}!{1}'.format(self.byteidx, full_len))
                 msg = self.extract_one_message(compute_content_length)
+            except IncompleteBufferError:
+                # incremental parsing, wait for the next bytes
+                break
             except OptionalCRLFSeparator:
                 # this is not an error, aised only at end of buffer
                 # so we can safely break the loop
@@ -80,7 +239,9 @@ class Messages(object):
             if msg is not False:
                 self.count = self.count + 1
                 self.parsed_idx = self.byteidx
-                self.messages.append(msg)
+                if self.tree:
+                    self.messages.append(msg)
+                completed.append(msg)
                 if not msg.valid:
                     # print(msg)
                     self.setError(self.ERROR_HAS_INVALID_MESSAGE)
@@ -89,68 +250,122 @@ class Messages(object):
                     self.setError(self.ERROR_HAS_BAD_MESSAGE, critical=False)
             else:
                 self.setError(self.ERROR_HAS_INVALID_MESSAGE)
+        return completed
 
     def extract_one_message(self, compute_content_length=True):
         """Return one HTTP Request or response, and set the internal buffer
-        index right after that message."""
-        msg = self._getMessage()
-        try:
-
-            status = self.parse_start_of_stream(msg)
+        index right after that message.
+
+        Each step (a line, a body, a chunk) is atomic: if the buffer is too
+        short in incremental mode the read index goes back to the start of
+        the step, and the message in progress is kept for the next call."""
+        if self.pending_message is None:
+            msg = self._getMessage()
+            msg.lazy_headers = self.lazy_headers
+            msg.body_cap = self.body_cap
+            msg.body_signatures = self.body_signatures
+            msg.events = self.events
+            msg.tree = self.tree
+            step_start = self.byteidx
+            msg.start = self.stream_offset + step_start
+            try:
+                status = self.parse_start_of_stream(msg)
+            except IncompleteBufferError:
+                self.byteidx = step_start
+                raise
+            except (EndOfBufferError, PrematureEndOfStream):
+                raise PrematureEndOfStream
             if status is False:
                 return False
+            if self.events is not None:
+                self.events.on_message_start(msg.start)
+                if isinstance(msg.first_line, Line):
+                    self.events.on_first_line(msg.first_line.raw,
+                                              msg.first_line.start)
+            if Message.STATUS_HEADERS != status:
+                status = self._end_of_headers(msg, status,
+                                              compute_content_length)
+        else:
+            msg = self.pending_message
+            status = self.pending_status
 
-            # Parse HEADERS, LF separated ascii lines------
-            while Message.STATUS_HEADERS == status:
-                line = self.parse_line_from_buffer()
-                status = msg.parse_header_line(line)
-
-            msg.analyze_headers(compute_content_length)
-            if status == Message.STATUS_BODY and msg.chunked:
-                status = Message.STATUS_CHUNK_HEADER
-            # Parse body, abstract binary content lines------
+        try:
             while status != Message.STATUS_COMPLETED:
+                step_start = self.byteidx
 
-                if Message.STATUS_BODY == status:
-
-                    # FIXME: here we may have a problem if our current buffer
-                    # is shorter than the whole received message (in 0.9 or if
-                    # no Content-Length header was transmitted...
+                # Parse HEADERS, LF separated ascii lines------
+                if Message.STATUS_HEADERS == status:
+                    line = self.parse_line_from_buffer()
+                    status = msg.parse_header_line(line,
+                                                   self.line_start(line))
+                    if Message.STATUS_HEADERS != status:
+                        status = self._end_of_headers(msg, status,
+                                                      compute_content_length)
+
+                # Parse body, abstract binary content lines------
+                elif Message.STATUS_BODY == status:
                     if msg.version_major == 0 and msg.version_minor == 9:
                         # http 0.9 request or response, read all
-                        size_of_body = len(self.bytesbuff) - self.byteidx
+                        size_of_body = self._get_unsized_body_size()
                     else:
                         size_of_body = msg.get_expected_body_size()
                         if Message.READ_UNTIL_THE_END == size_of_body:
-                            size_of_body = len(self.bytesbuff) - self.byteidx
+                            size_of_body = self._get_unsized_body_size()
                     data = self.extract_size_from_buffer(size_of_body)
                     status = msg.parse_body(data)
 
-                if Message.STATUS_CHUNK_HEADER == status:
+                elif Message.STATUS_CHUNK_HEADER == status:
                     line = self.parse_line_from_buffer()
-                    status = msg.parse_chunk_header(line)
+                    status = msg.parse_chunk_header(line,
+                                                    self.line_start(line))
 
-                if Message.STATUS_CHUNK == status:
+                elif Message.STATUS_CHUNK == status:
                     size_of_chunk = msg.get_expected_chunk_size()
                     data = self.extract_chunk_from_buffer(size_of_chunk)
                     status = msg.parse_chunk(data)
 
-            return msg
+        except IncompleteBufferError:
+            self.byteidx = step_start
+            self.pending_message = msg
+            self.pending_status = status
+            raise
 
         except (EndOfBufferError, PrematureEndOfStream):
             # a line-read or nb-bytes-read reached EOS, should not happen
             # unless stream is incomplete
+            self.pending_message = None
             raise PrematureEndOfStream
 
+        self.pending_message = None
+        msg.end = self.stream_offset + self.byteidx
+        if self.events is not None:
+            self.events.on_message_complete(msg.errors)
+        return msg
+
+    def _end_of_headers(self, msg, status, compute_content_length=True):
+        "All headers are there (if any), get the status for the body part."
+        msg.analyze_headers(compute_content_length)
+        if status == Message.STATUS_BODY and msg.chunked:
+            status = Message.STATUS_CHUNK_HEADER
+        return status
+
+    def _get_unsized_body_size(self):
+        "Body without any size information, read until the end."
+        if not self.eos and self.UNSIZED_BODY_WAITS_FOR_EOS:
+            raise IncompleteBufferError()
+        return len(self.bytesbuff) - self.byteidx
+
     def parse_start_of_stream(self, msg):
         firstline = self.parse_line_from_buffer()
-        status = msg.parse_first_line(firstline)
+        status = msg.parse_first_line(firstline,
+                                      self.line_start(firstline))
         if Message.STATUS_OPTIONAL_SEPARATOR == status:
             # Ok, it was not really the first line, this is allowed 1 time
             # but 1 time only
             try:
                 firstline = self.parse_line_from_buffer()
-                status = msg.parse_first_line(firstline)
+                status = msg.parse_first_line(firstline,
+                                              self.line_start(firstline))
             except EndOfBufferError:
                 # well, it was an extra CRLF at the end
                 raise OptionalCRLFSeparator()
@@ -159,12 +374,43 @@ class Messages(object):
                 self.setError(self.ERROR_BAD_MESSAGES_SEPARATOR)
                 try:
                     firstline = self.parse_line_from_buffer()
-                    status = msg.parse_first_line(firstline)
+                    status = msg.parse_first_line(firstline,
+                                                  self.line_start(firstline))
                 except EndOfBufferError:
                     # we've reach EOS on a CRLF or LF serie
                     return False
         return status
 
+    def line_start(self, line):
+        "Stream offset of the line just read from the buffer."
+        return self.stream_offset + self.byteidx - len(line)
+
+    def zone(self, msg_index, zone):
+        """Zone (see Tools.ZONE_*) of a message, as a Zone of the buffer.
+
+        ZONE_FIRST_LINE and ZONE_HEADERS are one part of the buffer,
+        ZONE_CHUNK_SIZE has one part per chunk header line (and nothing if
+        the message is not chunked). Nothing is copied, on incremental
+        parsing do not keep the views of the zone while feeding bytes."""
+        msg = self.messages[msg_index]
+        if Tools.ZONE_FIRST_LINE == zone:
+            spans = [(msg.first_line.start, msg.first_line.end)]
+        elif Tools.ZONE_HEADERS == zone:
+            if msg.headers_start is None:
+                spans = []
+            else:
+                spans = [(msg.headers_start, msg.headers_end)]
+        elif Tools.ZONE_CHUNK_SIZE == zone:
+            spans = [(chunk.start, chunk.end) for chunk in msg.chunks]
+        else:
+            raise ValueError('Unknown zone {0}'.format(zone))
+        offset = self.stream_offset
+        for start, end in spans:
+            if start is None or start < offset:
+                raise ValueError('Zone {0} is not in the buffer'.format(zone))
+        return Zone(self.bytesbuff,
+                    [(start - offset, end - offset) for start, end in spans])
+
     def read_one_byte(self):
         """Read one byte from the internal Buffer,
         and increment index for next read"""
@@ -174,64 +420,85 @@ class Messages(object):
             # that's the end, my friend
             raise EndOfBufferError()
 
-        # detect python3
+        # detect python3 (or a bytearray)
         if isinstance(elt, int):
             # p3
-            byte = bytes([elt])
+            byte = six.int2byte(elt)
         else:
             # p2
             byte = bytes(elt)
         self.byteidx = self.byteidx + 1
         return byte
 
+    def _copy(self, start, end):
+        "Bytes of the buffer, slices of the bytearray are converted."
+        if isinstance(self.bytesbuff, bytearray):
+            return memoryview(self.bytesbuff)[start:end].tobytes()
+        return self.bytesbuff[start:end]
+
     def parse_line_from_buffer(self):
         """Read one line from buffer (end at \n or EOS).
         May raise EndOfBufferError if you try to read one more time after
         the end."""
-        line = bytes()
-
-        # this may send an uncatched EndOfBufferError exception
-        byte = self.read_one_byte()
-
-        while byte:
-            line = line + byte
-            if byte == b'\n':
-                # line terminated
-                return line
-            else:
-                try:
-                    byte = self.read_one_byte()
-                except EndOfBufferError:
-                    # here exception is catched and line truncated to
-                    # end of buffer instead of \n
-                    return line
+        start = self.byteidx
+        self.skip_line_in_buffer()
+        return self._copy(start, self.byteidx)
+
+    def skip_line_in_buffer(self):
+        "Move the read index after the next line, see parse_line_from_buffer."
+        start = self.byteidx
+        if start >= len(self.bytesbuff):
+            if not self.eos:
+                raise IncompleteBufferError()
+            raise EndOfBufferError()
+        end = self.bytesbuff.find(b'\n', start)
+        if end == -1:
+            if not self.eos:
+                # the end of this line is not yet received
+                raise IncompleteBufferError()
+            # no LF, line is truncated to the end of buffer
+            end = len(self.bytesbuff)
+        else:
+            end = end + 1
+        self.byteidx = end
 
     def extract_size_from_buffer(self, size):
         "Extract given bytes from the internal buffer and move the read index."
-        data = bytes()
-        # FIXME: if speed is a problem, and currently it's not a problem,
-        # there's certainly better way to read than byte after byte ...
-        # But this parser is not made for speed
-        while size > 0:
-            try:
-                byte = self.read_one_byte()
-            except EndOfBufferError:
-                raise PrematureEndOfStream()
-            data = data + byte
-            size = size - 1
-        return data
+        start = self.byteidx
+        self.skip_size_in_buffer(size)
+        return self._copy(start, self.byteidx)
+
+    def skip_size_in_buffer(self, size):
+        "Move the read index of size bytes, see extract_size_from_buffer."
+        if size <= 0:
+            return
+        end = self.byteidx + size
+        if end > len(self.bytesbuff):
+            if not self.eos:
+                raise IncompleteBufferError()
+            # everything is consumed, but that's not enough
+            self.byteidx = len(self.bytesbuff)
+            raise PrematureEndOfStream()
+        self.byteidx = end
 
     def extract_chunk_from_buffer(self, size):
-        """Extract given bytes from the internal buffer and move the read index.
-        returned data may be shorter if EOS is reached. Note that the chunk
-        really ends at the next EOL after this size. So we extract some more
-        bytes."""
-        data = self.extract_size_from_buffer(size)
-        # The chunk content is now extracted, read the next chunk part
-        data = data + self.parse_line_from_buffer()
-        return data
+        """Extract given bytes from the internal buffer and move the read
+        index. returned data may be shorter if EOS is reached. Note that the
+        chunk really ends at the next EOL after this size. So we extract some
+        more bytes.
+        Data is a memoryview on the buffer, nothing is copied here. On
+        incremental parsing the buffer grows in place, a view would lock it,
+        data is a copy."""
+        start = self.byteidx
+        self.skip_size_in_buffer(size)
+        # The chunk content is now skipped, read the next chunk part
+        self.skip_line_in_buffer()
+        if self.incremental:
+            return self._copy(start, self.byteidx)
+        return memoryview(self.bytesbuff)[start:self.byteidx]
 
     def setError(self, msgidx, critical=True):
+        self._check_frozen()
         self.errors[msgidx] = True
         if critical:
             self.valid = False
@@ -7,6 +7,8 @@ from httpwookiee.http.parser.message import Message
 
 class Request(Message):
 
+    __slots__ = ('http09', 'method', 'location', 'has_args', 'query_string')
+
     ERROR_BAD_FIRST_LINE = 'Bad First line in Request'
 
     def __init__(self):
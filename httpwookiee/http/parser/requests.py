@@ -10,8 +10,13 @@ from httpwookiee.http.parser.exceptions import (EndOfBufferError,
 
 class Requests(Messages):
 
-    def __init__(self, rfc=False):
-        super(Requests, self).__init__()
+    UNSIZED_BODY_WAITS_FOR_EOS = False
+
+    def __init__(self, rfc=False, lazy_headers=False, events=None,
+                 tree=True):
+        super(Requests, self).__init__(lazy_headers=lazy_headers,
+                                       events=events,
+                                       tree=tree)
         self.rfc = rfc
         self.conn_close = False
         self.name = u'Requests'
@@ -28,19 +33,22 @@ class Requests(Messages):
 
     def _abort_parsing(self):
         self.byteidx = len(self.bytesbuff)
+        self.aborted = True
         if self.rfc:
             # memorize we should lose the socket very soon
             self.conn_close = True
 
     def parse_start_of_stream(self, msg):
             firstline = self.parse_line_from_buffer()
-            status = msg.parse_first_line(firstline)
+            status = msg.parse_first_line(firstline,
+                                          self.line_start(firstline))
             if Request.STATUS_OPTIONAL_SEPARATOR == status:
                 # Ok, it was not really the first line, this is allowed 1 time
                 # but 1 time only
                 try:
                     firstline = self.parse_line_from_buffer()
-                    status = msg.parse_first_line(firstline)
+                    status = msg.parse_first_line(firstline,
+                                                  self.line_start(firstline))
                 except EndOfBufferError:
                     # well, it was an extra CRLF at the end
                     raise OptionalCRLFSeparator()
@@ -52,7 +60,8 @@ class Requests(Messages):
                         return False
                     try:
                         firstline = self.parse_line_from_buffer()
-                        status = msg.parse_first_line(firstline)
+                        status = msg.parse_first_line(
+                            firstline, self.line_start(firstline))
                     except EndOfBufferError:
                         # we've reach EOS on a CRLF or LF serie
                         return False
@@ -7,6 +7,8 @@ from httpwookiee.http.parser.message import Message
 
 class Response(Message):
 
+    __slots__ = ('response_title', )
+
     ERROR_BAD_FIRST_LINE = 'Bad First line in Response'
     ERROR_HTTP09_RESPONSE = 'This is an HTTP/0.9 Response'
 
@@ -37,11 +39,22 @@ class Response(Message):
         if self.version_major == 0 and self.version_minor == 9:
             # In 0.9 mode the first line raw content is part of the body, as
             # everything is just a body
-            self.body = self.first_line.raw
-            self.body += data
-        else:
-            self.body = data
-        return self.STATUS_COMPLETED
+            if self.events is not None:
+                self.events.on_body_segment(self.first_line.raw)
+                if data:
+                    self.events.on_body_segment(data)
+            if self.tree:
+                # segments, the body is summarized after body_cap bytes
+                self.body = b''
+                self._add_body_segment(self.first_line.raw)
+                if data:
+                    self._add_body_segment(data)
+            if (self.body_cap is not None
+                    and len(self.first_line.raw) > self.body_cap):
+                # the line is in the body (summary), do not retain it twice
+                self.first_line.raw = self.first_line.raw[:self.body_cap]
+            return self.STATUS_COMPLETED
+        return super(Response, self).parse_body(data)
 
     def get_expected_body_size(self):
         "Return expected body size. Requests and responses are different"
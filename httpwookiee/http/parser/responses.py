@@ -7,8 +7,13 @@ from httpwookiee.http.parser.response import Response
 
 class Responses(Messages):
 
-    def __init__(self):
-        super(Responses, self).__init__()
+    def __init__(self, lazy_headers=False, body_cap=None, body_signatures=(),
+                 events=None, tree=True):
+        super(Responses, self).__init__(lazy_headers=lazy_headers,
+                                        body_cap=body_cap,
+                                        body_signatures=body_signatures,
+                                        events=events,
+                                        tree=tree)
         self.name = u'Responses'
 
     def _getMessage(self):
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+
+
+class Zone(object):
+    """Some parts of a parsed buffer, without copy.
+
+    Parts are (start, end) offsets in the buffer, iteration gives memoryview
+    slices of the buffer. The ``in`` operator searches each part directly in
+    the buffer.
+    """
+
+    __slots__ = ('buffer', 'spans')
+
+    def __init__(self, buffer, spans=()):
+        self.buffer = buffer
+        self.spans = list(spans)
+
+    def __str__(self):
+        return str(self.tobytes())
+
+    def __iter__(self):
+        view = memoryview(self.buffer)
+        for start, end in self.spans:
+            yield view[start:end]
+
+    def __len__(self):
+        return sum([end - start for start, end in self.spans])
+
+    def __contains__(self, item):
+        for start, end in self.spans:
+            if self.buffer.find(item, start, end) != -1:
+                return True
+        return False
+
+    def tobytes(self):
+        "Copy of the zone content, parts are concatenated."
+        return b''.join([view.tobytes() for view in self])
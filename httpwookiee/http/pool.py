@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Keep-alive connections reused by the tests sending well-formed requests.
+
+Most tests send malformed queries, the state of the connection after them is
+unknown, they always use a new connection. Tests declared connection safe
+(see core.base.connection_safe) take their connection from this pool and
+give it back if the responses allow a reuse: the expected number of valid
+HTTP/1.1 responses, without Connection: close. Connections are checked
+(closed by the server, unexpected bytes) before a reuse.
+"""
+from httpwookiee.config import ConfigFactory
+from httpwookiee.core.tools import outmsg
+from httpwookiee.http.client import BaseClient, Client
+
+
+class ConnectionPool(object):
+    """Idle connections by (host IP, port, TLS)."""
+
+    instance = None
+
+    def __init__(self, size=2):
+        "size is the number of idle connections kept by target, 0: no pool."
+        self.size = size
+        self.opened = 0
+        self.reused = 0
+        self._idle = {}
+
+    @classmethod
+    def shared(cls):
+        "Pool shared by all the tests, CLIENT_POOL_SIZE idle connections."
+        if cls.instance is None:
+            config = ConfigFactory.getConfig()
+            cls.instance = cls(size=config.getint('CLIENT_POOL_SIZE'))
+        return cls.instance
+
+    @staticmethod
+    def key(client):
+        return (client.hostip, client.port, client.https)
+
+    def acquire(self, host=None, port=None, hostip=None):
+        "A live idle connection to this target, or a new one."
+        # resolution (cached) and checks, needed for the key, without the
+        # connection (and event loop) of a Client
+        target = BaseClient(host, port, hostip)
+        target._check_target()
+        idle = self._idle.get(self.key(target), [])
+        while idle:
+            pooled = idle.pop()
+            if pooled.is_alive():
+                outmsg('# reusing kept-alive connection.')
+                self.reused += 1
+                return pooled
+            pooled.close()
+        client = Client(host, port, target.hostip)
+        client.open()
+        self.opened += 1
+        return client
+
+    def release(self, client, reusable=False):
+        "Keep the connection for a next test, or close it."
+        if not reusable or self.size <= 0 or not client.is_alive():
+            client.close()
+            return
+        idle = self._idle.setdefault(self.key(client), [])
+        if len(idle) >= self.size:
+            client.close()
+            return
+        idle.append(client)
+
+    @staticmethod
+    def reusable(responses, expected=1):
+        """The connection can be reused after these responses: all the
+        expected responses are valid and complete, HTTP/1.1, without
+        Connection: close."""
+        if (responses.count != expected or not responses.valid
+                or responses.error):
+            return False
+        for response in responses:
+            if response.error:
+                return False
+            if u'{0}.{1}'.format(response.version_major,
+                                 response.version_minor) != u'1.1':
+                return False
+            for header in response.get_headers('Connection'):
+                if u'close' in header.value.lower():
+                    return False
+        return True
+
+    def close(self):
+        "Close all the idle connections."
+        for idle in self._idle.values():
+            for client in idle:
+                client.close()
+        self._idle = {}
@@ -308,15 +308,22 @@ class Request:
     def getDelayedOutput(self):
         "render delayed chunks as bytes"
 
+        (delay, out) = self.getDelayedChunk()
+        sleep(delay)
+        return out
+
+    def getDelayedChunk(self):
+        """render next delayed chunk as bytes, with its delay (in seconds),
+        without waiting (see getDelayedOutput)"""
+
         self._parse_delayed()
         if len(self.delayed) > 0:
             (delay, out) = self.delayed.pop()
         if len(self.delayed) == 0:
             out += self._render_last_chunk()
             self.is_delayed = False
-        sleep(delay)
         # FIXME: add support for BYTES_SPECIAL_REPLACE in delayed chunks?
         # FIXME: yes, currently we are stuck with ascii on bodies, we do not
         # handle our requests bodies as real binary streams
         out = six.binary_type(out, 'ascii')
-        return out
+        return (delay, out)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""TLS context of the client connections (SERVER_SSL targets).
+
+One SSLContext is built for the whole process: no certificate checks
+(targets are test servers), ALPN pinned to http/1.1, and TLS session
+resumption: each new connection to a target reuses the session saved from
+the previous connection, instead of a full handshake. Handshake durations
+are recorded, to compare full and resumed handshakes.
+
+Sessions are stored by target, (host, IP, port): a front and a backend
+with the same host name (proxy mode) have their own sessions.
+"""
+from httpwookiee.config import ConfigFactory
+from collections import deque
+import ssl
+
+# python >= 3.6
+SSLSession = getattr(ssl, 'SSLSession', None)
+
+
+class ClientSSLContext(ssl.SSLContext):
+    """SSLContext with the saved sessions of the targets.
+
+    Sockets are wrapped with the session of the target (get_session()).
+    asyncio gives only the server_hostname to wrap_bio(), the target of the
+    next SSL object of this host name is announced with expect(); loop
+    callbacks run in order, SSL objects are built in the same order as the
+    TLS connections are started."""
+
+    instance = None
+
+    @classmethod
+    def shared(cls):
+        "Context of all the clients, CLIENT_SSL_RESUMPTION from config."
+        if ClientSSLContext.instance is None:
+            config = ConfigFactory.getConfig()
+            ClientSSLContext.instance = cls.build(
+                resumption=config.getboolean('CLIENT_SSL_RESUMPTION'))
+        return ClientSSLContext.instance
+
+    @classmethod
+    def build(cls, resumption=True):
+        protocol = getattr(ssl, 'PROTOCOL_TLS_CLIENT',
+                           getattr(ssl, 'PROTOCOL_SSLv23', None))
+        context = cls(protocol)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        if getattr(ssl, 'HAS_ALPN', False):
+            context.set_alpn_protocols(['http/1.1'])
+        context.resumption = resumption and SSLSession is not None
+        # (host, IP, port) -> last SSLSession
+        context.sessions = {}
+        # server_hostname -> targets of the next wrap_bio() calls
+        context.expected = {}
+        # (seconds, resumed) of each handshake
+        context.handshakes = []
+        return context
+
+    def get_session(self, target):
+        "Last session of the target (host, IP, port), or None."
+        if not self.resumption:
+            return None
+        return self.sessions.get(target)
+
+    def expect(self, target):
+        "The next wrap_bio() for this host name is a connection to target."
+        self.expected.setdefault(target[0], deque()).append(target)
+
+    def cancel(self, target):
+        "The TLS connection to target failed, before wrap_bio() maybe."
+        targets = self.expected.get(target[0])
+        if targets and target in targets:
+            targets.remove(target)
+
+    def wrap_bio(self, incoming, outgoing, *args, **kwargs):
+        targets = self.expected.get(kwargs.get('server_hostname'))
+        if targets:
+            session = self.get_session(targets.popleft())
+            if session is not None and kwargs.get('session') is None:
+                kwargs['session'] = session
+        return super(ClientSSLContext, self).wrap_bio(incoming, outgoing,
+                                                      *args, **kwargs)
+
+    def save_session(self, target, ssl_object):
+        """Keep the session of an SSLSocket or SSLObject for the next
+        connections to the target (host, IP, port). With TLS 1.3 the session
+        comes after the handshake, save it after a read."""
+        if not self.resumption or ssl_object is None:
+            return
+        session = getattr(ssl_object, 'session', None)
+        if session is not None:
+            self.sessions[target] = session
+
+    def record_handshake(self, seconds, ssl_object):
+        "Record the duration of a handshake, return True if resumed."
+        resumed = bool(getattr(ssl_object, 'session_reused', False))
+        self.handshakes.append((seconds, resumed))
+        return resumed
+
+    def report(self):
+        "Lines of text with the number and mean time of the handshakes."
+        lines = []
+        for resumed, name in ((False, u'full'), (True, u'resumed')):
+            times = [seconds for seconds, reused in self.handshakes
+                     if reused == resumed]
+            if times:
+                lines.append(u'{0} {1} handshake(s), mean {2:.1f}ms'.format(
+                    len(times), name, sum(times) * 1000 / len(times)))
+        return lines
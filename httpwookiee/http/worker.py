@@ -39,6 +39,7 @@ class Worker(object):
         self.name = name
         self.output = b''
         self.stream = b''
+        self.parser = Requests(lazy_headers=True)
         self.keepalive = True
         self._sock = None
         self._sock_accept_reads = False
@@ -51,6 +52,7 @@ class Worker(object):
         self.keepalive = True
         self.output = b''
         self.stream = b''
+        self.parser = Requests(lazy_headers=True)
         self.test_id = None
         self.test_behavior = None
         self._sock = None
@@ -163,7 +165,9 @@ class Worker(object):
             self.close_socket()
         else:
             self.stream += raw
-            self.requests = Requests().parse(self.stream)
+            # incremental parsing, only the new bytes are parsed
+            self.parser.feed(raw)
+            self.requests = self.parser
 
             # DEBUG
             self.inmsg(str(self.requests))
@@ -175,7 +179,7 @@ class Worker(object):
                 if self.behavior.ignore_content_length:
 
                     # the current response parsing is maybe wrong.
-                    self.requests = Requests()
+                    self.requests = Requests(lazy_headers=True)
                     self.requests.parse(self.stream,
                                         compute_content_length=False)
                     self.inmsg('# Stream after removing Content Length.')
@@ -191,6 +195,8 @@ class Worker(object):
                     # we can send a response, query is fully read
                     self.send_responses()
 
+                self._reset_parser()
+
             else:
 
                 self._load_testid_and_behavior(stream_mode=True)
@@ -206,6 +212,16 @@ class Worker(object):
             # this is especially usefull for probe requests
             self.behavior = self.default_behavior
 
+    def _reset_parser(self):
+        "Get a new parser for the rest of the input stream."
+        if self.requests is self.parser:
+            # continue where the incremental parser stopped
+            self.parser = self.parser.next_batch()
+        else:
+            # stream was parsed again with another behavior
+            self.parser = Requests(lazy_headers=True)
+            self.parser.feed(self.stream)
+
     def _truncate_input_stream(self):
         # self.requests.parsed_idx contains the last index reached with
         # a complete message
@@ -12,6 +12,8 @@ import httpwookiee.client.tests_regular
 # import httpwookiee.client.tests_chunks
 # (...)
 import tests.messages
+import tests.parser
+import tests.client
 import tests.internal_server
 import inspect
 import unittest
@@ -38,6 +40,8 @@ if __name__ == '__main__':
             testcases.append(obj)
     classes = []
     classes.append(tests.messages)
+    classes.append(tests.parser)
+    classes.append(tests.client)
     classes.append(tests.internal_server)
     classes.append(httpwookiee.client.tests_regular)
     # classes.append(httpwookiee.client.tests_first_line)
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Internal Tests, clients
+#
+from httpwookiee.http.client import AsyncClient, Client, SocketClient
+from httpwookiee.http.latency import LatencyTracker
+from httpwookiee.http.pool import ConnectionPool
+from httpwookiee.http.parser.responses import Responses
+from httpwookiee.http.request import Request as HTTPRequest
+from httpwookiee.http.tls import ClientSSLContext, SSLSession
+import os
+import socket
+import ssl
+import threading
+import time
+import unittest
+
+
+class ClientTestCase(unittest.TestCase):
+    """Base of the client tests: status methods used by the test runner,
+    and the configuration of tests.py when run without it (pytest)."""
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def setUp(self):
+        # same configuration as tests.py, when run without it (pytest)
+        if not os.environ.get("HTTPWOOKIEE_CONF"):
+            os.environ["HTTPWOOKIEE_CONF"] = os.path.join(
+                os.path.dirname(os.path.realpath(__file__)), "tests.ini")
+
+
+class Test_Client_Read(ClientTestCase):
+
+    def read(self, stream, **kwargs):
+        "Read stream with a client, return responses and elapsed time."
+        client = Client(host=u'socketpair', port=0, hostip=u'127.0.0.1')
+        sock, server = socket.socketpair()
+        client.open(sock=sock)
+        try:
+            server.sendall(stream)
+            start = time.time()
+            responses = client.read_all(cache=False, **kwargs)
+            return responses, time.time() - start
+        finally:
+            server.close()
+            client.close()
+
+    def test_early_completion(self):
+        "Test reading stops when expected responses are complete"
+
+        sized = (b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc")
+        chunked = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                   b"3\r\nabc\r\n0\r\n\r\n")
+        responses, elapsed = self.read(sized, timeout=5, expected=1)
+        self.assertEqual(1, responses.count)
+        self.assertTrue(elapsed < 2)
+
+        # extra response in the grace window
+        responses, elapsed = self.read(sized + chunked, timeout=5,
+                                       expected=1)
+        self.assertEqual(2, responses.count)
+        self.assertTrue(elapsed < 2)
+
+        # missing response, responses without size, no expected number
+        for stream, expected in ((sized, 2),
+                                 (b"HTTP/1.1 200 OK\r\n\r\nabc", 1),
+                                 (sized, None)):
+            responses, elapsed = self.read(stream, timeout=0.3,
+                                           expected=expected)
+            self.assertEqual(1, responses.count)
+            self.assertTrue(elapsed >= 0.25)
+
+    def test_open_failure(self):
+        "Test a failed open() closes the client, given sockets are checked"
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        # bound, not listening: connection refused
+        try:
+            client = Client(host=u'refused', port=port, hostip=u'127.0.0.1')
+            with self.assertRaises(Exception):
+                with client:
+                    pass
+            if AsyncClient is not None:
+                self.assertTrue(client._loop.is_closed())
+            listener.listen(1)
+            sock = socket.create_connection(('127.0.0.1', port))
+            client = Client(host=u'given', port=port, hostip=u'127.0.0.1')
+            client.open(sock=sock)
+            self.assertTrue(client.is_alive())
+            client.close()
+            listener.accept()[0].close()
+        finally:
+            listener.close()
+
+    @unittest.skipIf(AsyncClient is None, "no asyncio")
+    def test_old_transport(self):
+        "Test the connection state without transport.is_closing() (< 3.5.1)"
+
+        class OldTransport(object):
+            def __init__(self, transport):
+                self.transport = transport
+
+            def __getattr__(self, name):
+                if 'is_closing' == name:
+                    raise AttributeError(name)
+                return getattr(self.transport, name)
+
+        client = Client(host=u'socketpair', port=0, hostip=u'127.0.0.1')
+        sock, server = socket.socketpair()
+        try:
+            client.open(sock=sock)
+            client._transport = OldTransport(client._transport)
+            self.assertTrue(client.is_alive())
+            request = HTTPRequest(0)
+            request.set_location(u'/test/internal', random=True)
+            client.send(request)
+            self.assertEqual(b'GET ', server.recv(4))
+            server.close()
+            time.sleep(0.05)
+            self.assertFalse(client.is_alive())
+            self.assertFalse(client._write(b'GET / HTTP/1.1\r\n\r\n'))
+        finally:
+            server.close()
+            client.close()
+
+    @unittest.skipIf(AsyncClient is None, "no asyncio")
+    def test_async_client(self):
+        "Test many connections of AsyncClient on one event loop"
+
+        import asyncio
+        loop = asyncio.new_event_loop()
+        sized = (b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc")
+        clients = []
+        servers = []
+        try:
+            for idx in range(20):
+                client = AsyncClient(host=u'socketpair', port=0,
+                                     hostip=u'127.0.0.1', loop=loop)
+                sock, server = socket.socketpair()
+                loop.run_until_complete(client.open(sock=sock))
+                request = HTTPRequest(idx)
+                request.set_location(u'/test/internal', random=True)
+                loop.run_until_complete(client.send(request))
+                client.close_sending()
+                clients.append(client)
+                servers.append(server)
+            for server in servers:
+                server.settimeout(5)
+                query = b''
+                data = server.recv(4096)
+                while data:
+                    query += data
+                    data = server.recv(4096)
+                self.assertEqual(b'GET ', query[:4])
+                server.sendall(sized * 2)
+            start = time.time()
+            results = loop.run_until_complete(asyncio.gather(
+                *[client.read_all(timeout=5, expected=2, cache=False)
+                  for client in clients]))
+            self.assertTrue(time.time() - start < 2)
+            self.assertEqual([2] * 20, [responses.count
+                                        for responses in results])
+            # end of stream
+            servers[0].close()
+            responses = loop.run_until_complete(
+                clients[0].read_all(timeout=5))
+            self.assertEqual(0, responses.count)
+        finally:
+            for client in clients:
+                loop.run_until_complete(client.close())
+            for server in servers:
+                server.close()
+            loop.close()
+
+
+class Test_Latency_Tracker(ClientTestCase):
+
+    def test_timeouts(self):
+        "Test timeouts computed from the latency percentiles, with bounds"
+
+        self.assertEqual(95, LatencyTracker.percentile(range(1, 101)))
+        self.assertEqual(3, LatencyTracker.percentile([3]))
+
+        tracker = LatencyTracker(default=1.5, minimum=0.1, maximum=5)
+        for idx in range(LatencyTracker.MIN_SAMPLES - 1):
+            tracker.record_first_byte(u'slow:80', 0.6)
+        # not enough samples
+        self.assertEqual(1.5, tracker.first_byte_timeout(u'slow:80'))
+        self.assertEqual(1.5, tracker.idle_timeout(u'other:80'))
+        tracker.record_first_byte(u'slow:80', 0.4)
+        self.assertAlmostEqual(1.8, tracker.first_byte_timeout(u'slow:80'))
+        # no gaps, first byte timeout is used
+        self.assertAlmostEqual(1.8, tracker.idle_timeout(u'slow:80'))
+        for idx in range(20):
+            tracker.record_gap(u'slow:80', 0.2)
+        self.assertAlmostEqual(0.6, tracker.idle_timeout(u'slow:80'))
+        tracker.record_first_byte(u'slow:80', 4)
+        tracker.record_first_byte(u'slow:80', 4)
+        self.assertEqual(5, tracker.first_byte_timeout(u'slow:80'))
+
+        for idx in range(LatencyTracker.MIN_SAMPLES):
+            tracker.record_first_byte(u'fast:80', 0.001)
+        self.assertEqual(0.1, tracker.first_byte_timeout(u'fast:80'))
+        self.assertEqual([u'fast:80', u'slow:80'], tracker.targets())
+        self.assertEqual(u'fast:80: first byte timeout 100ms (5 samples), '
+                         u'idle timeout 100ms (0 samples)',
+                         tracker.report()[0])
+
+
+class Test_Connection_Pool(ClientTestCase):
+
+    def test_reusable(self):
+        "Test responses allowing a reuse of the connection"
+
+        sized = b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc"
+        self.assertTrue(ConnectionPool.reusable(Responses().parse(sized)))
+        self.assertTrue(ConnectionPool.reusable(
+            Responses().parse(sized * 2), expected=2))
+        for stream in (sized * 2,
+                       b"HTTP/1.0 200 OK\r\nContent-Length: 3\r\n\r\nabc",
+                       b"HTTP/1.1 200 OK\r\nConnection: Close\r\n"
+                       b"Content-Length: 3\r\n\r\nabc",
+                       b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n"
+                       b"Content-Length: 4\r\n\r\nabcd",
+                       b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nabc",
+                       b""):
+            self.assertFalse(ConnectionPool.reusable(
+                Responses().parse(stream)))
+
+    def test_reuse(self):
+        "Test idle connections reuse, and liveness check"
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        port = listener.getsockname()[1]
+        pool = ConnectionPool(size=1)
+        accepted = []
+        try:
+            first = pool.acquire(host=u'pooltest', port=port,
+                                 hostip=u'127.0.0.1')
+            accepted.append(listener.accept()[0])
+            pool.release(first, reusable=True)
+            second = pool.acquire(host=u'pooltest', port=port,
+                                  hostip=u'127.0.0.1')
+            self.assertIs(first, second)
+            self.assertEqual((1, 1), (pool.opened, pool.reused))
+
+            # not reusable, closed
+            pool.release(second, reusable=False)
+            self.assertFalse(second.is_alive())
+            third = pool.acquire(host=u'pooltest', port=port,
+                                 hostip=u'127.0.0.1')
+            accepted.append(listener.accept()[0])
+            pool.release(third, reusable=True)
+            # closed by the server while idle
+            accepted[-1].close()
+            time.sleep(0.05)
+            fourth = pool.acquire(host=u'pooltest', port=port,
+                                  hostip=u'127.0.0.1')
+            accepted.append(listener.accept()[0])
+            self.assertIsNot(third, fourth)
+            self.assertEqual((3, 1), (pool.opened, pool.reused))
+            pool.release(fourth, reusable=True)
+            pool.close()
+            self.assertFalse(fourth.is_alive())
+        finally:
+            pool.close()
+            for sock in accepted:
+                sock.close()
+            listener.close()
+
+
+class Test_TLS_Resumption(ClientTestCase):
+
+    def setUp(self):
+        super(Test_TLS_Resumption, self).setUp()
+        self.shared = ClientSSLContext.instance
+        ClientSSLContext.instance = ClientSSLContext.build()
+        context = ssl.SSLContext(getattr(ssl, 'PROTOCOL_TLS_SERVER',
+                                         ssl.PROTOCOL_SSLv23))
+        context.load_cert_chain(os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), "tls.pem"))
+        if getattr(ssl, 'HAS_ALPN', False):
+            context.set_alpn_protocols(['h2', 'http/1.1'])
+        self.protocols = []
+        self.stopped = False
+        self.listeners = []
+        self.servers = []
+        # two targets with the same host name (front and backend)
+        for idx in range(2):
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(5)
+            listener.settimeout(0.1)
+            server = threading.Thread(target=self.serve,
+                                      args=(context, listener))
+            server.daemon = True
+            server.start()
+            self.listeners.append(listener)
+            self.servers.append(server)
+
+    def tearDown(self):
+        ClientSSLContext.instance = self.shared
+        self.stopped = True
+        for server in self.servers:
+            server.join(5)
+        for listener in self.listeners:
+            listener.close()
+
+    def serve(self, context, listener):
+        "One response by connection, until the test is stopped."
+        while not self.stopped:
+            try:
+                sock = listener.accept()[0]
+            except socket.timeout:
+                continue
+            except (socket.error, OSError):
+                return
+            try:
+                sock.settimeout(5)
+                sock = context.wrap_socket(sock, server_side=True)
+                self.protocols.append(sock.selected_alpn_protocol())
+                query = b''
+                while b'\r\n\r\n' not in query:
+                    data = sock.recv(4096)
+                    if not data:
+                        break
+                    query += data
+                sock.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n"
+                             b"\r\nabc")
+                sock.recv(4096)
+            except (socket.error, ssl.SSLError, OSError):
+                pass
+            finally:
+                sock.close()
+
+    def query(self, factory, target=0):
+        client = factory(host=u'tlstest',
+                         port=self.listeners[target].getsockname()[1],
+                         hostip=u'127.0.0.1')
+        client.https = True
+        client.open()
+        try:
+            request = HTTPRequest(0)
+            request.set_location(u'/test/internal', random=True)
+            client.send(request)
+            return client.read_all(timeout=5, expected=1, cache=False)
+        finally:
+            client.close()
+
+    @unittest.skipIf(SSLSession is None, "no TLS sessions (python < 3.6)")
+    def test_resumption(self):
+        "Test TLS sessions resumption and ALPN of the client connections"
+
+        factories = [SocketClient]
+        if AsyncClient is not None:
+            factories.append(Client)
+        context = ClientSSLContext.shared()
+        for factory in factories:
+            context.sessions.clear()
+            del context.handshakes[:]
+            for target in (0, 1, 0, 1, 0):
+                self.assertEqual(1, self.query(factory, target).count)
+            self.assertEqual([False, False, True, True, True],
+                             [resumed for seconds, resumed
+                              in context.handshakes])
+            self.assertEqual(2, len(context.sessions))
+            self.assertEqual({}, dict([(host, targets) for host, targets
+                                       in context.expected.items()
+                                       if targets]))
+            report = context.report()
+            self.assertEqual(2, len(report))
+            self.assertTrue(report[0].startswith(u'2 full handshake(s)'))
+            self.assertTrue(report[1].startswith(u'3 resumed handshake(s)'))
+        if getattr(ssl, 'HAS_ALPN', False):
+            self.assertEqual(set([u'http/1.1']), set(self.protocols))
+
+    def test_no_resumption(self):
+        "Test TLS connections without sessions resumption"
+
+        ClientSSLContext.instance = ClientSSLContext.build(resumption=False)
+        for idx in range(2):
+            self.assertEqual(1, self.query(SocketClient).count)
+        self.assertEqual([False, False],
+                         [resumed for seconds, resumed
+                          in ClientSSLContext.instance.handshakes])
+        self.assertEqual({}, ClientSSLContext.instance.sessions)
@@ -0,0 +1,878 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Internal Tests
+#
+from httpwookiee.core import charsets
+from httpwookiee.core.tools import Tools
+from httpwookiee.http.parser import benchmark
+from httpwookiee.http.parser.batch import BatchParser, BatchResult
+from httpwookiee.http.parser.body import BodySummary
+from httpwookiee.http.parser.cache import ResponsesCache
+from httpwookiee.http.parser.chunk import Chunk
+from httpwookiee.http.parser.errors import (ErrorSet, error_bit,
+                                            error_messages, error_table)
+from httpwookiee.http.parser.events import MessageEvents
+from httpwookiee.http.parser.exceptions import FrozenMessagesError
+from httpwookiee.http.parser.framing import (FramingEngine, Frame,
+                                             STRICT_RFC, APACHE_LIKE,
+                                             NGINX_LIKE, LEGACY_LENIENT)
+from httpwookiee.http.parser.firstheader import (FirstRequestHeader,
+                                                 FirstResponseHeader)
+from httpwookiee.http.parser.header import Header
+from httpwookiee.http.parser.line import Line
+from httpwookiee.http.parser.message import Message
+from httpwookiee.http.parser.messages import Messages
+from httpwookiee.http.parser.request import Request
+from httpwookiee.http.parser.requests import Requests
+from httpwookiee.http.parser.responses import Responses
+import os
+import six
+import subprocess
+import sys
+import time
+import unittest
+import zlib
+try:
+    import tracemalloc
+except ImportError:
+    # python < 3.4
+    tracemalloc = None
+
+
+class Test_Messages_Buffer(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_truncated_stream(self):
+        "Test end of stream detection on lines and bodies"
+
+        # last line without LF is returned, then the header is incomplete
+        req = Requests().parse(b"GET / HTTP/1.1\r\nHost: a")
+        self.assertEqual(0, req.count)
+        self.assertIn(Messages.ERROR_INCOMPLETE_STREAM, req.errors)
+
+        # body shorter than the Content-Length
+        req = Requests().parse(b"GET / HTTP/1.1\r\n"
+                               b"Content-Length: 10\r\n"
+                               b"\r\n"
+                               b"abc")
+        self.assertEqual(0, req.count)
+        self.assertIn(Messages.ERROR_INCOMPLETE_STREAM, req.errors)
+        self.assertFalse(req.valid)
+
+    def test_large_pipelined_stream(self):
+        "Test extraction of big bodies and pipelined responses"
+
+        body = b"x" * 65536
+        resp = (b"HTTP/1.1 200 OK\r\n"
+                b"Content-Length: 65536\r\n"
+                b"\r\n" + body)
+        stream = resp * 3 + b"HTTP/1.1 404 Not Found\r\n\r\nuntil the end"
+        responses = Responses().parse(stream)
+        self.assertEqual(4, responses.count)
+        self.assertTrue(responses.valid)
+        for response in responses.messages[:3]:
+            self.assertEqual(body, response.body)
+        self.assertEqual(b"until the end", responses[3].body)
+        self.assertEqual(len(stream), responses.parsed_idx)
+
+    def test_lazy_headers(self):
+        "Test lazy mode only tokenize framing headers while parsing"
+
+        stream = (b"HTTP/1.1 200 OK\r\n"
+                  b"Server: test\r\n"
+                  b"X-Folded: a\r\n"
+                  b" b\r\n"
+                  b"Content-Length: 3\r\n"
+                  b"X-Bad : c\r\n"
+                  b"\r\n"
+                  b"abc")
+        reference = Responses().parse(stream)
+        responses = Responses(lazy_headers=True).parse(stream)
+        response = responses[0]
+        self.assertTrue(response.has_raw_headers)
+        self.assertEqual(b"Server: test\r\n", response._headers[0])
+        self.assertEqual(b"abc", response.body)
+        self.assertEqual(reference.errors, responses.errors)
+        self.assertEqual(reference[0].errors, response.errors)
+        self.assertEqual(4, len(response.headers))
+        self.assertFalse(response.has_raw_headers)
+        self.assertEqual(u'SERVER', response.headers[0].header)
+        self.assertEqual(str(reference), str(responses))
+
+    def test_header_map(self):
+        "Test headers lookup by name, with duplicates and lazy headers"
+
+        stream = (b"GET / HTTP/1.1\r\n"
+                  b"Host: a\r\n"
+                  b"Content-Length: 1\r\n"
+                  b"X-Foo: b\r\n"
+                  b" folded\r\n"
+                  b"content-length: 2\r\n"
+                  b"\r\n"
+                  b"ab")
+        for lazy in [False, True]:
+            request = Requests(lazy_headers=lazy).parse(stream)[0]
+            self.assertEqual([u'HOST', u'CONTENT-LENGTH', u'X-FOO'],
+                             list(request.header_map.keys()))
+            self.assertEqual([1, 3], request.header_map[u'CONTENT-LENGTH'])
+            self.assertEqual([u'1', u'2'],
+                             [header.value for header in
+                              request.get_headers('Content-Length')])
+            self.assertIn(Request.ERROR_DOUBLE_CONTENT_LENGTH,
+                          request.errors)
+            self.assertEqual(2, request.body_size)
+            self.assertEqual(u'a', request.get_header('host').value)
+            self.assertEqual(u'b<SP>folded',
+                             request.get_header('X-Foo').value)
+            self.assertIsNone(request.get_header('Transfer-Encoding'))
+            self.assertTrue(request.has_header('x-foo'))
+
+    def test_feed_bytes(self):
+        "Test incremental parsing, same result as one-shot parsing"
+
+        stream = (b"POST /a HTTP/1.1\r\n"
+                  b"Host: a\r\n"
+                  b"Transfer-Encoding: chunked\r\n"
+                  b"\r\n"
+                  b"3\r\nabc\r\n0\r\n\r\n"
+                  b"GET /b HTTP/1.1\r\n"
+                  b"Content-Length: 4\r\n"
+                  b"\r\n"
+                  b"wxyz"
+                  b"GET /c HTTP/1.1\r\n")
+        reference = Requests().parse(stream)
+        requests = Requests()
+        completed = []
+        for idx in range(len(stream)):
+            completed += requests.feed(stream[idx:idx + 1])
+        self.assertEqual(2, len(completed))
+        self.assertEqual(2, requests.count)
+        self.assertTrue(requests.valid)
+        self.assertEqual(b"wxyz", requests[1].body)
+        # last request is waiting for its headers
+        self.assertIsNotNone(requests.pending_message)
+        requests.end_of_stream()
+        self.assertEqual(str(reference), str(requests))
+        self.assertEqual(reference.parsed_idx, requests.parsed_idx)
+
+    def test_feed_linear_cost(self):
+        "Test the cost of incremental parsing is linear in the stream size"
+
+        def feed(size):
+            stream = (b"HTTP/1.1 200 OK\r\nContent-Length: "
+                      + str(size).encode('ascii') + b"\r\n\r\n"
+                      + b"x" * size)
+            elapsed = []
+            for run in range(3):
+                responses = Responses()
+                start = time.time()
+                for idx in range(0, len(stream), 1460):
+                    responses.feed(stream[idx:idx + 1460])
+                elapsed.append(time.time() - start)
+                self.assertEqual(1, responses.count)
+            return min(elapsed)
+
+        small = feed(1024 * 1024)
+        big = feed(8 * 1024 * 1024)
+        # 8 times the size, quadratic would be 64 times the time
+        self.assertTrue(big < 24 * small + 0.05)
+        # bytes are appended in place
+        responses = Responses()
+        responses.feed(b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\nab")
+        buffer = responses.bytesbuff
+        responses.feed(b"cd")
+        self.assertIs(buffer, responses.bytesbuff)
+        self.assertEqual(b"abcd", responses[0].body)
+        self.assertIsInstance(responses[0].body, six.binary_type)
+        responses.release_buffer()
+        self.assertIs(buffer, responses.bytesbuff)
+        self.assertEqual(0, len(buffer))
+
+    def test_feed_unsized_response(self):
+        "Test response without size, completed by the end of stream"
+
+        responses = Responses()
+        self.assertEqual([], responses.feed(b"HTTP/1.1 200 OK\r\n\r\nab"))
+        self.assertEqual([], responses.feed(b"cd"))
+        completed = responses.end_of_stream()
+        self.assertEqual(1, len(completed))
+        self.assertEqual(b"abcd", completed[0].body)
+        self.assertTrue(responses.valid)
+
+    def test_feed_next_batch(self):
+        "Test next batch keeps the message in progress"
+
+        requests = Requests()
+        requests.feed(b"GET /a HTTP/1.1\r\n\r\nGET /b HTTP/1.1\r\nHo")
+        self.assertEqual(1, requests.count)
+        batch = requests.next_batch()
+        self.assertEqual(0, batch.count)
+        self.assertEqual(b"GET /b HTTP/1.1\r\nHo", batch.bytesbuff)
+        completed = batch.feed(b"st: b\r\n\r\n")
+        self.assertEqual(1, len(completed))
+        self.assertEqual(u'/b', completed[0].first_line.location)
+        self.assertEqual(1, requests.count)
+
+    def test_chunked_body_segments(self):
+        "Test chunked bodies are stored as segments and joined on access"
+
+        response = Responses().parse(
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabc\r\n2\r\nde\r\n1\r\nf\r\n0\r\n\r\n")[0]
+        self.assertEqual(3, len(response.body_segments))
+        self.assertIsInstance(response.body_segments[0], memoryview)
+        self.assertEqual([b"abc", b"de", b"f"],
+                         [segment.tobytes()
+                          for segment in response.iter_body()])
+        self.assertEqual(b"abcdef", response.body)
+        self.assertEqual([], response.body_segments)
+        self.assertEqual([b"abcdef"], list(response.iter_body()))
+        response.body = b"foo"
+        self.assertEqual(b"foo", response.body)
+
+    @unittest.skipIf(tracemalloc is None, "no tracemalloc")
+    def test_feed_chunked_body_memory(self):
+        "Test incremental chunked bodies do not retain the old buffers"
+
+        chunk = b"1000\r\n" + b"x" * 4096 + b"\r\n"
+        stream = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                  + chunk * 256 + b"0\r\n\r\n")
+        responses = Responses()
+        tracemalloc.start()
+        try:
+            for idx in range(0, len(stream), 1024):
+                responses.feed(stream[idx:idx + 1024])
+            retained = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(1, responses.count)
+        self.assertEqual(256, len(responses[0].body_segments))
+        # 1MB of body, plus the buffer
+        self.assertTrue(retained < 8 * 1024 * 1024)
+        self.assertEqual(b"x" * 4096 * 256, responses[0].body)
+
+    def test_bounded_body(self):
+        "Test bodies over the retention cap are only summarized"
+
+        body = b"It works" + b"x" * 200 + b"Wookiee !" + b"y" * 20
+        responses = Responses(body_cap=100,
+                              body_signatures=(b"Wookiee !", b"It works",
+                                               b"Nope")).parse(
+            b"HTTP/1.1 200 OK\r\nContent-Length: 237\r\n\r\n" + body
+            + b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc")
+        self.assertEqual(2, responses.count)
+        self.assertEqual(b"", responses.bytesbuff)
+        summary = responses[0].body
+        self.assertIs(summary, responses[0].body_summary)
+        self.assertEqual(237, len(summary))
+        self.assertEqual(zlib.adler32(body) & 0xffffffff, summary.checksum)
+        self.assertEqual({b"Wookiee !": [208], b"It works": [0],
+                          b"Nope": []}, summary.positions)
+        self.assertIn(b"Wookiee !", summary)
+        self.assertNotIn(b"Nope", summary)
+        self.assertIn(b"yyy", summary)
+        self.assertEqual(body[-4096:], summary.tail)
+        self.assertEqual(b"abc", responses[1].body)
+        self.assertIsNone(responses[1].body_summary)
+
+        # chunked body, signature across chunks
+        response = Responses(body_cap=10,
+                             body_signatures=(b"Wookiee !", )).parse(
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"8\r\nabcdefgh\r\n5\r\nWooki\r\n4\r\nee !\r\n0\r\n\r\n")[0]
+        self.assertEqual(17, len(response.body))
+        self.assertEqual([], response.body_segments)
+        self.assertEqual([8], response.body.positions[b"Wookiee !"])
+        self.assertEqual(b"abcdefghWookiee !", response.body.head)
+
+        # HTTP/0.9 response, read until the end of the stream
+        stream = b"x" * 5000 + b"Wookiee !\r\n" + b"y" * 5000
+        response = Responses(body_cap=1024,
+                             body_signatures=(b"Wookiee !", )).parse(
+            stream)[0]
+        self.assertIsInstance(response.body, BodySummary)
+        self.assertEqual(len(stream), len(response.body))
+        self.assertEqual([5000], response.body.positions[b"Wookiee !"])
+        self.assertEqual(zlib.adler32(stream) & 0xffffffff,
+                         response.body.checksum)
+        self.assertEqual(1024, len(response.first_line.raw))
+        response = Responses(body_cap=1024).parse(b"small\r\nbody")[0]
+        self.assertEqual(b"small\r\nbody", response.body)
+
+        summary = BodySummary(window=4, signatures=(b"abc", ))
+        summary.update(b"xxab").update(memoryview(b"cxabcx"))
+        self.assertEqual([2, 6], summary.positions[b"abc"])
+        self.assertEqual(b"xxab", summary.head)
+        self.assertEqual(b"abcx", summary.tail)
+
+    def test_zones(self):
+        "Test stream offsets and zones of the parsed messages"
+
+        stream = (b"GET / HTTP/1.1\r\nHost: a\r\n\r\n"
+                  b"POST /b HTTP/1.1\r\nHost: b\r\n"
+                  b"Transfer-Encoding: chunked\r\n\r\n"
+                  b"3\r\nabc\r\n0\r\n\r\n")
+        requests = Requests(lazy_headers=True).parse(stream)
+        self.assertEqual(2, requests.count)
+        query = requests[1]
+        self.assertEqual((27, len(stream)), (query.start, query.end))
+        self.assertEqual(stream[27:45], stream[query.first_line.start:
+                                               query.first_line.end])
+        self.assertEqual(b"Host: b\r\n",
+                         stream[query.headers[0].start:query.headers[0].end])
+        zone = requests.zone(1, Tools.ZONE_FIRST_LINE)
+        self.assertEqual(b"POST /b HTTP/1.1\r\n", zone.tobytes())
+        zone = requests.zone(1, Tools.ZONE_HEADERS)
+        self.assertEqual(b"Host: b\r\nTransfer-Encoding: chunked\r\n",
+                         zone.tobytes())
+        self.assertIn(b"chunked", zone)
+        self.assertNotIn(b"POST", zone)
+        zone = requests.zone(1, Tools.ZONE_CHUNK_SIZE)
+        self.assertEqual([b"3\r\n", b"0\r\n"],
+                         [view.tobytes() for view in zone])
+        self.assertNotIn(b"abc", zone)
+        self.assertEqual(0, len(requests.zone(0, Tools.ZONE_CHUNK_SIZE)))
+
+        # offsets are kept in the stream on incremental parsing
+        requests = Requests()
+        requests.feed(stream[:40])
+        batch = requests.next_batch()
+        batch.feed(stream[40:])
+        self.assertEqual(27, batch[0].start)
+        self.assertEqual(b"Host: b\r\nTransfer-Encoding: chunked\r\n",
+                         batch.zone(0, Tools.ZONE_HEADERS).tobytes())
+        self.assertRaises(ValueError, batch.zone, 0, 42)
+
+    def test_events(self):
+        "Test parsing events, with and without messages tree"
+
+        def tobytes(data):
+            # bytes(memoryview) is its repr on python 2
+            if isinstance(data, memoryview):
+                return data.tobytes()
+            return data
+
+        class Recorder(MessageEvents):
+            def __init__(self):
+                self.events = []
+
+            def on_message_start(self, start):
+                self.events.append(('start', start))
+
+            def on_first_line(self, line, start):
+                self.events.append(('line', tobytes(line), start))
+
+            def on_header(self, name, value, flags):
+                self.events.append(('header', tobytes(name), tobytes(value),
+                                    flags != 0))
+
+            def on_chunk_header(self, line, size, flags):
+                self.events.append(('chunk', size))
+
+            def on_body_segment(self, data):
+                self.events.append(('body', tobytes(data)))
+
+            def on_message_complete(self, errors):
+                self.events.append(('end', len(errors)))
+
+        stream = (b"POST /a HTTP/1.1\r\n"
+                  b"Host: www.example.com\r\n"
+                  b"X-Foo :  bar \r\n"
+                  b"Transfer-Encoding: chunked\r\n"
+                  b"\r\n"
+                  b"3\r\nabc\r\n0\r\n\r\n"
+                  b"GET /b HTTP/1.1\r\n\r\n")
+        expected = [('start', 0),
+                    ('line', b"POST /a HTTP/1.1\r\n", 0),
+                    ('header', b'Host', b'www.example.com', False),
+                    ('header', b'X-Foo ', b'bar', True),
+                    ('header', b'Transfer-Encoding', b'chunked', False),
+                    ('chunk', 3),
+                    ('body', b'abc'),
+                    ('chunk', 0),
+                    ('end', 1),
+                    ('start', 99),
+                    ('line', b"GET /b HTTP/1.1\r\n", 99),
+                    ('end', 0)]
+        recorder = Recorder()
+        requests = Requests(events=recorder).parse(stream)
+        self.assertEqual(expected, recorder.events)
+        self.assertEqual(2, requests.count)
+        self.assertEqual(b'abc', requests[0].body)
+
+        # no tree, only events
+        recorder = Recorder()
+        requests = Requests(events=recorder, tree=False)
+        for idx in range(len(stream)):
+            requests.feed(stream[idx:idx + 1])
+        requests.end_of_stream()
+        self.assertEqual(expected, recorder.events)
+        self.assertEqual(2, requests.count)
+        self.assertEqual([], requests.messages)
+
+
+class Test_Line_Automat(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def tearDown(self):
+        Line.CROSS_CHECK = False
+        Line.STRICT = True
+
+    def test_cross_check(self):
+        "Test compiled and reference automats give the same results"
+
+        Line.CROSS_CHECK = True
+        stream = (b"GET http://www.example.com/a/b.html?x=1&y=%20 HTTP/1.1\r\n"
+                  b"Host: www.example.com\r\n"
+                  b"X-Foo :  bar\t baz \r\n"
+                  b"X-Quoted: \"a \\\"b\\\" c\"\r\n"
+                  b"X\x8dBad\x00Name: \xc0value\r\n"
+                  b"  folded value\n"
+                  b"Transfer-Encoding: chunked\r\n"
+                  b"\r\n"
+                  b"00000a;ext=1\r\n0123456789\r\n0\r\n\r\n"
+                  b"POST /\x01 \tHTTP/1.1\r\r\n\r\n")
+        requests = Requests().parse(stream)
+        self.assertEqual(2, requests.count)
+        responses = Responses().parse(b"HTTP/1.1 200 It   works\r\n"
+                                      b"Content-Length: 0\r\n\r\n"
+                                      b"HTTP/1.0 404\tNot found\n\n")
+        self.assertEqual(2, responses.count)
+
+    def test_compiled_runs(self):
+        "Test bytes classes of the compiled automat"
+
+        step, run = Header._transitions[Header.STATUS_NAME]
+        self.assertEqual('header', run[1])
+        table = run[4]
+        self.assertEqual(u'A', table[ord('a')])
+        for char in ':\r\n \t':
+            self.assertNotIn(ord(char), table)
+        header = Header().parse(b"x-foo: bar  baz\r\n")
+        self.assertEqual(u'X-FOO', header.header)
+        self.assertEqual(u'bar<SP><SP>baz', header.value)
+
+    def test_strict_fast_path(self):
+        "Test strict parsing of valid lines, with fallback on the automat"
+
+        header = Header()
+        header.raw = b"Content-Length: 42\r\n"
+        self.assertTrue(header.parse_strict())
+        for raw in [b"Content-Length : 42\r\n",
+                    b"Content-Length: 42\n",
+                    b"Content-Length:\t42\r\n",
+                    b"Content-Length: 42 \r\n",
+                    b" folded\r\n"]:
+            header = Header()
+            header.raw = raw
+            self.assertFalse(header.parse_strict())
+
+        stream = (b"POST /a/b?c=d HTTP/1.1\r\n"
+                  b"Host: www.example.com\r\n"
+                  b"Transfer-Encoding: chunked\r\n"
+                  b"\r\n"
+                  b"000a\r\n0123456789\r\n0\r\n\r\n"
+                  b"GET /\t HTTP/1.1\r\n"
+                  b"Host:\twww.example.com \r\n\r\n")
+        Line.CROSS_CHECK = True
+        strict = Requests().parse(stream)
+        Line.CROSS_CHECK = False
+        Line.STRICT = False
+        automat = Requests().parse(stream)
+        self.assertEqual(str(automat), str(strict))
+
+    def test_byte_steps(self):
+        "Test the automat steps on byte values"
+
+        Line.CROSS_CHECK = True
+        line = FirstRequestHeader().parse(b"TRACE /a HTTP/1.1\r\n")
+        self.assertEqual(u'TRACE', line.method)
+        self.assertEqual(u'/a', line.location)
+        line = FirstResponseHeader().parse(b"HTTP/1.1 2\xb200 OK\r\n")
+        self.assertIn(FirstResponseHeader.ERROR_MAYBE_09, line.errors)
+        header = Header().parse(b"X-Foo: b\xe9r\r\n")
+        self.assertEqual(u'X-FOO', header.header)
+        self.assertEqual(u'b\xe9r', header.value)
+        if six.PY3:
+            # no copy of the buffer for the tokenizer
+            stream = b"GET http://www.example.com/a?b HTTP/1.1\r\n"
+            view = FirstRequestHeader().parse(memoryview(stream))
+            self.assertEqual(str(FirstRequestHeader().parse(stream)),
+                             str(view))
+
+    def test_method_registry(self):
+        "Test method recognition, with extension methods"
+
+        class PurgeRequestHeader(FirstRequestHeader):
+            __slots__ = ()
+
+        PurgeRequestHeader.register_methods(u'PURGE', b'M-SEARCH')
+        Line.CROSS_CHECK = True
+        for method in [u'PATCH', u'PRI', u'PROPFIND', u'UNLOCK']:
+            line = FirstRequestHeader().parse(
+                method.encode('ascii') + b" /a HTTP/1.1\r\n")
+            self.assertEqual(method, line.method)
+            self.assertTrue(line.valid)
+        line = FirstRequestHeader().parse(b"PROPFINX /a HTTP/1.1\r\n")
+        self.assertEqual(u'PROPFIN<Err>', line.method)
+        self.assertIn(FirstRequestHeader.ERROR_INVALID_METHOD, line.errors)
+        line = FirstRequestHeader().parse(b"PO /a HTTP/1.1\r\n")
+        self.assertEqual(u'PO<Err>', line.method)
+        self.assertIn(FirstRequestHeader.ERROR_INVALID_METHOD, line.errors)
+        line = FirstRequestHeader().parse(b"PURGE /a HTTP/1.1\r\n")
+        self.assertIn(FirstRequestHeader.ERROR_INVALID_METHOD, line.errors)
+        for method in [u'PURGE', u'M-SEARCH', u'GET']:
+            line = PurgeRequestHeader().parse(
+                method.encode('ascii') + b" /a HTTP/1.1\r\n")
+            self.assertEqual(method, line.method)
+            self.assertTrue(line.valid)
+
+    def test_cr_runs(self):
+        "Test long runs of CR, counted as data"
+
+        self.addCleanup(setattr, Line, 'CROSS_CHECK', False)
+        Line.CROSS_CHECK = True
+        header = Header().parse(b"X-Foo: bar" + b"\r" * 5000 + b"\n")
+        self.assertEqual(5000, header.cr_count)
+        self.assertIn(Header.ERROR_MULTIPLE_CR, header.errors)
+        self.assertEqual(u'bar', header.value)
+        line = FirstRequestHeader().parse(b"\r" * 5000 + b"GET / HTTP/1.1\r\n")
+        self.assertEqual(1, line.cr_count)
+        self.assertIn(FirstRequestHeader.ERROR_BAD_SPACE, line.errors)
+        Line.CROSS_CHECK = False
+        run = b"\r" * (1024 * 1024)
+        header = Header().parse(b"X-Foo: bar" + run + b"baz\r\n")
+        self.assertEqual(1, header.cr_count)
+        self.assertEqual(u'bar' + u'<BS>' * len(run) + u'baz', header.value)
+        line = FirstRequestHeader().parse(b"GET / HTTP/1.1" + run + b"\n")
+        self.assertEqual(len(run), line.cr_count)
+
+
+class Test_Charsets(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_tables(self):
+        "Test byte classes tables against the Tools characters lists"
+
+        for char in Tools.TCHARS.values():
+            self.assertTrue(charsets.TCHAR[ord(char)])
+            self.assertTrue(charsets.HEADER_NAME[ord(char)])
+        for char in Tools.NO_TOKEN_CHARS_VALUES:
+            self.assertFalse(charsets.TCHAR[ord(char)])
+            self.assertFalse(charsets.HEADER_NAME[ord(char)])
+        for char in Tools.CONTROL_CHARS.values():
+            self.assertFalse(charsets.TCHAR[ord(char)])
+        self.assertEqual(u'0123456789ABCDEFabcdef',
+                         charsets.members(charsets.HEXDIG))
+        self.assertEqual(u'\t\x0b\x0c\r',
+                         charsets.members(charsets.EXTENDED_BAD_SPACE))
+
+
+class Test_Parse_Objects(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_error_flags(self):
+        "Test errors bitmask and its set-like view"
+
+        header = Header().parse(b"Host : a\r\n")
+        self.assertFalse(hasattr(header, '__dict__'))
+        self.assertIn(Header.ERROR_SPACE_BEFORE_SEP, header.errors)
+        self.assertNotIn(Header.ERROR_EMPTY_NAME, header.errors)
+        self.assertNotIn('unknown message', header.errors)
+        self.assertEqual(2, len(header.errors))
+        self.assertEqual(sorted(header.errors), list(header.errors))
+        self.assertEqual({Header.ERROR_SPACE_BEFORE_SEP: True,
+                          Header.ERROR_INVALID_CHAR_IN_NAME: True},
+                         header.errors)
+        request = Requests().parse(b"GET / HTTP/1.1\r\n\r\n")[0]
+        self.assertFalse(hasattr(request, '__dict__'))
+        self.assertEqual({}, request.errors)
+        self.assertFalse(request.errors)
+        self.assertEqual(ErrorSet(), request.first_line.errors)
+
+    def test_chunk_size_overflow(self):
+        "Test 32 and 64 bits overflows of chunk sizes"
+
+        chunk = Chunk().parse(b"FFFFFFFF\r\n")
+        self.assertTrue(chunk.valid)
+        self.assertFalse(chunk.error)
+        self.assertEqual(0xFFFFFFFF, chunk.real_size)
+        chunk = Chunk().parse(b"0100000000\r\n")
+        self.assertTrue(chunk.valid)
+        self.assertEqual({Chunk.ERROR_SIZE_OVERFLOW_32: True}, chunk.errors)
+        self.assertEqual(0x100000000, chunk.real_size)
+        chunk = Chunk().parse(b"10000000000000000\r\n")
+        self.assertTrue(chunk.valid)
+        self.assertIn(Chunk.ERROR_SIZE_OVERFLOW_32, chunk.errors)
+        self.assertIn(Chunk.ERROR_SIZE_OVERFLOW_64, chunk.errors)
+        self.assertEqual(18446744073709551616, chunk.real_size)
+        chunk = Chunk().parse(b"F" * 200 + b"\r\n")
+        self.assertTrue(chunk.valid)
+        self.assertEqual(u'0' + u'F' * 200, chunk.size)
+        self.assertEqual(Chunk.SIZE_CAP, chunk.real_size)
+        chunk = Chunk().parse(b"F" * 200 + b";ext=1\r\n")
+        self.assertIn(u'({0})] ;['.format(Chunk.SIZE_CAP), str(chunk))
+        # the capped size is simply not available in the buffer
+        responses = Responses().parse(
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"10000000000000000\r\nfoo\r\n0\r\n\r\n")
+        self.assertEqual(0, responses.count)
+        self.assertIn(Messages.ERROR_INCOMPLETE_STREAM, responses.errors)
+
+
+class Test_Framing(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_profiles_agree(self):
+        "Test framing of a regular stream by all profiles"
+
+        stream = (b"GET / HTTP/1.1\r\nHost: a\r\n\r\n"
+                  b"POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc"
+                  b"POST /b HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+                  b"3\r\nabc\r\n0\r\n\r\n")
+        report = FramingEngine().scan(stream)
+        self.assertTrue(report.agree)
+        self.assertEqual({}, report.smuggled_starts())
+        frames = report.frames[STRICT_RFC.name]
+        self.assertEqual([(0, 27, Frame.NONE),
+                          (27, 68, Frame.LENGTH),
+                          (68, len(stream), Frame.CHUNKED)],
+                         [frame.key() for frame in frames])
+
+    def test_profiles_disagree(self):
+        "Test framing differences of the profiles"
+
+        # CL.TE
+        stream = (b"POST / HTTP/1.1\r\nContent-Length: 6\r\n"
+                  b"Transfer-Encoding: chunked\r\n\r\n0\r\n\r\nG")
+        report = FramingEngine().scan(stream)
+        self.assertFalse(report.agree)
+        frames = dict([(name, frames[0])
+                       for name, frames in report.frames.items()])
+        self.assertEqual(Frame.REJECTED, frames[STRICT_RFC.name].framing)
+        self.assertEqual(len(stream) - 1, frames[APACHE_LIKE.name].end)
+        self.assertEqual(len(stream), frames[LEGACY_LENIENT.name].end)
+        self.assertEqual(0, report.disagreements()[0][0])
+
+        # the header is ignored by some agents only, hidden request
+        stream = (b"POST / HTTP/1.1\r\nContent-Length: 11\r\n"
+                  b"Transfer-Encoding : chunked\r\n\r\n0\r\n\r\n"
+                  b"GET /admin HTTP/1.1\r\n\r\n")
+        report = FramingEngine([APACHE_LIKE, NGINX_LIKE]).scan(stream)
+        self.assertEqual({0: [NGINX_LIKE.name], 79: [NGINX_LIKE.name]},
+                         report.smuggled_starts())
+
+        # bare LF line endings
+        stream = b"GET / HTTP/1.1\nHost: a\n\n"
+        report = FramingEngine([STRICT_RFC, APACHE_LIKE]).scan(stream)
+        self.assertEqual(FramingEngine.ERROR_BARE_LF,
+                         report.frames[STRICT_RFC.name][0].error)
+        self.assertEqual((0, len(stream), Frame.NONE),
+                         report.frames[APACHE_LIKE.name][0].key())
+
+
+class Test_Benchmark(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_corpus(self):
+        "Test the benchmark corpus and the results format"
+
+        for stream in benchmark.request_corpus()['regular']:
+            self.assertTrue(Requests().parse(stream).valid)
+        streams = benchmark.response_corpus()['pipelined_responses']
+        self.assertEqual(8, Responses().parse(streams[0]).count)
+        results = benchmark.run(repeat=1, rounds=1)
+        self.assertEqual(['chunk_overflows', 'cl_te',
+                          'first_line_separators', 'regular'],
+                         sorted(results['results']['requests'].keys()))
+        stats = results['results']['requests']['regular']
+        self.assertEqual(5, stats['streams'])
+        self.assertEqual(5, stats['messages'])
+        self.assertEqual(6, len(benchmark.compare(results, results)))
+
+
+class Test_Batch(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_columns(self):
+        "Test batch parsing of buffers and of one buffer with offsets"
+
+        streams = [b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc"
+                   b"HTTP/1.0 404 Not Found\r\n"
+                   b"Transfer-Encoding: chunked\r\n\r\n2\r\nab\r\n0\r\n\r\n",
+                   b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n"
+                   b"Content-Length: 4\r\n\r\nabcd",
+                   b"HTTP/1.1 200 OK\r\n\r\nuntil the end"]
+        result = BatchParser(Responses).parse(streams)
+        self.assertEqual(3, result.streams)
+        self.assertEqual(4, len(result))
+        self.assertEqual([2, 1, 1], list(result.count))
+        self.assertEqual([0, 2, 3], list(result.first_message))
+        self.assertEqual([0, 0, 1, 2], list(result.stream))
+        self.assertEqual([200, 404, 200, 200], list(result.code))
+        self.assertEqual([11, 10, 11, 11], list(result.version))
+        self.assertEqual([BatchResult.FRAMING_LENGTH,
+                          BatchResult.FRAMING_CHUNKED,
+                          BatchResult.FRAMING_LENGTH,
+                          BatchResult.FRAMING_UNTIL_CLOSE],
+                         list(result.framing))
+        self.assertEqual([3, -1, 4, -1], list(result.content_length))
+        self.assertEqual([0, 2, 0, 0], list(result.chunks))
+        self.assertEqual([3, 2, 4, 13], list(result.body_length))
+        self.assertEqual(0, result.errors[0])
+        self.assertIn(Message.ERROR_DOUBLE_CONTENT_LENGTH,
+                      error_messages(int(result.errors[2])))
+        self.assertEqual(error_messages(int(result.errors[2])),
+                         result.error_messages(result.errors[2]))
+
+        offsets = [0]
+        for stream in streams:
+            offsets.append(offsets[-1] + len(stream))
+        columns = BatchParser(Responses).parse(b''.join(streams), offsets)
+        for name in BatchResult.STREAM_COLUMNS + BatchResult.MESSAGE_COLUMNS:
+            self.assertEqual(list(getattr(result, name)),
+                             list(getattr(columns, name)))
+
+        result = BatchParser(Requests).parse([b"GET / HTTP/1.1\r\n\r\n"])
+        self.assertEqual(0, result.code[0])
+        self.assertEqual(BatchResult.FRAMING_NONE, result.framing[0])
+
+    def test_error_bits(self):
+        "Test error bits do not depend on the order of the errors"
+
+        table = error_table()
+        messages = [table[1 << idx] for idx in range(len(table))]
+        # messages of the parse objects, sorted, in 64 bits
+        self.assertEqual(sorted(messages), messages)
+        self.assertTrue(len(messages) <= 64)
+        self.assertEqual(1 << messages.index(Chunk.ERROR_LF_WITHOUT_CR),
+                         error_bit(Chunk.ERROR_LF_WITHOUT_CR))
+        # same bits in a new process, other errors used first
+        script = ("from httpwookiee.http.parser.errors import error_bit;"
+                  "from httpwookiee.http.parser.message import Message;"
+                  "error_bit(u'test error');"
+                  "print(error_bit(Message.ERROR_DOUBLE_CONTENT_LENGTH))")
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=os.path.dirname(
+                                             os.path.dirname(
+                                                 os.path.realpath(__file__))))
+        self.assertEqual(error_bit(Message.ERROR_DOUBLE_CONTENT_LENGTH),
+                         int(output.strip()))
+
+
+class Test_Responses_Cache(unittest.TestCase):
+
+    def getStatus(self, format=None):
+        return ''
+
+    def getGravity(self, human=False):
+        if not human:
+            return 0
+        else:
+            return u'Unknown'
+
+    def test_lru(self):
+        "Test shared frozen results, LRU eviction and hit/miss counters"
+
+        stream1 = b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc"
+        stream2 = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+        stream3 = b"HTTP/1.1 200 OK\r\n\r\nuntil the end"
+        cache = ResponsesCache(size=2)
+        responses = cache.parse(stream1)
+        self.assertEqual(1, responses.count)
+        self.assertEqual(b"abc", responses[0].body)
+        self.assertTrue(responses.frozen)
+        self.assertRaises(FrozenMessagesError, responses.parse, stream2)
+        self.assertRaises(FrozenMessagesError, responses.feed, stream2)
+        self.assertIsInstance(responses.messages, tuple)
+        self.assertEqual(1, responses.count)
+
+        # same bytes in another buffer
+        self.assertIs(responses, cache.parse(bytearray(stream1)))
+        # parsing options are in the key
+        self.assertIsNot(responses, cache.parse(stream1, lazy_headers=True))
+        self.assertEqual((1, 2, 2), (cache.hits, cache.misses, len(cache)))
+
+        cache.parse(stream2)
+        # stream1 without options was the least recently used one
+        self.assertEqual(2, len(cache))
+        self.assertIsNot(responses, cache.parse(stream1))
+        self.assertEqual(4, cache.misses)
+        cache.parse(stream2)
+        self.assertEqual(2, cache.hits)
+        cache.parse(stream3)
+        self.assertEqual(404, cache.parse(stream2)[0].code)
+        self.assertEqual(3, cache.hits)
+
+        cache.clear()
+        self.assertEqual((0, 0, 0), (cache.hits, cache.misses, len(cache)))
+
+        # no storage
+        cache = ResponsesCache(size=0)
+        responses = cache.parse(stream1)
+        self.assertIsNot(responses, cache.parse(stream1))
+        self.assertTrue(responses.frozen)
+        self.assertEqual((0, 2, 0), (cache.hits, cache.misses, len(cache)))
+
+        # next_batch() on a frozen parsing gets a regular parser
+        batch = responses.next_batch()
+        batch.feed(stream2)
+        batch.end_of_stream()
+        self.assertEqual(1, batch.count)